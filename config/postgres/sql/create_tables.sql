@@ -31,15 +31,29 @@ CREATE TABLE IF NOT EXISTS review
     CONSTRAINT reviews_pkey PRIMARY KEY (recommendationid)
 );
 
--- Table: conversation
+-- Table: conversation, partitioned by month of request_time.
+-- Monthly partitions are created ahead and archived by PartitionManager
+-- (make partition-maintenance); the default partition takes any other row.
+-- IF NOT EXISTS keeps the plain table of databases created before partitioning;
+-- convert it once with make partition-migrate.
 CREATE TABLE IF NOT EXISTS conversation (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     conversation_id TEXT NOT NULL,
     question TEXT NOT NULL,
     answer TEXT NOT NULL,
     game VARCHAR(200) NOT NULL,
     model VARCHAR(200) NOT NULL,
     response_time FLOAT,
+    time_to_first_token FLOAT,
+    generation_time FLOAT,
+    embedding_time FLOAT,
+    cache_lookup_time FLOAT,
+    search_time FLOAT,
+    prompt_time FLOAT,
+    db_write_time FLOAT,
+    evaluation_time FLOAT,
+    cache_hit BOOLEAN NOT NULL DEFAULT FALSE,
+    latency_saved FLOAT,
     relevance TEXT NOT NULL,
     relevance_explanation TEXT NOT NULL,
     prompt_tokens INTEGER NOT NULL,
@@ -49,14 +63,127 @@ CREATE TABLE IF NOT EXISTS conversation (
     eval_completion_tokens INTEGER NOT NULL,
     eval_total_tokens INTEGER NOT NULL,
     model_cost FLOAT NOT NULL,
-    request_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    request_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, request_time)
+) PARTITION BY RANGE (request_time);
 
--- Table: feedbacks
+CREATE TABLE IF NOT EXISTS conversation_default PARTITION OF conversation DEFAULT;
+
+-- Table: feedbacks, partitioned by month of feedback_date.
+-- conversation_id is not a foreign key: a key on the partitioned conversation
+-- table must include request_time.
 CREATE TABLE IF NOT EXISTS feedback (
-    id SERIAL PRIMARY KEY,
-    conversation_id INTEGER REFERENCES conversation(id),
+    id SERIAL,
+    conversation_id INTEGER,
     feedback_score INTEGER,
 	feedback_comment TEXT,
-    feedback_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    feedback_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, feedback_date)
+) PARTITION BY RANGE (feedback_date);
+
+CREATE TABLE IF NOT EXISTS feedback_default PARTITION OF feedback DEFAULT;
+
+-- Partitions of this month and the next two
+DO $$
+DECLARE
+    parent TEXT;
+    month DATE;
+BEGIN
+    FOREACH parent IN ARRAY ARRAY['conversation', 'feedback'] LOOP
+        FOR i IN 0..2 LOOP
+            month := date_trunc('month', CURRENT_DATE) + make_interval(months => i);
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                parent || '_p' || to_char(month, 'YYYY_MM'),
+                parent,
+                month,
+                month + interval '1 month'
+            );
+        END LOOP;
+    END LOOP;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS ix_conversation_request_time
+    ON conversation (request_time);
+CREATE INDEX IF NOT EXISTS conversation_game_model_idx
+    ON conversation (game, model);
+CREATE INDEX IF NOT EXISTS ix_feedback_conversation_id
+    ON feedback (conversation_id);
+CREATE INDEX IF NOT EXISTS ix_feedback_feedback_date
+    ON feedback (feedback_date);
+
+-- View: conversation_metrics, the conversations without their text columns
+CREATE OR REPLACE VIEW conversation_metrics AS
+SELECT id, conversation_id, game, model, response_time, time_to_first_token,
+    generation_time, embedding_time, cache_lookup_time, search_time, prompt_time,
+    db_write_time, evaluation_time, cache_hit, latency_saved, relevance,
+    prompt_tokens, completion_tokens, total_tokens, eval_prompt_tokens,
+    eval_completion_tokens, eval_total_tokens, model_cost, request_time
+FROM conversation;
+
+-- Table: sync_state
+CREATE TABLE IF NOT EXISTS sync_state (
+    game VARCHAR(200) PRIMARY KEY,
+    app_id INTEGER NOT NULL,
+    last_timestamp_updated BIGINT NOT NULL,
+    reviews_synced INTEGER NOT NULL DEFAULT 0,
+    last_synced TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Table: answer_cache
+CREATE TABLE IF NOT EXISTS answer_cache (
+    id SERIAL PRIMARY KEY,
+    game VARCHAR(200) NOT NULL,
+    model VARCHAR(200) NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    embedding BYTEA NOT NULL,
+    watermark BIGINT NOT NULL,
+    response_time FLOAT,
+    created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS answer_cache_game_model_idx
+    ON answer_cache (game, model, watermark);
+
+-- Table: conversation_rollup (maintained by MetricsRollup)
+CREATE TABLE IF NOT EXISTS conversation_rollup (
+    resolution VARCHAR(10) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    game VARCHAR(200) NOT NULL,
+    model VARCHAR(200) NOT NULL,
+    conversations INTEGER NOT NULL DEFAULT 0,
+    cache_hits INTEGER NOT NULL DEFAULT 0,
+    relevant INTEGER NOT NULL DEFAULT 0,
+    partly_relevant INTEGER NOT NULL DEFAULT 0,
+    non_relevant INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    total_tokens BIGINT NOT NULL DEFAULT 0,
+    eval_total_tokens BIGINT NOT NULL DEFAULT 0,
+    model_cost FLOAT NOT NULL DEFAULT 0,
+    response_time_sum FLOAT NOT NULL DEFAULT 0,
+    latency_saved_sum FLOAT NOT NULL DEFAULT 0,
+    thumbs_up INTEGER NOT NULL DEFAULT 0,
+    thumbs_down INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (resolution, bucket, game, model)
+);
+
+-- Table: latency_histogram (maintained by MetricsRollup)
+CREATE TABLE IF NOT EXISTS latency_histogram (
+    resolution VARCHAR(10) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    game VARCHAR(200) NOT NULL,
+    model VARCHAR(200) NOT NULL,
+    stage VARCHAR(50) NOT NULL,
+    le FLOAT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (resolution, bucket, game, model, stage, le)
+);
+
+-- Table: stale_rollup_bucket (hours written late, recomputed by MetricsRollup)
+CREATE TABLE IF NOT EXISTS stale_rollup_bucket (
+    id SERIAL PRIMARY KEY,
+    bucket TIMESTAMP NOT NULL
 );
@@ -1,4 +1,38 @@
-from .database import DataBaseConnector
-from .vector_store import LangChainChromaRAG
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ['DataBaseConnector', 'LangChainChromaRAG']
+# Exports are imported from their module on first access, so that importing the
+# package for the database connector does not load chromadb and LangChain
+_EXPORTS = {
+    'DataBaseConnector': 'database',
+    'LangChainChromaRAG': 'vector_store',
+    'CachedEmbeddings': 'embedding_cache',
+    'ParallelEmbedder': 'parallel_embeddings',
+    'OnnxEmbeddings': 'onnx_embeddings',
+    'export_onnx_model': 'onnx_embeddings',
+}
+
+if TYPE_CHECKING:
+    from .database import DataBaseConnector
+    from .vector_store import LangChainChromaRAG
+    from .embedding_cache import CachedEmbeddings
+    from .onnx_embeddings import OnnxEmbeddings, export_onnx_model
+    from .parallel_embeddings import ParallelEmbedder
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = [
+    'DataBaseConnector',
+    'LangChainChromaRAG',
+    'CachedEmbeddings',
+    'ParallelEmbedder',
+    'OnnxEmbeddings',
+    'export_onnx_model',
+]
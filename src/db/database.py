@@ -1,8 +1,87 @@
+import time
+import threading
+from typing import Any, Dict, List, Tuple, Optional
 from contextlib import contextmanager
+from collections import deque
 
-from sqlalchemy import create_engine
+from sqlalchemy import event, create_engine
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+class PoolMetrics:
+    """
+    Records how long sessions wait to get a connection from the pool.
+
+    A checkout waits when every pooled connection is in use and the overflow is
+    exhausted; the time also includes opening a new connection when the pool grows.
+    Checkouts slower than `slow_threshold` are reported, as they mean the application
+    is starved of connections.
+
+    Attributes:
+        slow_threshold (float): Seconds above which a checkout is reported and counted as slow.
+        checkouts (int): Number of connections checked out.
+        slow_checkouts (int): Number of checkouts slower than `slow_threshold`.
+    """
+
+    def __init__(self, slow_threshold: float = 0.5, window: int = 1000) -> None:
+        self.slow_threshold = slow_threshold
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._recent: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._recent.append(wait)
+            if wait >= self.slow_threshold:
+                self.slow_checkouts += 1
+                print(f"Waited {wait:.2f}s for a database connection")
+
+    def snapshot(self) -> Dict[str, float]:
+        """Returns the checkout count and wait times, in milliseconds; percentiles cover the last `window` checkouts."""
+        with self._lock:
+            recent = sorted(self._recent)
+            p95 = recent[int(0.95 * (len(recent) - 1))] if recent else 0.0
+            return {
+                'checkouts': self.checkouts,
+                'slow_checkouts': self.slow_checkouts,
+                'wait_avg_ms': 1000 * self._total_wait / (self.checkouts or 1),
+                'wait_p95_ms': 1000 * p95,
+                'wait_max_ms': 1000 * self._max_wait,
+            }
+
+
+class _TimedQueuePool(QueuePool):
+    """A QueuePool recording the time every checkout waits in its `PoolMetrics`."""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.metrics is not None:
+                self.metrics.record(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
 
 
 class DataBaseConnector:
@@ -19,10 +98,20 @@ class DataBaseConnector:
         database (str): The name of the database to connect to.
         user (str): The username for the database connection.
         password (str): The password for the database connection.
+        pool_size (int): The number of connections kept open in the pool.
+        max_overflow (int): The number of extra connections opened when the pool is exhausted.
+        pool_timeout (float): Seconds to wait for a connection before giving up.
+        pool_recycle (int): Seconds after which a connection is replaced, before the server or a proxy drops it.
+        pool_pre_ping (bool): Whether connections are tested before use, so dropped ones are replaced transparently.
+        statement_timeout (int): Milliseconds after which the server cancels a statement, or None.
+        metrics (PoolMetrics): Checkout wait times of the pool.
         engine (sqlalchemy.engine.base.Engine): The SQLAlchemy engine object.
         Session (sqlalchemy.orm.session.Session): A configured session class for database interactions.
     """
 
+    _shared: Dict[Tuple, "DataBaseConnector"] = {}
+    _shared_lock = threading.Lock()
+
     def __init__(
         self,
         db_type=None,
@@ -31,6 +120,12 @@ class DataBaseConnector:
         database=None,
         user=None,
         password=None,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = 1800,
+        pool_pre_ping: bool = True,
+        statement_timeout: Optional[int] = None,
     ) -> None:
         """
         Initializes the DataBaseConnector with the specified database connection parameters.
@@ -42,6 +137,12 @@ class DataBaseConnector:
             database (str, optional): The name of the database to connect to or the path to the SQLite file.
             user (str, optional): The username for the database connection. Required for PostgreSQL and MySQL.
             password (str, optional): The password for the database connection. Required for PostgreSQL and MySQL.
+            pool_size (int, optional): The number of connections kept open in the pool. Defaults to 5.
+            max_overflow (int, optional): The number of extra connections allowed under load. Defaults to 10.
+            pool_timeout (float, optional): Seconds to wait for a free connection. Defaults to 30.
+            pool_recycle (int, optional): Maximum age of a connection, in seconds. Defaults to 1800.
+            pool_pre_ping (bool, optional): Whether to test connections before use. Defaults to True.
+            statement_timeout (int, optional): Server-side statement timeout in milliseconds, on PostgreSQL and MySQL. Defaults to None.
 
         Raises:
             ValueError: If an unsupported `db_type` is provided.
@@ -52,6 +153,13 @@ class DataBaseConnector:
         self.database = database
         self.user = user
         self.password = password
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pool_pre_ping = pool_pre_ping
+        self.statement_timeout = statement_timeout
+        self.metrics = PoolMetrics()
         self.engine = self.create_engine()
         self.Session = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
 
@@ -68,12 +176,89 @@ class DataBaseConnector:
         """
         try:
             url = self.construct_url()
-            engine = create_engine(url, echo=False)
+            if self.db_type == 'sqlite' and self.database == ':memory:':
+                # An in-memory database lives in a single connection: nothing to pool
+                return create_engine(url, echo=False)
+
+            engine = create_engine(
+                url,
+                echo=False,
+                poolclass=_TimedQueuePool,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_timeout=self.pool_timeout,
+                pool_recycle=self.pool_recycle,
+                pool_pre_ping=self.pool_pre_ping,
+                connect_args=self._connect_args(),
+            )
+            engine.pool.metrics = self.metrics
+            if self.db_type == 'sqlite':
+                event.listen(engine, 'connect', self._set_sqlite_pragmas)
             return engine
         except SQLAlchemyError as error:
             print(f"Failed to create engine: {error}")
             raise error
 
+    def _connect_args(self) -> Dict[str, Any]:
+        """Returns the driver arguments applying the statement timeout."""
+        if not self.statement_timeout:
+            return {}
+        if self.db_type == 'postgresql':
+            return {'options': f"-c statement_timeout={int(self.statement_timeout)}"}
+        if self.db_type == 'mysql':
+            return {
+                'init_command': f"SET SESSION max_execution_time={int(self.statement_timeout)}"
+            }
+        return {}
+
+    @staticmethod
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Enables WAL, so readers do not block the writer, and cheaper syncs on every new SQLite connection."""
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in SQLITE_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    @classmethod
+    def shared(cls, **kwargs: Any) -> "DataBaseConnector":
+        """
+        Returns the process-wide connector of a database, creating it on first use.
+
+        Connectors are keyed by their connection parameters, so every caller in the
+        process shares one engine and connection pool per database. The pool options of
+        later calls are ignored.
+
+        Args:
+            **kwargs: The arguments of `DataBaseConnector`.
+
+        Returns:
+            DataBaseConnector: The shared connector.
+        """
+        key = tuple(
+            kwargs.get(name)
+            for name in ('db_type', 'host', 'port', 'database', 'user', 'password')
+        )
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(**kwargs)
+            return cls._shared[key]
+
+    def pool_status(self) -> Dict[str, Any]:
+        """
+        Returns the checkout wait metrics and the current state of the connection pool.
+
+        Returns:
+            Dict[str, Any]: The `PoolMetrics` snapshot, plus the connections 'checked_out' and in 'overflow' when the pool tracks them.
+        """
+        status: Dict[str, Any] = self.metrics.snapshot()
+        pool = self.engine.pool
+        if isinstance(pool, QueuePool):
+            status['checked_out'] = pool.checkedout()
+            status['overflow'] = max(pool.overflow(), 0)
+        return status
+
     def construct_url(self):
         """
         Constructs the database connection URL based on the specified `db_type` and connection parameters.
@@ -140,3 +325,82 @@ class DataBaseConnector:
         except SQLAlchemyError as error:
             print(f"Failed to create tables: {error}")
             raise
+
+    def bulk_upsert(
+        self,
+        model,
+        rows: List[Dict[str, Any]],
+        conflict_columns: List[str],
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Inserts or updates many rows of a model in a single transaction.
+
+        Rows are written with multi-row `INSERT ... ON CONFLICT DO UPDATE` statements on
+        PostgreSQL and SQLite (`ON DUPLICATE KEY UPDATE` on MySQL), `batch_size` rows per
+        statement, so a page of reviews costs one round trip per batch instead of one
+        per row.
+
+        Args:
+            model (sqlalchemy.orm.DeclarativeMeta): The ORM model whose table receives the rows.
+            rows (List[Dict[str, Any]]): The rows to write, as column name to value mappings.
+            conflict_columns (List[str]): The unique columns identifying an existing row.
+            batch_size (int, optional): Number of rows per statement. Defaults to 1000.
+
+        Returns:
+            int: The number of rows written.
+
+        Raises:
+            SQLAlchemyError: If the transaction fails; no row is written.
+            ValueError: If the database type does not support upserts.
+        """
+        if not rows:
+            return 0
+
+        table = model.__table__
+        update_columns = [
+            column
+            for column in rows[0]
+            if column not in conflict_columns and column in table.columns
+        ]
+        with self.session_scope() as session:
+            for offset in range(0, len(rows), batch_size):
+                statement = self._upsert_statement(
+                    table,
+                    rows[offset : offset + batch_size],
+                    conflict_columns,
+                    update_columns,
+                )
+                session.execute(statement)
+        return len(rows)
+
+    def _upsert_statement(self, table, rows, conflict_columns, update_columns):
+        """
+        Builds the dialect-specific multi-row upsert statement used by `bulk_upsert`.
+
+        Raises:
+            ValueError: If an unsupported `db_type` is provided.
+        """
+        if self.db_type in ('postgresql', 'sqlite'):
+            if self.db_type == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            statement = insert(table).values(rows)
+            if not update_columns:
+                return statement.on_conflict_do_nothing(index_elements=conflict_columns)
+            return statement.on_conflict_do_update(
+                index_elements=conflict_columns,
+                set_={column: statement.excluded[column] for column in update_columns},
+            )
+        elif self.db_type == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+
+            statement = insert(table).values(rows)
+            if not update_columns:
+                return statement.prefix_with('IGNORE')
+            return statement.on_duplicate_key_update(
+                {column: statement.inserted[column] for column in update_columns}
+            )
+        else:
+            raise ValueError(f"Unsupported database type: {self.db_type}")
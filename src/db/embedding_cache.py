@@ -0,0 +1,264 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import Dict, List, Callable, Optional
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", "data/cache/embeddings.sqlite"
+)
+
+
+class CachedEmbeddings(Embeddings):
+    """A content-addressed cache wrapped around a LangChain embedding model.
+
+    Vectors are keyed by the model name plus a hash of the normalized text. Lookups go
+    through an in-memory LRU first and then through an on-disk SQLite store of float32
+    vectors, so the same cache file can be shared by the Streamlit app and the Steam
+    downloader. Only the texts missing from both layers reach the wrapped model.
+
+    Attributes:
+        base_embeddings (Embeddings): The wrapped embedding model.
+        model_name (str): Name of the embedding model, part of every cache key.
+        cache_path (str): Path of the SQLite file, or None for a memory-only cache.
+        max_memory_entries (int): Maximum number of vectors kept in the LRU.
+        max_disk_entries (int): Maximum number of vectors kept on disk before the least recently used are evicted.
+        hits (int): Number of texts served from the cache.
+        misses (int): Number of texts sent to the wrapped model.
+    """
+
+    def __init__(
+        self,
+        base_embeddings: Embeddings,
+        model_name: str,
+        cache_path: Optional[str] = DEFAULT_EMBEDDING_CACHE_PATH,
+        max_memory_entries: int = 10_000,
+        max_disk_entries: int = 1_000_000,
+    ) -> None:
+        """Initializes the cache and creates the SQLite store if needed.
+
+        Args:
+            base_embeddings (Embeddings): The embedding model to wrap.
+            model_name (str): Name of the embedding model.
+            cache_path (str, optional): Path of the SQLite file. Defaults to the `EMBEDDING_CACHE_PATH` environment variable or 'data/cache/embeddings.sqlite'. None keeps the cache in memory only.
+            max_memory_entries (int, optional): Size of the in-memory LRU. Defaults to 10000.
+            max_disk_entries (int, optional): Size cap of the on-disk store. Defaults to 1000000.
+        """
+        self.base_embeddings = base_embeddings
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = self._connect() if cache_path else None
+        self._disk_entries = self._count() if self._connection is not None else 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens the SQLite store in WAL mode so several processes can share it.
+
+        Returns:
+            sqlite3.Connection: The connection to the cache file.
+        """
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self.cache_path, check_same_thread=False, timeout=30
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS embedding ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embedding_last_access "
+            "ON embedding (last_access)"
+        )
+        connection.commit()
+        return connection
+
+    def _count(self) -> int:
+        (size,) = self._connection.execute("SELECT COUNT(*) FROM embedding").fetchone()
+        return size
+
+    def _key(self, text: str, kind: str) -> str:
+        """Builds the cache key of a text for the current model.
+
+        Args:
+            text (str): The text to embed.
+            kind (str): 'document' or 'query', since some models embed them differently.
+
+        Returns:
+            str: A SHA-256 hex digest of the model name, the kind and the normalized text.
+        """
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(
+            f"{self.model_name}\x00{kind}\x00{normalized}".encode("utf-8")
+        ).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Stores a vector in the in-memory LRU, evicting the least recently used entry."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Reads the vectors of the given keys from the SQLite store and refreshes their access time."""
+        if self._connection is None or not keys:
+            return {}
+        found = {}
+        for offset in range(0, len(keys), 500):
+            batch = keys[offset : offset + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._connection.execute(
+                f"SELECT key, vector FROM embedding WHERE key IN ({placeholders})",
+                batch,
+            ).fetchall()
+            found.update(
+                (key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows
+            )
+        if found:
+            now = time.time()
+            self._connection.executemany(
+                "UPDATE embedding SET last_access = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+            self._connection.commit()
+        return found
+
+    def _write_disk(self, vectors: Dict[str, np.ndarray]):
+        """Writes new vectors to the SQLite store and enforces the disk size cap.
+
+        The number of stored vectors is counted once at open and kept up to date with
+        this process's inserts, so the table is only counted again when the cap looks
+        reached: other processes sharing the file may have added or evicted vectors.
+        """
+        if self._connection is None or not vectors:
+            return
+        now = time.time()
+        # A key already stored was written by another process, with the same vector
+        inserted = self._connection.executemany(
+            "INSERT OR IGNORE INTO embedding (key, vector, last_access) VALUES (?, ?, ?)",
+            [(key, vector.tobytes(), now) for key, vector in vectors.items()],
+        ).rowcount
+        self._disk_entries += max(inserted, 0)
+        if self._disk_entries > self.max_disk_entries:
+            self._disk_entries = self._count()
+        if self._disk_entries > self.max_disk_entries:
+            self._connection.execute(
+                "DELETE FROM embedding WHERE key IN ("
+                "SELECT key FROM embedding ORDER BY last_access LIMIT ?)",
+                (self._disk_entries - self.max_disk_entries,),
+            )
+            self._disk_entries = self.max_disk_entries
+        self._connection.commit()
+
+    def _embed(
+        self,
+        texts: List[str],
+        kind: str,
+        compute: Callable[[List[str]], List[List[float]]],
+    ) -> List[List[float]]:
+        """Resolves the texts through the LRU and the disk store, computing only the misses.
+
+        Args:
+            texts (list): The texts to embed.
+            kind (str): 'document' or 'query'.
+            compute (callable): Embeds the list of texts missing from the cache.
+
+        Returns:
+            list: One embedding per text, in the same order.
+        """
+        keys = [self._key(text, kind) for text in texts]
+        with self._lock:
+            vectors = {}
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    vectors[key] = self._memory[key]
+            vectors.update(self._read_disk([key for key in keys if key not in vectors]))
+
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in vectors:
+                    missing.setdefault(key, text)
+            self.hits += sum(1 for key in keys if key not in missing)
+            self.misses += len(missing)
+
+        if missing:
+            computed = compute(list(missing.values()))
+            new_vectors = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(missing, computed)
+            }
+            vectors.update(new_vectors)
+            with self._lock:
+                self._write_disk(new_vectors)
+
+        with self._lock:
+            for key in keys:
+                self._remember(key, vectors[key])
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds a list of texts, sending only cache misses to the wrapped model.
+
+        Args:
+            texts (list): The texts to embed.
+
+        Returns:
+            list: One embedding per text, in the same order.
+        """
+        return self._embed(texts, "document", self.base_embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a single query through the cache.
+
+        Args:
+            text (str): The query to embed.
+
+        Returns:
+            list: The query embedding.
+        """
+        return self._embed(
+            [text],
+            "query",
+            lambda texts: [self.base_embeddings.embed_query(texts[0])],
+        )[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeds many queries through the cache with a single batched call to the model.
+
+        The misses are embedded with `embed_documents`, which for sentence-transformers
+        models yields the same vectors as `embed_query`.
+
+        Args:
+            texts (list): The queries to embed.
+
+        Returns:
+            list: One embedding per query, in the same order.
+        """
+        return self._embed(texts, "query", self.base_embeddings.embed_documents)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Returns the cache counters: hits, misses, hit ratio and the number of vectors in memory."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
@@ -0,0 +1,241 @@
+import os
+import re
+import math
+import pickle
+from array import array
+from typing import Dict, List, Tuple, Iterable, Optional
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases a text and splits it into alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class _Partition:
+    """The inverted index of a single game.
+
+    Documents are numbered in insertion order. Each term maps to two parallel arrays,
+    the document numbers and the term frequencies, so postings stay compact and can be
+    scored with vectorized NumPy operations. Removed documents are tombstoned and
+    dropped from the postings the next time the partition is compacted.
+    """
+
+    def __init__(self) -> None:
+        self.doc_ids: List[str] = []
+        self.doc_lengths = array("I")
+        self.live = array("b")
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.positions: Dict[str, int] = {}
+        self.live_count = 0
+        self.live_length = 0
+
+    def add(self, doc_id: str, tokens: List[str]):
+        if doc_id in self.positions:
+            self.remove(doc_id)
+        docnum = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(len(tokens))
+        self.live.append(1)
+        self.positions[doc_id] = docnum
+        self.live_count += 1
+        self.live_length += len(tokens)
+
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for token, frequency in frequencies.items():
+            docs, tfs = self.postings.setdefault(token, (array("I"), array("H")))
+            docs.append(docnum)
+            tfs.append(min(frequency, 65535))
+
+    def remove(self, doc_id: str):
+        docnum = self.positions.pop(doc_id, None)
+        if docnum is None:
+            return
+        self.live[docnum] = 0
+        self.live_count -= 1
+        self.live_length -= self.doc_lengths[docnum]
+
+    def compact(self):
+        """Rebuilds the postings without tombstoned documents."""
+        if self.live_count == len(self.doc_ids):
+            return
+        remap = array("i", [-1] * len(self.doc_ids))
+        doc_ids, doc_lengths = [], array("I")
+        for docnum, doc_id in enumerate(self.doc_ids):
+            if self.live[docnum]:
+                remap[docnum] = len(doc_ids)
+                doc_ids.append(doc_id)
+                doc_lengths.append(self.doc_lengths[docnum])
+
+        postings = {}
+        for token, (docs, tfs) in self.postings.items():
+            new_docs, new_tfs = array("I"), array("H")
+            for docnum, frequency in zip(docs, tfs):
+                if remap[docnum] >= 0:
+                    new_docs.append(remap[docnum])
+                    new_tfs.append(frequency)
+            if new_docs:
+                postings[token] = (new_docs, new_tfs)
+
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.live = array("b", [1] * len(doc_ids))
+        self.postings = postings
+        self.positions = {doc_id: docnum for docnum, doc_id in enumerate(doc_ids)}
+
+    def search(
+        self, tokens: List[str], k: int, k1: float, b: float
+    ) -> List[Tuple[str, float]]:
+        if not self.live_count:
+            return []
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32).astype(np.float32)
+        average_length = self.live_length / self.live_count
+        norms = k1 * (1 - b + b * lengths / average_length)
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        live = np.frombuffer(self.live, dtype=np.int8)
+
+        for token in set(tokens):
+            if token not in self.postings:
+                continue
+            docs, tfs = self.postings[token]
+            docnums = np.frombuffer(docs, dtype=np.uint32)
+            frequencies = np.frombuffer(tfs, dtype=np.uint16).astype(np.float32)
+            # Tombstoned documents stay in the postings until compaction
+            df = int(live[docnums].sum())
+            if not df:
+                continue
+            idf = math.log(1 + (self.live_count - df + 0.5) / (df + 0.5))
+            scores[docnums] += (
+                idf * frequencies * (k1 + 1) / (frequencies + norms[docnums])
+            )
+
+        scores *= live
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.doc_ids[i], float(scores[i])) for i in candidates]
+
+
+class BM25Index:
+    """A local BM25 keyword index over review chunks, partitioned by game.
+
+    It complements the dense retrieval of `LangChainChromaRAG` for queries with rare
+    literal terms ("128 tick", "amd drivers") that sentence embeddings handle poorly.
+    The index is small enough to be pickled to a single file and reloaded by other
+    processes when the ingest job rewrites it.
+
+    Attributes:
+        path (str): File the index is persisted to, or None to keep it in memory only.
+        k1 (float): BM25 term frequency saturation.
+        b (float): BM25 document length normalization.
+        partitions (Dict[str, _Partition]): One inverted index per game.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.partitions: Dict[str, _Partition] = {}
+        self._mtime: Optional[float] = None
+
+    def __len__(self) -> int:
+        return sum(partition.live_count for partition in self.partitions.values())
+
+    def add(self, chunks: Iterable[Tuple[str, str, str]]):
+        """Indexes chunks, replacing any chunk already stored under the same ID.
+
+        Args:
+            chunks (Iterable[Tuple[str, str, str]]): `(chunk_id, game, text)` triples.
+        """
+        for chunk_id, game, text in chunks:
+            self.partitions.setdefault(game, _Partition()).add(chunk_id, tokenize(text))
+
+    def remove(self, chunk_ids: Iterable[str]):
+        """Removes chunks from every partition.
+
+        Args:
+            chunk_ids (Iterable[str]): IDs of the chunks to remove.
+        """
+        for chunk_id in chunk_ids:
+            for partition in self.partitions.values():
+                partition.remove(chunk_id)
+
+    def remove_review(self, recommendationid: str):
+        """Removes every chunk of a review, whose IDs are `<recommendationid>:<chunk_index>`."""
+        prefix = f"{recommendationid}:"
+        for partition in self.partitions.values():
+            for chunk_id in [c for c in partition.positions if c.startswith(prefix)]:
+                partition.remove(chunk_id)
+
+    def search(
+        self, query: str, k: int = 10, game: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """Returns the `k` best chunks for a query by BM25 score.
+
+        Args:
+            query (str): The search query.
+            k (int, optional): Number of results. Defaults to 10.
+            game (str, optional): Restricts the search to one game's partition. Defaults to None (all games).
+
+        Returns:
+            List[Tuple[str, float]]: `(chunk_id, score)` pairs, best first.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        if game is not None:
+            partitions = [self.partitions[game]] if game in self.partitions else []
+        else:
+            partitions = list(self.partitions.values())
+        results = [
+            result
+            for partition in partitions
+            for result in partition.search(tokens, k, self.k1, self.b)
+        ]
+        return sorted(results, key=lambda result: -result[1])[:k]
+
+    def save(self):
+        """Compacts the partitions and atomically writes the index to `path`."""
+        if self.path is None:
+            return
+        for partition in self.partitions.values():
+            partition.compact()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f_out:
+            pickle.dump(self.partitions, f_out, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def load(self) -> bool:
+        """Loads the index from `path`.
+
+        Returns:
+            bool: True if a persisted index was found and loaded.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as f_in:
+            self.partitions = pickle.load(f_in)
+        self._mtime = os.path.getmtime(self.path)
+        return True
+
+    def refresh(self) -> bool:
+        """Reloads the index if another process rewrote the file since it was loaded.
+
+        Returns:
+            bool: True if the index was reloaded.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        if os.path.getmtime(self.path) == self._mtime:
+            return False
+        return self.load()
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import shutil
+from typing import Any, Dict, List, Tuple, Optional
+
+import numpy as np
+
+DEFAULT_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "data/cache/vector_snapshots")
+CURRENT_FILE = "CURRENT"
+
+
+def publish_snapshot(
+    snapshot_dir: str,
+    ids: List[str],
+    embeddings: List[List[float]],
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    keep: int = 2,
+) -> str:
+    """Writes a new read-only snapshot of a collection and makes it the current one.
+
+    Rows are normalized and sorted by game, so every game occupies a contiguous row
+    range of the float32 matrix. The `CURRENT` pointer is replaced atomically once the
+    snapshot is complete, so readers never see a partial one.
+
+    Args:
+        snapshot_dir (str): Directory holding the snapshots.
+        ids (list): Chunk IDs.
+        embeddings (list): Chunk embeddings, in the same order.
+        documents (list): Chunk texts, in the same order.
+        metadatas (list): Chunk metadata, in the same order; each must contain 'game'.
+        keep (int, optional): Number of snapshots to keep on disk. Defaults to 2.
+
+    Returns:
+        str: The version of the published snapshot.
+    """
+    order = sorted(range(len(ids)), key=lambda row: metadatas[row]["game"])
+    if ids:
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)[order]
+    else:
+        # An empty collection still gets a snapshot, which answers every search with []
+        vectors = np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms == 0, 1, norms)
+
+    games: Dict[str, List[int]] = {}
+    for row, position in enumerate(order):
+        game = metadatas[position]["game"]
+        games.setdefault(game, [row, row])[1] = row + 1
+
+    version = f"{time.time_ns()}"
+    path = os.path.join(snapshot_dir, version)
+    os.makedirs(path)
+    np.save(os.path.join(path, "vectors.npy"), vectors)
+    with open(os.path.join(path, "chunks.json"), "w", encoding="utf-8") as f_out:
+        json.dump(
+            {
+                "ids": [ids[i] for i in order],
+                "documents": [documents[i] for i in order],
+                "metadatas": [metadatas[i] for i in order],
+                "games": games,
+            },
+            f_out,
+        )
+
+    tmp_pointer = os.path.join(snapshot_dir, f"{CURRENT_FILE}.tmp")
+    with open(tmp_pointer, "w", encoding="utf-8") as f_out:
+        f_out.write(version)
+    os.replace(tmp_pointer, os.path.join(snapshot_dir, CURRENT_FILE))
+
+    versions = sorted(
+        entry
+        for entry in os.listdir(snapshot_dir)
+        if os.path.isdir(os.path.join(snapshot_dir, entry))
+    )
+    for old_version in versions[:-keep]:
+        shutil.rmtree(os.path.join(snapshot_dir, old_version), ignore_errors=True)
+    return version
+
+
+class NumpyVectorIndex:
+    """An in-process, read-only vector index loaded from a published snapshot.
+
+    The vectors are memory-mapped as one contiguous float32 matrix and top-k queries
+    are answered with a vectorized dot product over the rows of the requested game.
+    For larger corpora an HNSW graph per game can be built instead of the exact scan.
+    The index follows the `CURRENT` pointer and reloads itself when the ingest job
+    publishes a new snapshot.
+
+    Attributes:
+        snapshot_dir (str): Directory holding the snapshots.
+        index_type (str): "flat" for exact search or "hnsw" for approximate search.
+        refresh_interval (float): Minimum number of seconds between two checks for a new snapshot.
+        version (str): Version of the loaded snapshot, or None if none was published yet.
+    """
+
+    def __init__(
+        self,
+        snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+        index_type: str = "flat",
+        refresh_interval: float = 30.0,
+    ) -> None:
+        if index_type not in ("flat", "hnsw"):
+            raise ValueError(f"Unsupported index type: {index_type}")
+        if index_type == "hnsw":
+            try:
+                import hnswlib  # noqa: F401
+            except ImportError as err:
+                raise ValueError(
+                    "index_type='hnsw' needs the hnswlib module, installed with chromadb "
+                    "(chroma-hnswlib) or with `pip install hnswlib`"
+                ) from err
+        self.snapshot_dir = snapshot_dir
+        self.index_type = index_type
+        self.refresh_interval = refresh_interval
+        self.version: Optional[str] = None
+        self._checked_at = 0.0
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._games: Dict[str, List[int]] = {}
+        self._rows: Dict[str, int] = {}
+        self._hnsw: Dict[Optional[str], Any] = {}
+        self.refresh(force=True)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            with open(
+                os.path.join(self.snapshot_dir, CURRENT_FILE), encoding="utf-8"
+            ) as f_in:
+                return f_in.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Loads the current snapshot if it changed since the last load.
+
+        Args:
+            force (bool, optional): Check the pointer even if `refresh_interval` has not elapsed. Defaults to False.
+
+        Returns:
+            bool: True if a new snapshot was loaded.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return False
+        self._checked_at = now
+
+        version = self._current_version()
+        if version is None or version == self.version:
+            return False
+
+        path = os.path.join(self.snapshot_dir, version)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(path, "chunks.json"), encoding="utf-8") as f_in:
+            chunks = json.load(f_in)
+
+        self._vectors = vectors
+        self._ids = chunks["ids"]
+        self._documents = chunks["documents"]
+        self._metadatas = chunks["metadatas"]
+        self._games = chunks["games"]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._hnsw = {}
+        self.version = version
+        return True
+
+    def _row_range(self, game: Optional[str]) -> Tuple[int, int]:
+        if game is None:
+            return 0, len(self._ids)
+        return tuple(self._games.get(game, (0, 0)))  # type: ignore
+
+    def _hnsw_index(self, game: Optional[str]):
+        """Builds, once per snapshot, the HNSW graph of a game's row range."""
+        if game not in self._hnsw:
+            import hnswlib
+
+            start, end = self._row_range(game)
+            index = hnswlib.Index(space="ip", dim=self._vectors.shape[1])
+            index.init_index(
+                max_elements=max(end - start, 1), ef_construction=200, M=16
+            )
+            if end > start:
+                index.add_items(
+                    np.asarray(self._vectors[start:end]), np.arange(start, end)
+                )
+            index.set_ef(100)
+            self._hnsw[game] = index
+        return self._hnsw[game]
+
+    def search(
+        self, query_vector: List[float], k: int, game: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """Returns the `k` chunks most similar to a query vector.
+
+        Args:
+            query_vector (list): The query embedding.
+            k (int): Number of results.
+            game (str, optional): Restricts the search to one game's rows. Defaults to None (all games).
+
+        Returns:
+            List[Tuple[str, float]]: `(chunk_id, cosine similarity)` pairs, best first.
+        """
+        self.refresh()
+        start, end = self._row_range(game)
+        k = min(k, end - start)
+        if k <= 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        if self.index_type == "hnsw":
+            labels, distances = self._hnsw_index(game).knn_query(query, k=k)
+            return [
+                (self._ids[row], 1.0 - float(distance))
+                for row, distance in zip(labels[0], distances[0])
+            ]
+
+        scores = self._vectors[start:end] @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._ids[start + row], float(scores[row])) for row in top]
+
+    def get(self, chunk_ids: List[str]) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Returns the text and metadata of stored chunks.
+
+        Args:
+            chunk_ids (list): IDs of the chunks.
+
+        Returns:
+            list: `(chunk_id, text, metadata)` triples for the IDs present in the snapshot.
+        """
+        rows = [
+            self._rows[chunk_id] for chunk_id in chunk_ids if chunk_id in self._rows
+        ]
+        return [(self._ids[r], self._documents[r], self._metadatas[r]) for r in rows]
@@ -0,0 +1,217 @@
+import os
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_ONNX_MODEL_DIR = os.getenv(
+    "ONNX_MODEL_DIR", "data/models/all-MiniLM-L6-v2-onnx"
+)
+MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model.int8.onnx'
+CONFIG_FILE = 'embedding_config.json'
+
+
+def export_onnx_model(
+    model_name: str,
+    output_dir: str = DEFAULT_ONNX_MODEL_DIR,
+    opset: int = 14,
+) -> str:
+    """Exports a sentence-transformers model to ONNX and quantizes it to int8.
+
+    The transformer is exported with dynamic batch and sequence axes, then its weights
+    are quantized with ONNX Runtime dynamic quantization (activations are quantized
+    at run time, so no calibration set is needed). The tokenizer and the pooling
+    settings are saved next to it, which is all `OnnxEmbeddings` needs: loading it
+    imports neither torch nor sentence-transformers. Exporting requires torch,
+    sentence-transformers and onnx.
+
+    Args:
+        model_name (str): Name of the sentence-transformers model.
+        output_dir (str, optional): Directory written. Defaults to the `ONNX_MODEL_DIR` environment variable or 'data/models/all-MiniLM-L6-v2-onnx'.
+        opset (int, optional): ONNX opset version. Defaults to 14.
+
+    Returns:
+        str: The output directory.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers.models import Pooling, Normalize
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    pooling = next(module for module in model if isinstance(module, Pooling))
+    if pooling.get_pooling_mode_str() != 'mean':
+        raise ValueError(f"Only mean pooling is supported, not {pooling}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+    inputs = dict(tokenizer(["an example sentence"], return_tensors='pt'))
+    names = list(inputs)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *args):
+            return self.transformer(**dict(zip(names, args))).last_hidden_state
+
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer),
+            tuple(inputs[name] for name in names),
+            model_path,
+            input_names=names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    quantize_dynamic(
+        model_path,
+        os.path.join(output_dir, QUANTIZED_MODEL_FILE),
+        weight_type=QuantType.QInt8,
+    )
+
+    with open(os.path.join(output_dir, CONFIG_FILE), 'w', encoding='utf-8') as f_out:
+        json.dump(
+            {
+                'model_name': model_name,
+                'max_seq_length': model.max_seq_length,
+                'pad_token': tokenizer.pad_token,
+                'pad_token_id': tokenizer.pad_token_id,
+                'normalize': any(isinstance(module, Normalize) for module in model),
+            },
+            f_out,
+            indent=2,
+        )
+    return output_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings computed with ONNX Runtime from a model exported by `export_onnx_model`.
+
+    Runs the same steps as sentence-transformers — tokenization truncated to the
+    model's `max_seq_length`, the transformer, mean pooling over the attention mask
+    and L2 normalization — without importing torch, so it loads in a fraction of
+    the time and runs the int8 model on CPU. Texts are sorted by length before being
+    batched, to limit padding.
+
+    Attributes:
+        model_dir (str): Directory of the exported model.
+        quantized (bool): Whether the int8 model is used rather than the float32 one.
+        model_name (str): Name of the exported sentence-transformers model.
+        batch_size (int): Number of texts per inference call.
+        max_seq_length (int): Number of tokens texts are truncated to.
+        normalize (bool): Whether the embeddings are L2-normalized.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = DEFAULT_ONNX_MODEL_DIR,
+        quantized: bool = True,
+        batch_size: int = 32,
+        intra_op_threads: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            model_dir (str, optional): Directory of the exported model. Defaults to the `ONNX_MODEL_DIR` environment variable or 'data/models/all-MiniLM-L6-v2-onnx'.
+            quantized (bool, optional): Use the int8 model. Defaults to True.
+            batch_size (int, optional): Number of texts per inference call. Defaults to 32.
+            intra_op_threads (int, optional): Threads of ONNX Runtime. Defaults to its own choice.
+
+        Raises:
+            FileNotFoundError: If the model was not exported to `model_dir`.
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(
+            model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        )
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"No ONNX model at {model_path}; export it with `make onnx-export`"
+            )
+        with open(os.path.join(model_dir, CONFIG_FILE), 'r', encoding='utf-8') as f_in:
+            config: Dict[str, Any] = json.load(f_in)
+
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.model_name = config['model_name']
+        self.batch_size = batch_size
+        self.max_seq_length = config['max_seq_length']
+        self.normalize = config['normalize']
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(
+            pad_id=config['pad_token_id'], pad_token=config['pad_token']
+        )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            model_path, options, providers=['CPUExecutionProvider']
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': attention_mask,
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        (hidden,) = self.session.run(
+            ['last_hidden_state'],
+            {name: value for name, value in feeds.items() if name in self._input_names},
+        )
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.clip(norms, 1e-12, None)
+        return vectors.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds a list of texts.
+
+        Args:
+            texts (list): The texts to embed.
+
+        Returns:
+            list: One embedding per text, in the same order.
+        """
+        # Same preprocessing as HuggingFaceEmbeddings, for comparable vectors
+        texts = [text.replace("\n", " ") for text in texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.zeros((len(texts), 0), dtype=np.float32)
+        for offset in range(0, len(order), self.batch_size):
+            positions = order[offset : offset + self.batch_size]
+            batch = self._embed_batch([texts[i] for i in positions])
+            if not vectors.shape[1]:
+                vectors = np.zeros((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[positions] = batch
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a single query.
+
+        Args:
+            text (str): The query to embed.
+
+        Returns:
+            list: The query embedding.
+        """
+        return self.embed_documents([text])[0]
@@ -0,0 +1,191 @@
+import os
+import time
+import multiprocessing
+from typing import Any, Dict, List, Tuple, Callable, Iterator, Optional
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+# Thread pools of the native libraries, read when they initialize
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+# The model of the current worker process, loaded once by `_init_worker`
+_model: Any = None
+
+
+def load_sentence_transformer(model_name: str) -> Any:
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, device='cpu')
+
+
+def _init_worker(
+    model_name: str, threads: int, load_model: Callable[[str], Any]
+) -> None:
+    """Pins the worker's thread pools to `threads` and loads its copy of the model."""
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    # Each worker is one process among many; tokenizer threads would oversubscribe
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+    global _model
+    _model = load_model(model_name)
+
+
+def _embed_batch(
+    texts: List[str], encode_batch_size: int
+) -> Tuple[int, np.ndarray, float]:
+    """Embeds a batch in the worker process.
+
+    Returns:
+        tuple: The worker's PID, the float32 vectors and the seconds spent encoding.
+    """
+    start = time.perf_counter()
+    # Same preprocessing as HuggingFaceEmbeddings.embed_documents, for identical vectors
+    vectors = _model.encode(
+        [text.replace("\n", " ") for text in texts],
+        batch_size=encode_batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    return (
+        os.getpid(),
+        np.asarray(vectors, dtype=np.float32),
+        time.perf_counter() - start,
+    )
+
+
+class ParallelEmbedder:
+    """
+    Embeds a large set of documents with a sentence-transformers model on a pool of processes.
+
+    Every worker loads the model once and runs it on `threads_per_worker` threads, so
+    that `workers * threads_per_worker` stays within the cores instead of each process
+    starting one thread per core. Texts are sorted by length, longest first, before
+    being cut into batches of `batch_size`, so the sequences padded together in a
+    batch have similar lengths and the longest batches are scheduled first.
+
+    At most `max_pending` batches are submitted at a time, and results are yielded as
+    they complete, so memory stays bounded and the caller can write the vectors while
+    the workers embed the next batches. The pool is started by the first `embed` and
+    reused by the next ones until `close`.
+
+    Attributes:
+        model_name (str): Name of the sentence-transformers model.
+        workers (int): Number of worker processes.
+        threads_per_worker (int): Number of threads each worker runs the model on.
+        batch_size (int): Number of texts sent to a worker at a time.
+        encode_batch_size (int): Batch size of the model within a worker.
+        max_pending (int): Maximum number of batches submitted and not yet consumed.
+        worker_stats (Dict[int, Dict[str, float]]): Chunks embedded and seconds spent per worker PID.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+        batch_size: int = 1024,
+        encode_batch_size: int = 64,
+        max_pending: Optional[int] = None,
+        load_model: Callable[[str], Any] = load_sentence_transformer,
+    ) -> None:
+        """
+        Args:
+            model_name (str): Name of the sentence-transformers model.
+            workers (int, optional): Number of worker processes. Defaults to the number of cores.
+            threads_per_worker (int, optional): Threads per worker. Defaults to the cores divided among the workers.
+            batch_size (int, optional): Number of texts sent to a worker at a time. Defaults to 1024.
+            encode_batch_size (int, optional): Batch size of the model within a worker. Defaults to 64.
+            max_pending (int, optional): Maximum number of batches in flight. Defaults to twice the workers.
+            load_model (callable, optional): Loads the model from its name in each worker; must be picklable.
+        """
+        cores = os.cpu_count() or 1
+        self.model_name = model_name
+        self.workers = workers or cores
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.workers)
+        self.batch_size = batch_size
+        self.encode_batch_size = encode_batch_size
+        self.max_pending = max_pending or 2 * self.workers
+        self.load_model = load_model
+        self.worker_stats: Dict[int, Dict[str, float]] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def embed(self, texts: List[str]) -> Iterator[Tuple[List[int], np.ndarray]]:
+        """Embeds the texts, yielding the vectors of each batch as soon as it is done.
+
+        Args:
+            texts (list): The texts to embed.
+
+        Yields:
+            tuple: The positions of the batch's texts in `texts`, and their vectors in the same order.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batches = [
+            order[offset : offset + self.batch_size]
+            for offset in range(0, len(order), self.batch_size)
+        ]
+        if not batches:
+            return
+
+        executor = self._get_executor()
+        pending = {}
+        submitted = 0
+        while submitted < len(batches) or pending:
+            while submitted < len(batches) and len(pending) < self.max_pending:
+                positions = batches[submitted]
+                future = executor.submit(
+                    _embed_batch,
+                    [texts[i] for i in positions],
+                    self.encode_batch_size,
+                )
+                pending[future] = positions
+                submitted += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                positions = pending.pop(future)
+                pid, vectors, seconds = future.result()
+                stats = self.worker_stats.setdefault(pid, {'chunks': 0, 'seconds': 0.0})
+                stats['chunks'] += len(positions)
+                stats['seconds'] += seconds
+                yield positions, vectors
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Starts the worker pool on first use; it is kept until `close`."""
+        if self._executor is None:
+            # Spawned rather than forked: the parent may already run torch threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads_per_worker, self.load_model),
+            )
+        return self._executor
+
+    def close(self):
+        """Stops the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> "ParallelEmbedder":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def stats(self) -> Dict[int, float]:
+        """Returns the throughput of each worker, in chunks per second spent encoding."""
+        return {
+            pid: stats['chunks'] / stats['seconds'] if stats['seconds'] else 0.0
+            for pid, stats in self.worker_stats.items()
+        }
@@ -1,12 +1,32 @@
-from typing import Dict, List, Optional
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+from typing import Any, Dict, List, Tuple, Optional
 
 from chromadb.config import Settings
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
 import chromadb
 
+from .keyword_index import BM25Index
+from .embedding_cache import CachedEmbeddings, DEFAULT_EMBEDDING_CACHE_PATH
+from .onnx_embeddings import DEFAULT_ONNX_MODEL_DIR, OnnxEmbeddings
+from .parallel_embeddings import ParallelEmbedder
+from .local_index import DEFAULT_SNAPSHOT_DIR, NumpyVectorIndex, publish_snapshot
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_KEYWORD_INDEX_PATH = os.getenv(
+    "KEYWORD_INDEX_PATH", "data/cache/keyword_index.pkl"
+)
+# Rank constant of reciprocal rank fusion, as in the original RRF paper
+RRF_K = 60
+
 
 class LangChainChromaRAG:
     """A class to manage game reviews using Chroma and LangChain for
@@ -16,10 +36,15 @@ class LangChainChromaRAG:
     Attributes:
         collection_name (str): The name of the collection used in the Chroma vector store.
         embedding_model_name (str): The name of the HuggingFace embedding model.
+        embedding_backend (str): "torch" to run the model with sentence-transformers, or "onnx" to run its int8 ONNX export.
         persist_directory (str): Directory to perscist Chroma vector store data.
-        embeddings (HuggingFaceEmbeddings): Embedding model instance.
+        embeddings (CachedEmbeddings): Embedding model instance, wrapped in a content-addressed cache.
         vectorstore (Chroma): Vector store instance for storing and searching vectors.
         text_splitter (RecursiveCharacterTextSplitter): Used to split text into smaller chunks.
+        keyword_index (BM25Index): Keyword index over the same chunks, used by hybrid search.
+        backend (str): "http" to query Chroma for every search, or "embedded" to search an in-process snapshot.
+        snapshot_dir (str): Directory the collection snapshots are published to.
+        local_index (NumpyVectorIndex): The in-process index, or None with the "http" backend.
     """
 
     def __init__(
@@ -27,6 +52,13 @@ class LangChainChromaRAG:
         collection_name: str,
         chroma_host: str = 'localhost',
         embedding_model_name: str = 'sentence-transformers/all-MiniLM-L6-v2',
+        embedding_cache_path: Optional[str] = DEFAULT_EMBEDDING_CACHE_PATH,
+        keyword_index_path: Optional[str] = DEFAULT_KEYWORD_INDEX_PATH,
+        backend: str = 'http',
+        snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+        index_type: str = 'flat',
+        embedding_backend: str = 'torch',
+        onnx_model_dir: str = DEFAULT_ONNX_MODEL_DIR,
     ):
         """Initializes the LangChainChromaRAG class with the specified collection name,
         embedding model, and persistent directory.
@@ -34,15 +66,47 @@ class LangChainChromaRAG:
         Args:
             collection_name (str): Name of the collection in the Chroma vector store.
             embedding_model_name (str, optional): The name of the embedding model from HuggingFace. Defaults to "sentence-transformers/all-MiniLM-L6-v2".
+            embedding_cache_path (str, optional): SQLite file backing the embedding cache. Defaults to the `EMBEDDING_CACHE_PATH` environment variable or 'data/cache/embeddings.sqlite'. None keeps the cache in memory only.
+            keyword_index_path (str, optional): File the BM25 keyword index is persisted to. Defaults to the `KEYWORD_INDEX_PATH` environment variable or 'data/cache/keyword_index.pkl'. None keeps the index in memory only.
+            backend (str, optional): "http" sends every search to the Chroma server; "embedded" answers searches from the latest snapshot published by the ingest job, loaded in-process. Writes always go to Chroma. Defaults to "http".
+            snapshot_dir (str, optional): Directory of the published snapshots. Defaults to the `VECTOR_SNAPSHOT_DIR` environment variable or 'data/cache/vector_snapshots'.
+            index_type (str, optional): Search structure of the embedded backend, "flat" (exact) or "hnsw" (approximate, for larger corpora). Defaults to "flat".
+            embedding_backend (str, optional): "torch" runs the embedding model with sentence-transformers; "onnx" runs its int8 export with ONNX Runtime, without loading torch. Defaults to "torch".
+            onnx_model_dir (str, optional): Directory of the ONNX export, see `export_onnx_model`. Defaults to the `ONNX_MODEL_DIR` environment variable or 'data/models/all-MiniLM-L6-v2-onnx'.
+
+        Raises:
+            ValueError: If an unsupported `backend`, `index_type` or `embedding_backend` is provided.
         """
+        if backend not in ('http', 'embedded'):
+            raise ValueError(f"Unsupported backend: {backend}")
+        if embedding_backend not in ('torch', 'onnx'):
+            raise ValueError(f"Unsupported embedding backend: {embedding_backend}")
         self.collection_name = collection_name
+        self.embedding_model_name = embedding_model_name
+        self.embedding_backend = embedding_backend
         self.chroma_client = chromadb.HttpClient(
             host=chroma_host,
             port=8000,
             settings=Settings(allow_reset=True, anonymized_telemetry=False),
         )
 
-        self.embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
+        if embedding_backend == 'onnx':
+            base_embeddings = OnnxEmbeddings(onnx_model_dir)
+            if base_embeddings.model_name != embedding_model_name:
+                raise ValueError(
+                    f"{onnx_model_dir} holds {base_embeddings.model_name}, "
+                    f"not {embedding_model_name}"
+                )
+            # Quantized vectors differ slightly, so they are cached under their own key
+            cache_model_name = f"{embedding_model_name}:onnx-int8"
+        else:
+            base_embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
+            cache_model_name = embedding_model_name
+        self.embeddings = CachedEmbeddings(
+            base_embeddings,
+            model_name=cache_model_name,
+            cache_path=embedding_cache_path,
+        )
 
         self.vectorstore = Chroma(
             client=self.chroma_client,
@@ -54,8 +118,27 @@ class LangChainChromaRAG:
             chunk_size=256, chunk_overlap=50, length_function=len
         )
 
-    def add_game_reviews(self, reviews: List[Dict[str, str]]):
-        """Adds new game reviews to the vector store. Reviews are split into chunks before storing.
+        self.keyword_index = BM25Index(keyword_index_path)
+        self._keyword_index_loaded = False
+
+        self.backend = backend
+        self.snapshot_dir = snapshot_dir
+        self.local_index = (
+            NumpyVectorIndex(snapshot_dir, index_type=index_type)
+            if backend == 'embedded'
+            else None
+        )
+
+    def add_game_reviews(
+        self, reviews: List[Dict[str, str]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> Dict[str, float]:
+        """Adds new or edited game reviews to the vector store using a bulk ingestion path.
+
+        Chunks get deterministic IDs (`<recommendationid>:<chunk_index>`) and are upserted,
+        so re-ingesting the same page is idempotent. Reviews whose content hash matches the
+        stored one are skipped without being embedded; edited reviews only replace their
+        own chunks. New and edited chunks are embedded and upserted in batches of
+        `batch_size` chunks.
 
         Args:
             reviews (list): A list of review dictionaries. Each dictionary should contain:
@@ -63,86 +146,519 @@ class LangChainChromaRAG:
                 - 'language' (str): The language of the review.
                 - 'game' (str): The name of the game being reviewed.
                 - 'review' (str): The text of the review.
+            batch_size (int, optional): Number of chunks embedded and written per upsert. Defaults to 1000.
+
+        Returns:
+            dict: Ingestion statistics with the number of reviews and chunks written, the
+                number of unchanged reviews skipped, the elapsed seconds and the
+                throughput in reviews/s and chunks/s.
         """
-        new_reviews = []
-        for review in reviews:
-            if not self._review_exists(review["recommendationid"]):
-                new_reviews.append(review)
-            else:
-                print(
-                    f"Review with ID {review['recommendationid']} already exists. Skipping."
-                )
+        start_time = time.perf_counter()
+        batch_size = max(1, min(batch_size, self.chroma_client.get_max_batch_size()))
+        collection = self.vectorstore._collection
+        plan = self._plan_ingest(reviews)
+        texts, metadatas, ids = plan["texts"], plan["metadatas"], plan["ids"]
+
+        for offset in range(0, len(texts), batch_size):
+            batch_texts = texts[offset : offset + batch_size]
+            collection.upsert(
+                ids=ids[offset : offset + batch_size],
+                embeddings=self.embeddings.embed_documents(batch_texts),  # type: ignore
+                documents=batch_texts,
+                metadatas=metadatas[offset : offset + batch_size],  # type: ignore
+            )
+        return self._finish_ingest(plan, start_time)
+
+    def backfill_game_reviews(
+        self,
+        reviews: List[Dict[str, str]],
+        workers: Optional[int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        queue_size: int = 4,
+        embedder: Optional[ParallelEmbedder] = None,
+    ) -> Dict[str, Any]:
+        """Adds a large set of reviews, embedding them on a pool of worker processes.
+
+        Same result as `add_game_reviews`, for backfilling a game's full history: the
+        chunks are embedded by a `ParallelEmbedder`, in length-sorted batches of
+        `batch_size`, and a writer thread upserts each batch as it completes. The
+        queue between them holds at most `queue_size` batches, so the workers pause
+        when Chroma falls behind. The embedding cache is bypassed.
+
+        Args:
+            reviews (list): Review dictionaries, as for `add_game_reviews`.
+            workers (int, optional): Number of embedding processes. Defaults to the number of cores.
+            batch_size (int, optional): Number of chunks embedded and written at a time. Defaults to 1000.
+            queue_size (int, optional): Maximum number of embedded batches waiting to be written. Defaults to 4.
+            embedder (ParallelEmbedder, optional): An embedder whose pool is reused across calls. Defaults to one running this store's model on `workers` processes, closed on return.
+
+        Returns:
+            dict: The statistics of `add_game_reviews`, plus the chunks/s of each worker
+                under 'workers', keyed by PID.
+
+        Raises:
+            Exception: Re-raised when embedding or writing a batch fails.
+        """
+        start_time = time.perf_counter()
+        batch_size = max(1, min(batch_size, self.chroma_client.get_max_batch_size()))
+        collection = self.vectorstore._collection
+        plan = self._plan_ingest(reviews)
+        texts, metadatas, ids = plan["texts"], plan["metadatas"], plan["ids"]
+
+        batches: queue.Queue = queue.Queue(maxsize=queue_size)
+        errors: List[Exception] = []
+
+        def write():
+            while (batch := batches.get()) is not None:
+                if errors:
+                    continue  # Keep draining so the producer never blocks
+                positions, vectors = batch
+                try:
+                    for offset in range(0, len(positions), batch_size):
+                        rows = positions[offset : offset + batch_size]
+                        collection.upsert(
+                            ids=[ids[i] for i in rows],
+                            embeddings=vectors[offset : offset + batch_size],
+                            documents=[texts[i] for i in rows],
+                            metadatas=[metadatas[i] for i in rows],  # type: ignore
+                        )
+                except Exception as err:
+                    errors.append(err)
+
+        own_embedder = embedder is None
+        if embedder is None:
+            embedder = ParallelEmbedder(
+                self.embedding_model_name, workers=workers, batch_size=batch_size
+            )
+        writer = threading.Thread(target=write, name="chroma-writer", daemon=True)
+        writer.start()
+        try:
+            for batch in embedder.embed(texts):
+                if errors:
+                    break
+                batches.put(batch)
+        finally:
+            batches.put(None)
+            writer.join()
+            if own_embedder:
+                embedder.close()
+        if errors:
+            print(f"Error writing embedded chunks to Chroma: {str(errors[0])}")
+            raise errors[0]
+
+        for pid, chunks_per_second in embedder.stats.items():
+            print(f"Embedding worker {pid}: {chunks_per_second:.1f} chunks/s")
+        stats = self._finish_ingest(plan, start_time)
+        stats["workers"] = embedder.stats
+        return stats
+
+    def _plan_ingest(self, reviews: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Splits the new and edited reviews into chunks, skipping the unchanged ones.
+
+        Args:
+            reviews (list): Review dictionaries, as for `add_game_reviews`.
+
+        Returns:
+            dict: The unique reviews count, the new or edited reviews, the texts,
+                metadatas and IDs of their chunks, and the IDs of chunks to delete.
+        """
+        # Keep the last copy of each review so a page never upserts the same ID twice
+        unique_reviews = {review["recommendationid"]: review for review in reviews}
+        stored = self._stored_review_states(list(unique_reviews))
+        new_reviews, stale_ids = [], []
+        texts, metadatas, ids = [], [], []
+        for review in unique_reviews.values():
+            recommendationid = review["recommendationid"]
+            content_hash = self._content_hash(review)
+            previous = stored.get(recommendationid)
+            if previous and previous["content_hash"] == content_hash:
+                continue
 
-        for review in new_reviews:
             chunks = self.text_splitter.split_text(review["review"])
-            metadatas = [
+            new_reviews.append(review)
+            texts.extend(chunks)
+            ids.extend(self._chunk_id(recommendationid, i) for i in range(len(chunks)))
+            metadatas.extend(
                 {
-                    "recommendationid": review["recommendationid"],
+                    "recommendationid": recommendationid,
                     "language": review["language"],
                     "game": review["game"],
                     "chunk_index": i,  # Add chunk index to metadata
+                    "chunk_count": len(chunks),
+                    "content_hash": content_hash,
                 }
                 for i in range(len(chunks))
-            ]
+            )
+            if previous:
+                # An edited review may have shrunk; drop the chunks it no longer has.
+                stale_ids.extend(
+                    self._chunk_id(recommendationid, i)
+                    for i in range(len(chunks), previous["chunk_count"])
+                )
+        return {
+            "unique_reviews": len(unique_reviews),
+            "new_reviews": new_reviews,
+            "texts": texts,
+            "metadatas": metadatas,
+            "ids": ids,
+            "stale_ids": stale_ids,
+        }
 
-            self.vectorstore.add_texts(texts=chunks, metadatas=metadatas)
+    def _finish_ingest(self, plan: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        """Deletes the stale chunks, updates the keyword index and reports the throughput."""
+        texts, metadatas, ids = plan["texts"], plan["metadatas"], plan["ids"]
+        stale_ids, new_reviews = plan["stale_ids"], plan["new_reviews"]
+        if stale_ids:
+            self.vectorstore._collection.delete(ids=stale_ids)
 
-    def _review_exists(self, recommendationid: str):
-        """Checks if a review with the given recommendation ID already exists in the vector store.
+        if texts or stale_ids:
+            keyword_index = self._get_keyword_index()
+            keyword_index.add(
+                (chunk_id, metadata["game"], text)
+                for chunk_id, metadata, text in zip(ids, metadatas, texts)
+            )
+            keyword_index.remove(stale_ids)
+            keyword_index.save()
+
+        elapsed = time.perf_counter() - start_time
+        stats = {
+            "reviews": len(new_reviews),
+            "skipped": plan["unique_reviews"] - len(new_reviews),
+            "chunks": len(texts),
+            "seconds": elapsed,
+            "reviews_per_second": len(new_reviews) / elapsed if elapsed else 0.0,
+            "chunks_per_second": len(texts) / elapsed if elapsed else 0.0,
+        }
+        print(
+            f"Ingested {stats['reviews']} reviews ({stats['chunks']} chunks, "
+            f"{stats['skipped']} unchanged skipped) in "
+            f"{elapsed:.2f}s: {stats['reviews_per_second']:.1f} reviews/s, "
+            f"{stats['chunks_per_second']:.1f} chunks/s"
+        )
+        return stats
+
+    @staticmethod
+    def _chunk_id(recommendationid: str, chunk_index: int) -> str:
+        """Builds the deterministic Chroma ID of a review chunk.
 
         Args:
             recommendationid (str): The unique recommendation ID of the review.
+            chunk_index (int): The position of the chunk within the review.
 
         Returns:
-            bool: True if the review exists, False otherwise.
+            str: The chunk ID, e.g. '172440169:0'.
         """
-        # Check if any document exists with the given recommendationid
-        results = self.vectorstore.similarity_search(
-            "dummy query",  # The query doesn't matter here
-            k=1,
-            filter={"recommendationid": recommendationid},
+        return f"{recommendationid}:{chunk_index}"
+
+    @staticmethod
+    def _content_hash(review: Dict[str, str]) -> str:
+        """Hashes the review text together with its `timestamp_updated`, when present.
+
+        Args:
+            review (dict): The review dictionary.
+
+        Returns:
+            str: A hex digest that changes whenever the review is edited.
+        """
+        payload = f"{review.get('timestamp_updated', '')}\x00{review['review']}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _stored_review_states(
+        self, recommendationids: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Fetches the stored content hash and chunk count of each review in one key lookup.
+
+        Only the first chunk of every review is read, by its deterministic ID, so no
+        embedding or vector search is involved.
+
+        Args:
+            recommendationids (list): The recommendation IDs to look up.
+
+        Returns:
+            dict: Mapping of stored recommendation IDs to their 'content_hash' and 'chunk_count'.
+        """
+        if not recommendationids:
+            return {}
+        results = self.vectorstore._collection.get(
+            ids=[self._chunk_id(rid, 0) for rid in set(recommendationids)],
+            include=["metadatas"],
         )
-        return len(results) > 0
+        return {
+            metadata["recommendationid"]: {
+                "content_hash": metadata.get("content_hash"),
+                "chunk_count": metadata.get("chunk_count", 0),
+            }
+            for metadata in results["metadatas"]  # type: ignore
+        }
 
     def search(
         self,
         query: str,
         n_results: Optional[int] = 5,
         filter: Optional[Dict[str, str]] = None,
+        mode: str = "dense",
     ):
         """Searches the vector store for reviews similar to the query.
 
+        In "hybrid" mode the dense results are fused with the BM25 keyword results by
+        reciprocal rank fusion, which helps queries with rare literal terms.
+
         Args:
             query (str): The search query.
             n_results (int, optional): The number of results to return. Defaults to 5.
             filter (dict, optional): Additional filters for the search (e.g., by recommendation ID). Defaults to None.
+            mode (str, optional): "dense" for pure vector search or "hybrid" for vector and keyword search. Defaults to "dense".
 
         Returns:
             list: A list of matching documents with their metadata and contents.
+
+        Raises:
+            ValueError: If an unsupported `mode` is provided.
+        """
+        self._check_search_mode(mode)
+        fetch_k = n_results if mode == "dense" else self._fetch_k(n_results)  # type: ignore
+        if self._uses_local_index():
+            dense = self._local_search(
+                self.embeddings.embed_query(query), fetch_k, filter
+            )
+        else:
+            dense = self.vectorstore.similarity_search(query, k=fetch_k, filter=filter)
+        if mode == "dense":
+            return dense
+        return self._fuse_keyword_results(query, dense, n_results, filter)  # type: ignore
+
+    def batch_search(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        filters: Optional[List[Optional[Dict[str, str]]]] = None,
+        mode: str = "dense",
+    ) -> List[List[Document]]:
+        """Searches many queries at once.
+
+        All queries are embedded in a single forward pass and queries sharing the same
+        filter are sent to Chroma in a single `query` call.
+
+        Args:
+            queries (list): The search queries.
+            n_results (int, optional): The number of results to return per query. Defaults to 5.
+            filters (list, optional): One filter per query (e.g. `{"game": "cs2"}`), or None. Defaults to None.
+            mode (str, optional): "dense" or "hybrid", as in `search`. Defaults to "dense".
+
+        Returns:
+            list: For each query, the list of matching documents.
+
+        Raises:
+            ValueError: If an unsupported `mode` is provided.
+        """
+        self._check_search_mode(mode)
+        filters = filters or [None] * len(queries)
+        query_embeddings = self.embeddings.embed_queries(queries)
+        fetch_k = n_results if mode == "dense" else self._fetch_k(n_results)
+
+        groups: Dict[str, List[int]] = {}
+        for position, query_filter in enumerate(filters):
+            groups.setdefault(json.dumps(query_filter, sort_keys=True), []).append(
+                position
+            )
+
+        results: List[List[Document]] = [[] for _ in queries]
+        for positions in groups.values():
+            query_filter = filters[positions[0]]
+            if self._uses_local_index():
+                dense_results = [
+                    self._local_search(query_embeddings[i], fetch_k, query_filter)
+                    for i in positions
+                ]
+            else:
+                response = self.vectorstore._collection.query(
+                    query_embeddings=[query_embeddings[i] for i in positions],  # type: ignore
+                    n_results=fetch_k,
+                    where=query_filter or None,  # type: ignore
+                    include=["documents", "metadatas"],
+                )
+                dense_results = [
+                    [
+                        Document(page_content=text, metadata=metadata)  # type: ignore
+                        for text, metadata in zip(
+                            response["documents"][row], response["metadatas"][row]  # type: ignore
+                        )
+                    ]
+                    for row in range(len(positions))
+                ]
+            for position, dense in zip(positions, dense_results):
+                results[position] = (
+                    dense
+                    if mode == "dense"
+                    else self._fuse_keyword_results(
+                        queries[position], dense, n_results, query_filter
+                    )
+                )
+        return results
+
+    def _uses_local_index(self) -> bool:
+        """True if searches are served by the embedded backend.
+
+        Until the ingest job publishes a first snapshot, the embedded backend falls
+        back to querying Chroma.
+        """
+        return self.local_index is not None and (
+            self.local_index.refresh() or self.local_index.version is not None
+        )
+
+    def _local_search(
+        self,
+        query_embedding: List[float],
+        k: int,
+        filter: Optional[Dict[str, str]],
+    ) -> List[Document]:
+        """Searches the in-process snapshot.
+
+        The 'game' filter selects the game's row range; other equality filters are
+        checked on the metadata of an over-fetched candidate list.
+
+        Args:
+            query_embedding (list): The query embedding.
+            k (int): The number of results to return.
+            filter (dict, optional): Equality filters on the chunk metadata.
+
+        Returns:
+            list: The matching documents, best first.
+        """
+        filter = dict(filter or {})
+        game = filter.pop("game", None)
+        hits = self.local_index.search(  # type: ignore
+            query_embedding, self._fetch_k(k) if filter else k, game=game
+        )
+        documents = [
+            Document(page_content=text, metadata=metadata)
+            for _, text, metadata in self._get_chunks(
+                [chunk_id for chunk_id, _ in hits]
+            )
+            if all(metadata.get(key) == value for key, value in filter.items())
+        ]
+        return documents[:k]
+
+    def _get_chunks(
+        self, chunk_ids: List[str]
+    ) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Fetches chunks by ID from the snapshot or from Chroma, depending on the backend.
+
+        Returns:
+            list: `(chunk_id, text, metadata)` triples for the IDs found.
         """
-        return self.vectorstore.similarity_search(query, k=n_results, filter=filter)  # type: ignore
+        if self._uses_local_index():
+            return self.local_index.get(chunk_ids)  # type: ignore
+        results = self.vectorstore._collection.get(
+            ids=chunk_ids, include=["documents", "metadatas"]
+        )
+        return list(zip(results["ids"], results["documents"], results["metadatas"]))  # type: ignore
+
+    @staticmethod
+    def _check_search_mode(mode: str):
+        """Raises a ValueError for search modes other than "dense" and "hybrid"."""
+        if mode not in ("dense", "hybrid"):
+            raise ValueError(f"Unsupported search mode: {mode}")
+
+    @staticmethod
+    def _fetch_k(n_results: int) -> int:
+        """Number of candidates each retriever contributes to a hybrid search."""
+        return max(4 * n_results, 20)
+
+    def _fuse_keyword_results(
+        self,
+        query: str,
+        dense: List[Document],
+        n_results: int,
+        filter: Optional[Dict[str, str]],
+    ) -> List[Document]:
+        """Fuses dense results with the BM25 results of the query by reciprocal rank fusion.
+
+        Args:
+            query (str): The search query.
+            dense (list): The dense results, best first.
+            n_results (int): The number of results to return.
+            filter (dict, optional): The filter applied to the dense search.
+
+        Returns:
+            list: The fused documents, best first.
+        """
+        keyword = self._get_keyword_index().search(
+            query, k=self._fetch_k(n_results), game=(filter or {}).get("game")
+        )
+
+        documents: Dict[str, Document] = {}
+        scores: Dict[str, float] = {}
+        for rank, document in enumerate(dense):
+            chunk_id = self._chunk_id(
+                document.metadata["recommendationid"], document.metadata["chunk_index"]
+            )
+            documents[chunk_id] = document
+            scores[chunk_id] = 1 / (RRF_K + rank + 1)
+        for rank, (chunk_id, _) in enumerate(keyword):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (RRF_K + rank + 1)
 
-    def get_review(self, recommendationid: str):
+        ranked = sorted(scores, key=lambda chunk_id: -scores[chunk_id])
+        missing = [chunk_id for chunk_id in ranked if chunk_id not in documents]
+        if missing:
+            for chunk_id, text, metadata in self._get_chunks(missing):
+                # The keyword index is only partitioned by game; check the other filters here
+                if all(
+                    metadata.get(key) == value for key, value in (filter or {}).items()
+                ):
+                    documents[chunk_id] = Document(page_content=text, metadata=metadata)
+
+        return [documents[chunk_id] for chunk_id in ranked if chunk_id in documents][
+            :n_results
+        ]
+
+    def get_review(self, recommendationid: str) -> str:
         """Retrieves the full text of a review using the recommendation ID by concatenating all relevant chunks.
 
         Args:
             recommendationid (str): The unique recommendation ID of the review.
 
         Returns:
-            str: The full review text reconstructed from chunks.
+            str: The full review text reconstructed from chunks, or an empty string if the review is not stored.
+        """
+        return self.get_reviews([recommendationid]).get(recommendationid, "")
+
+    def get_reviews(self, recommendationids: List[str]) -> Dict[str, str]:
+        """Retrieves the full text of several reviews with a single key-based fetch.
+
+        Chunks are read with a metadata `get` instead of a similarity search, so no
+        embedding is computed and reviews are never truncated, whatever their number
+        of chunks.
+
+        Args:
+            recommendationids (list): The unique recommendation IDs of the reviews.
+
+        Returns:
+            dict: Mapping of recommendation IDs to their full review text. IDs that are not stored are omitted.
         """
-        chunks = self.vectorstore.similarity_search(
-            "dummy query",  # The query doesn't matter here
-            k=100,  # Set a high number to retrieve all chunks
-            filter={"recommendationid": recommendationid},
+        if not recommendationids:
+            return {}
+        results = self.vectorstore._collection.get(
+            where={"recommendationid": {"$in": list(set(recommendationids))}},
+            include=["documents", "metadatas"],
         )
+
+        chunks_by_review: Dict[str, List[Tuple[int, str]]] = {}
+        for document, metadata in zip(results["documents"], results["metadatas"]):  # type: ignore
+            chunks_by_review.setdefault(metadata["recommendationid"], []).append(
+                (metadata["chunk_index"], document)
+            )
         # Sort chunks by chunk_index and concatenate
-        sorted_chunks = sorted(chunks, key=lambda x: x.metadata["chunk_index"])
-        full_review = " ".join(chunk.page_content for chunk in sorted_chunks)
-        return full_review
+        return {
+            recommendationid: " ".join(text for _, text in sorted(chunks))
+            for recommendationid, chunks in chunks_by_review.items()
+        }
 
     def update_review(self, review: Dict[str, str]):
-        """Updates an existing review by deleting the old one and adding the new one.
+        """Updates an existing review in place.
+
+        Chunk IDs are deterministic, so the upsert overwrites the review's own chunks and
+        removes any trailing chunks the edited text no longer has.
 
         Args:
             review (dict): The updated review dictionary. It should contain:
@@ -151,9 +667,6 @@ class LangChainChromaRAG:
                 - 'game' (str): Name of the game being reviewed.
                 - 'review' (str): The updated review text.
         """
-        # First, remove the existing review
-        self.delete_review(review["recommendationid"])
-        # Then add the updated review
         self.add_game_reviews([review])
 
     def delete_review(self, recommendationid: str):
@@ -162,19 +675,100 @@ class LangChainChromaRAG:
         Args:
             recommendationid (str): The unique recommendation ID of the review.
         """
-        # Get the underlying Chroma collection
+        self.vectorstore._collection.delete(
+            where={"recommendationid": recommendationid}
+        )
+        keyword_index = self._get_keyword_index()
+        keyword_index.remove_review(recommendationid)
+        keyword_index.save()
+
+    def warm_up(self, keyword_index: bool = True) -> Dict[str, float]:
+        """Loads what the first search would otherwise wait for.
+
+        Runs the embedding model once, which loads its weights and initializes its
+        kernels, and opens the connection to Chroma. The embedded backend also loads
+        its latest snapshot, and hybrid search its keyword index.
+
+        Args:
+            keyword_index (bool, optional): Load the keyword index too. Defaults to True.
+
+        Returns:
+            Dict[str, float]: Seconds spent on each step.
+        """
+        timings = {}
+        start = time.perf_counter()
+        # Bypasses the cache, which would otherwise keep the warm-up text
+        self.embeddings.base_embeddings.embed_query("warm-up")
+        timings['embedding_model'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.chroma_client.heartbeat()
+        timings['chroma'] = time.perf_counter() - start
+
+        if self.local_index is not None:
+            start = time.perf_counter()
+            self._uses_local_index()
+            timings['snapshot'] = time.perf_counter() - start
+        if keyword_index:
+            start = time.perf_counter()
+            self._get_keyword_index()
+            timings['keyword_index'] = time.perf_counter() - start
+        return timings
+
+    def publish_snapshot(self) -> str:
+        """Exports the whole collection as a new snapshot for the embedded backend.
+
+        Called by the ingest job after each sync; every process using the embedded
+        backend picks up the new snapshot on its next refresh.
+
+        Returns:
+            str: The version of the published snapshot.
+        """
         collection = self.vectorstore._collection
+        page_size = self.chroma_client.get_max_batch_size()
+        ids, embeddings, documents, metadatas = [], [], [], []
+        for offset in range(0, collection.count(), page_size):
+            results = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                offset=offset,
+                limit=page_size,
+            )
+            ids.extend(results["ids"])
+            embeddings.extend(results["embeddings"])  # type: ignore
+            documents.extend(results["documents"])  # type: ignore
+            metadatas.extend(results["metadatas"])  # type: ignore
 
-        # Query for documents with the given recommendationid
-        results = collection.get(
-            where={"recommendationid": recommendationid}, include=["metadatas"]
+        version = publish_snapshot(
+            self.snapshot_dir, ids, embeddings, documents, metadatas
         )
+        print(f"Published vector snapshot {version} with {len(ids)} chunks")
+        return version
 
-        # Extract the ids from the metadatas
-        ids_to_delete = [id for id in results["ids"] if id]
+    def _get_keyword_index(self) -> BM25Index:
+        """Returns the keyword index, loading it from disk or rebuilding it from Chroma on first use.
 
-        # Delete the documents by their ids
-        if ids_to_delete:
-            collection.delete(ids=ids_to_delete)
-        else:
-            print(f"No documents found with recommendationid: {recommendationid}")
+        Later calls reload the file when the ingest job has rewritten it.
+
+        Returns:
+            BM25Index: The keyword index in sync with the collection.
+        """
+        if self._keyword_index_loaded:
+            self.keyword_index.refresh()
+            return self.keyword_index
+
+        if not self.keyword_index.load():
+            collection = self.vectorstore._collection
+            page_size = self.chroma_client.get_max_batch_size()
+            for offset in range(0, collection.count(), page_size):
+                results = collection.get(
+                    include=["documents", "metadatas"], offset=offset, limit=page_size
+                )
+                self.keyword_index.add(
+                    (chunk_id, metadata["game"], document)
+                    for chunk_id, metadata, document in zip(
+                        results["ids"], results["metadatas"], results["documents"]  # type: ignore
+                    )
+                )
+            self.keyword_index.save()
+        self._keyword_index_loaded = True
+        return self.keyword_index
@@ -0,0 +1,4 @@
+from .batch_qa import RateLimiter, run_batch_qa
+from .retrieval_benchmark import run_benchmark, load_ground_truth
+
+__all__ = ['run_benchmark', 'load_ground_truth', 'run_batch_qa', 'RateLimiter']
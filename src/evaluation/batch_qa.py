@@ -0,0 +1,374 @@
+import os
+import sys
+
+sys.path.append('src/')
+
+import json
+import time
+import hashlib
+import argparse
+import threading
+from typing import Any, Dict, List, Tuple, Optional
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from langchain_core.documents import Document
+
+from db import LangChainChromaRAG
+from utils import calculate_cost
+from models import ModelEnum, RelevanceEnum
+from evaluation.retrieval_benchmark import load_ground_truth
+from processing import ContextBuilder, LLMClientRegistry, QuestionAnswering
+
+COLLECTION_NAME = 'steam_reviews'
+PROMPT_ASSISTANT_PATH = "prompts/prompt_assistant.j2"
+RELEVANCE_EVAL_PATH = "prompts/relevance_eval.j2"
+
+# Requests per minute allowed by default, per provider; None is unlimited
+DEFAULT_REQUESTS_PER_MINUTE: Dict[str, Optional[float]] = {
+    'openai': 500,
+    'groq': 30,
+    'ollama': None,
+}
+
+COLUMNS = [
+    "question",
+    "game",
+    "model",
+    "answer",
+    "relevance",
+    "relevance_explanation",
+    "context_documents",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "eval_prompt_tokens",
+    "eval_completion_tokens",
+    "eval_total_tokens",
+    "model_cost",
+    "retrieval_time",
+    "response_time",
+    "evaluation_time",
+    "error",
+]
+
+
+class RateLimiter:
+    """
+    A thread-safe token bucket allowing `requests_per_minute` calls, in bursts of up to `burst`.
+
+    Attributes:
+        requests_per_minute (float): Sustained rate, or None for no limit.
+        burst (int): Number of calls that can be made back to back.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float], burst: int = 1) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a call is allowed."""
+        if not self.requests_per_minute:
+            return
+        rate = self.requests_per_minute / 60
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / rate
+            time.sleep(wait)
+
+
+def row_key(question: str, game: Optional[str], model: str) -> str:
+    """Identifies a row in the checkpoint, independently of its position in the input."""
+    return hashlib.sha1(f"{model}\n{game}\n{question}".encode('utf-8')).hexdigest()
+
+
+def load_checkpoint(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Reads the rows completed by previous runs, keyed by `row_key`.
+
+    A line cut short by an interrupted run is ignored.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    rows = {}
+    with open(path, 'r', encoding='utf-8') as f_in:
+        for line in f_in:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            rows[row["key"]] = row
+    return rows
+
+
+def provider_of(qa: QuestionAnswering) -> str:
+    """Guesses the provider of a `QuestionAnswering` from its client."""
+    client = qa._model
+    if type(client).__name__ == 'Groq':
+        return 'groq'
+    if 'localhost:11434' in str(getattr(client, 'base_url', '')):
+        return 'ollama'
+    return 'openai'
+
+
+def evaluate(
+    qa: QuestionAnswering, question: str, answer: str
+) -> Tuple[str, str, Dict[str, int]]:
+    """Evaluates the relevance of an answer.
+
+    Returns:
+        tuple: The relevance, its explanation and the token usage of the evaluation. The relevance is FAILED when the response cannot be parsed.
+    """
+    response = qa.evaluate_relevance(question, answer)
+    usage = {
+        key: getattr(response.usage, key, 0) or 0
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens")
+    }
+    try:
+        evaluation = QuestionAnswering.parse_evaluation(
+            response.choices[0].message.content
+        )
+        return evaluation["Relevance"], evaluation.get("Explanation", ""), usage
+    except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as err:
+        return RelevanceEnum.FAILED.value, f"Unparsable evaluation: {err}", usage
+
+
+def run_batch_qa(
+    pairs: List[Tuple[str, Optional[str]]],
+    qa: QuestionAnswering,
+    context_builder: ContextBuilder,
+    checkpoint_path: Optional[str] = None,
+    max_in_flight: int = 4,
+    requests_per_minute: Optional[float] = None,
+    provider: Optional[str] = None,
+    retrieval_batch_size: int = 32,
+    mode: str = "dense",
+    evaluate_relevance: bool = True,
+) -> pd.DataFrame:
+    """Answers many questions offline, as the chat would, and collects one row per question.
+
+    Questions are retrieved in batches of `retrieval_batch_size` with `batch_search`,
+    which embeds a whole batch in a single forward pass, and each result goes through
+    the same `ContextBuilder.assemble` as the chat. Answers (and their relevance
+    evaluation) are requested on `max_in_flight` threads, throttled to the provider's
+    rate limit, while the next batch is retrieved. Every completed row is appended to
+    the JSONL checkpoint, so an interrupted run resumes with the questions left.
+
+    Args:
+        pairs (list): `(question, game)` pairs; a None game searches every game.
+        qa (QuestionAnswering): Client and model answering the questions.
+        context_builder (ContextBuilder): Retriever and context assembly of the chat.
+        checkpoint_path (str, optional): JSONL file of completed rows. Defaults to None, no checkpoint.
+        max_in_flight (int, optional): Maximum number of concurrent LLM calls. Defaults to 4.
+        requests_per_minute (float, optional): Rate limit of the LLM calls. Defaults to the provider's in `DEFAULT_REQUESTS_PER_MINUTE`.
+        provider (str, optional): 'openai', 'groq' or 'ollama'. Defaults to the one of `qa`'s client.
+        retrieval_batch_size (int, optional): Number of questions per `batch_search`. Defaults to 32.
+        mode (str, optional): Search mode, "dense" or "hybrid". Defaults to "dense".
+        evaluate_relevance (bool, optional): Whether to evaluate the relevance of each answer. Defaults to True.
+
+    Returns:
+        pd.DataFrame: One row per pair, in input order, with the columns in `COLUMNS`.
+    """
+    provider = provider or provider_of(qa)
+    if requests_per_minute is None:
+        requests_per_minute = DEFAULT_REQUESTS_PER_MINUTE.get(provider)
+    limiter = RateLimiter(requests_per_minute, burst=max_in_flight)
+
+    keys = [row_key(question, game, qa.model_name) for question, game in pairs]
+    done = load_checkpoint(checkpoint_path)
+    pending: Dict[str, Tuple[str, Optional[str]]] = {}
+    for key, pair in zip(keys, pairs):
+        if key not in done:
+            pending.setdefault(key, pair)
+
+    failed: Dict[str, Dict[str, Any]] = {}
+    lock = threading.Lock()
+    checkpoint = None
+    if checkpoint_path:
+        os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+        checkpoint = open(checkpoint_path, 'a', encoding='utf-8')
+
+    def answer(
+        key: str,
+        question: str,
+        game: Optional[str],
+        context: List[Document],
+        retrieval_time: float,
+    ):
+        row: Dict[str, Any] = {
+            "key": key,
+            "question": question,
+            "game": game,
+            "model": qa.model_name,
+            "context_documents": len(context),
+            "retrieval_time": retrieval_time,
+        }
+        try:
+            limiter.acquire()
+            start = time.perf_counter()
+            response = qa.generate_answer(question, context)
+            row["response_time"] = time.perf_counter() - start
+            row["answer"] = response.choices[0].message.content
+            usage = {
+                name: getattr(response.usage, name, 0) or 0
+                for name in ("prompt_tokens", "completion_tokens", "total_tokens")
+            }
+            row.update(usage)
+            row["model_cost"] = calculate_cost(tokens=usage, model=qa.model_name)
+
+            if evaluate_relevance:
+                limiter.acquire()
+                start = time.perf_counter()
+                relevance, explanation, eval_usage = evaluate(
+                    qa, question, row["answer"]
+                )
+                row["evaluation_time"] = time.perf_counter() - start
+                row["relevance"] = relevance
+                row["relevance_explanation"] = explanation
+                row.update({f"eval_{k}": v for k, v in eval_usage.items()})
+        except Exception as err:
+            print(f"Error answering '{question}': {str(err)}")
+            # Failed rows are not checkpointed, so a resumed run retries them
+            row["error"] = str(err)
+            with lock:
+                failed[key] = row
+            return
+
+        with lock:
+            done[key] = row
+            if checkpoint is not None:
+                checkpoint.write(json.dumps(row, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+
+    items = list(pending.items())
+    try:
+        with ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="batch-qa"
+        ) as executor:
+            for offset in range(0, len(items), retrieval_batch_size):
+                batch = items[offset : offset + retrieval_batch_size]
+                start = time.perf_counter()
+                results = context_builder.rag.batch_search(
+                    [question for _, (question, _) in batch],
+                    n_results=context_builder.fetch_k,
+                    filters=[
+                        {'game': game} if game else None for _, (_, game) in batch
+                    ],
+                    mode=mode,
+                )
+                # Every question is charged its share of the batch search
+                retrieval_time = (time.perf_counter() - start) / len(batch)
+                for (key, (question, game)), candidates in zip(batch, results):
+                    context = context_builder.assemble(candidates, qa.model_name)
+                    executor.submit(
+                        answer, key, question, game, context, retrieval_time
+                    )
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    rows = [done.get(key) or failed.get(key) for key in keys]
+    return pd.DataFrame(
+        [{column: row.get(column) for column in COLUMNS} for row in rows],
+        columns=COLUMNS,
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Answer the ground-truth questions offline and report answers, relevance, tokens, cost and latency."
+    )
+    parser.add_argument(
+        "--ground-truth", default="data/processed/ground-truth-retrieval.csv"
+    )
+    parser.add_argument(
+        "--model",
+        choices=[model.value for model in ModelEnum],
+        default=ModelEnum.OPEN_AI.value,
+    )
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--mode", choices=["dense", "hybrid"], default="dense")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--requests-per-minute", type=float, default=None)
+    parser.add_argument("--no-relevance", action="store_true")
+    parser.add_argument("--chroma-host", default=os.getenv("CHROMA_HOST", "localhost"))
+    parser.add_argument(
+        "--embedding-model", default='sentence-transformers/all-MiniLM-L6-v2'
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="JSONL checkpoint of completed rows. Defaults to data/benchmarks/batch-qa-<model>.jsonl",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="CSV file for the results. Defaults to data/benchmarks/batch-qa-<timestamp>.csv",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    questions = load_ground_truth(args.ground_truth, args.limit)
+    rag = LangChainChromaRAG(
+        collection_name=COLLECTION_NAME,
+        chroma_host=args.chroma_host,
+        embedding_model_name=args.embedding_model,
+    )
+    clients = LLMClientRegistry()
+    qa = QuestionAnswering(
+        clients.get(args.model),
+        PROMPT_ASSISTANT_PATH,
+        RELEVANCE_EVAL_PATH,
+        args.model.split("/")[1],
+    )
+
+    checkpoint = args.checkpoint or os.path.join(
+        "data", "benchmarks", f"batch-qa-{args.model.replace('/', '-')}.jsonl"
+    )
+    try:
+        results = run_batch_qa(
+            [(q["question"], q["game"]) for q in questions],
+            qa,
+            ContextBuilder(rag),
+            checkpoint_path=checkpoint,
+            max_in_flight=args.max_in_flight,
+            requests_per_minute=args.requests_per_minute,
+            provider=args.model.split("/")[0],
+            mode=args.mode,
+            evaluate_relevance=not args.no_relevance,
+        )
+    finally:
+        clients.close()
+
+    output = args.output or os.path.join(
+        "data", "benchmarks", f"batch-qa-{datetime.now():%Y%m%d-%H%M%S}.csv"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    results.to_csv(output, index=False)
+
+    answered = results[results["error"].isna()]
+    print(
+        f"answered={len(answered)}/{len(results)} "
+        f"relevance={answered['relevance'].value_counts().to_dict()} "
+        f"tokens={int(answered['total_tokens'].sum())} "
+        f"cost=${answered['model_cost'].sum():.4f} "
+        f"p50={answered['response_time'].median():.2f}s"
+    )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
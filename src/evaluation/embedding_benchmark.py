@@ -0,0 +1,192 @@
+import os
+import sys
+
+sys.path.append('src/')
+
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Tuple, Callable, Optional
+from datetime import datetime
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from db.onnx_embeddings import (
+    DEFAULT_ONNX_MODEL_DIR,
+    OnnxEmbeddings,
+    export_onnx_model,
+)
+from evaluation.retrieval_benchmark import git_commit, load_ground_truth
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+def cosine_parity(
+    reference: Embeddings, candidate: Embeddings, texts: List[str]
+) -> Dict[str, float]:
+    """Compares the query vectors of two embedding backends, text by text.
+
+    Args:
+        reference (Embeddings): The backend the stored vectors come from.
+        candidate (Embeddings): The backend under test.
+        texts (list): The queries to embed with both.
+
+    Returns:
+        Dict[str, float]: The minimum, 1st percentile and mean cosine similarity.
+    """
+    expected = np.array([reference.embed_query(text) for text in texts])
+    actual = np.array([candidate.embed_query(text) for text in texts])
+    cosines = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    return {
+        "min": float(cosines.min()),
+        "p1": float(np.percentile(cosines, 1)),
+        "mean": float(cosines.mean()),
+    }
+
+
+def time_backend(
+    load: Callable[[], Embeddings], texts: List[str], batch_size: int = 32
+) -> Tuple[Embeddings, Dict[str, float]]:
+    """Measures the load time, single-query latency and batch throughput of a backend.
+
+    Args:
+        load (callable): Imports and loads the backend.
+        texts (list): The texts to embed.
+        batch_size (int, optional): Number of texts per `embed_documents` call. Defaults to 32.
+
+    Returns:
+        tuple: The loaded backend, and its timings.
+    """
+    start = time.perf_counter()
+    embeddings = load()
+    load_seconds = time.perf_counter() - start
+    embeddings.embed_query(texts[0])  # Warm-up
+
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        embeddings.embed_query(text)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for offset in range(0, len(texts), batch_size):
+        embeddings.embed_documents(texts[offset : offset + batch_size])
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return embeddings, {
+        "load_seconds": load_seconds,
+        "query_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "query_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "texts_per_second": len(texts) / elapsed if elapsed else 0.0,
+    }
+
+
+def load_torch(model_name: str) -> Embeddings:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Check the ONNX int8 embeddings against torch and compare their speed."
+    )
+    parser.add_argument(
+        "--ground-truth", default="data/processed/ground-truth-retrieval.csv"
+    )
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--onnx-model-dir", default=DEFAULT_ONNX_MODEL_DIR)
+    parser.add_argument(
+        "--export", action="store_true", help="Export the ONNX model first"
+    )
+    parser.add_argument(
+        "--export-only", action="store_true", help="Export the ONNX model and exit"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.98,
+        help="Minimum cosine similarity to the torch vectors",
+    )
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="JSON file for the results. Defaults to data/benchmarks/embeddings-<timestamp>.json",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.export or args.export_only:
+        export_onnx_model(args.model, args.onnx_model_dir)
+        print(f"Exported {args.model} to {args.onnx_model_dir}")
+        if args.export_only:
+            return 0
+    questions = [
+        q["question"] for q in load_ground_truth(args.ground_truth, args.limit)
+    ]
+
+    backends: Dict[str, Callable[[], Embeddings]] = {
+        "torch": lambda: load_torch(args.model),
+        "onnx-fp32": lambda: OnnxEmbeddings(args.onnx_model_dir, quantized=False),
+        "onnx-int8": lambda: OnnxEmbeddings(args.onnx_model_dir),
+    }
+    loaded: Dict[str, Embeddings] = {}
+    timings: Dict[str, Dict[str, Any]] = {}
+    for name, load in backends.items():
+        loaded[name], timings[name] = time_backend(load, questions, args.batch_size)
+
+    parity = {
+        name: cosine_parity(loaded["torch"], loaded[name], questions)
+        for name in ("onnx-fp32", "onnx-int8")
+    }
+    passed = parity["onnx-int8"]["min"] >= args.threshold
+
+    report = {
+        "config": {
+            "ground_truth": args.ground_truth,
+            "questions": len(questions),
+            "model": args.model,
+            "threshold": args.threshold,
+            "batch_size": args.batch_size,
+            "git_commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+        },
+        "timings": timings,
+        "parity": parity,
+        "passed": passed,
+    }
+    output = args.output or os.path.join(
+        "data", "benchmarks", f"embeddings-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f_out:
+        json.dump(report, f_out, indent=2)
+
+    print(
+        f"{'backend':<10} {'load':>8} {'p50':>9} {'p95':>9} {'texts/s':>9} {'min cos':>8}"
+    )
+    for name, timing in timings.items():
+        cosine = parity[name]["min"] if name in parity else 1.0
+        print(
+            f"{name:<10} {timing['load_seconds']:>7.2f}s "
+            f"{timing['query_p50_ms']:>7.2f}ms {timing['query_p95_ms']:>7.2f}ms "
+            f"{timing['texts_per_second']:>9.1f} {cosine:>8.4f}"
+        )
+    print(
+        f"Parity {'passed' if passed else 'FAILED'}: int8 min cosine "
+        f"{parity['onnx-int8']['min']:.4f} (threshold {args.threshold})"
+    )
+    print(f"Results written to {output}")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import os
+import sys
+
+sys.path.append('src/')
+
+import csv
+import json
+import time
+import argparse
+import subprocess
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from db import LangChainChromaRAG
+
+COLLECTION_NAME = 'steam_reviews'
+
+
+def load_ground_truth(path: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+    """Loads a ground-truth CSV mapping questions to the review that answers them.
+
+    Both layouts in `data/processed` are supported: `id,question,recommendationid,game`
+    and `id,question`, where `id` is the recommendation ID and the game is unknown.
+
+    Args:
+        path (str): Path of the CSV file.
+        limit (int, optional): Only keep the first `limit` questions. Defaults to None.
+
+    Returns:
+        List[Dict[str, str]]: One dict per question with 'question', 'recommendationid' and 'game' (None when unknown).
+    """
+    with open(path, 'r', encoding='utf-8') as f_in:
+        rows = [
+            {
+                "question": row["question"],
+                "recommendationid": row.get("recommendationid") or row["id"],
+                "game": row.get("game") or None,
+            }
+            for row in csv.DictReader(f_in)
+        ]
+    return rows[:limit] if limit else rows
+
+
+def rank_of(recommendationid: str, documents: List[Any]) -> Optional[int]:
+    """Returns the 1-based rank of the first chunk of the expected review, or None."""
+    for rank, document in enumerate(documents, start=1):
+        if document.metadata["recommendationid"] == recommendationid:
+            return rank
+    return None
+
+
+def summarize(
+    ranks: List[Optional[int]], latencies: List[float], elapsed: Optional[float] = None
+) -> Dict[str, float]:
+    """Computes hit rate, MRR and latency percentiles.
+
+    Args:
+        ranks (list): Rank of the expected review for every question, None on a miss.
+        latencies (list): Latency of every search request, in seconds.
+        elapsed (float, optional): Wall-clock duration of the run, used for queries/second.
+
+    Returns:
+        Dict[str, float]: The metrics.
+    """
+    latencies_ms = np.array(latencies) * 1000
+    summary = {
+        "questions": len(ranks),
+        "hit_rate": sum(rank is not None for rank in ranks) / len(ranks),
+        "mrr": sum(1 / rank for rank in ranks if rank is not None) / len(ranks),
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+    if elapsed:
+        summary["queries_per_second"] = len(ranks) / elapsed
+    return summary
+
+
+def run_benchmark(
+    rag: LangChainChromaRAG,
+    questions: List[Dict[str, str]],
+    k: int = 5,
+    mode: str = "dense",
+    batch_size: int = 1,
+    concurrency: int = 1,
+) -> Dict[str, Any]:
+    """Runs every question through the retriever and measures quality and speed.
+
+    Questions are split into batches of `batch_size`, searched with `search` (batches
+    of one) or `batch_search`, and the batches are spread over `concurrency` threads.
+    Every question of a batch is charged the latency of the whole batch.
+
+    Args:
+        rag (LangChainChromaRAG): The retriever under test.
+        questions (list): The ground-truth questions, as returned by `load_ground_truth`.
+        k (int, optional): Number of results retrieved per question. Defaults to 5.
+        mode (str, optional): Search mode, "dense" or "hybrid". Defaults to "dense".
+        batch_size (int, optional): Number of questions per search request. Defaults to 1.
+        concurrency (int, optional): Number of requests in flight. Defaults to 1.
+
+    Returns:
+        Dict[str, Any]: Overall metrics and the same metrics broken down by game.
+    """
+    batches = [
+        questions[offset : offset + batch_size]
+        for offset in range(0, len(questions), batch_size)
+    ]
+
+    def search(batch):
+        filters = [{"game": q["game"]} if q["game"] else None for q in batch]
+        start = time.perf_counter()
+        if len(batch) == 1:
+            results = [rag.search(batch[0]["question"], k, filters[0], mode=mode)]
+        else:
+            results = rag.batch_search(
+                [q["question"] for q in batch], k, filters, mode=mode
+            )
+        latency = time.perf_counter() - start
+        return [
+            (question, rank_of(question["recommendationid"], documents), latency)
+            for question, documents in zip(batch, results)
+        ]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = [row for rows in executor.map(search, batches) for row in rows]
+    elapsed = time.perf_counter() - start
+
+    by_game: Dict[str, List] = {}
+    for question, rank, latency in outcomes:
+        by_game.setdefault(question["game"] or "unknown", []).append((rank, latency))
+
+    return {
+        "overall": summarize(
+            [rank for _, rank, _ in outcomes],
+            [latency for _, _, latency in outcomes],
+            elapsed,
+        ),
+        "by_game": {
+            game: summarize(
+                [rank for rank, _ in rows], [latency for _, latency in rows]
+            )
+            for game, rows in sorted(by_game.items())
+        },
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Returns the current git commit, so results can be compared across commits."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark retrieval quality and latency against a ground-truth CSV."
+    )
+    parser.add_argument(
+        "--ground-truth", default="data/processed/ground-truth-retrieval.csv"
+    )
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--mode", choices=["dense", "hybrid"], default="dense")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--chroma-host", default=os.getenv("CHROMA_HOST", "localhost"))
+    parser.add_argument(
+        "--embedding-model", default='sentence-transformers/all-MiniLM-L6-v2'
+    )
+    parser.add_argument(
+        "--embedding-backend",
+        choices=["torch", "onnx"],
+        default=os.getenv("EMBEDDING_BACKEND", "torch"),
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="JSON file for the results. Defaults to data/benchmarks/retrieval-<timestamp>.json",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    questions = load_ground_truth(args.ground_truth, args.limit)
+    rag = LangChainChromaRAG(
+        collection_name=COLLECTION_NAME,
+        chroma_host=args.chroma_host,
+        embedding_model_name=args.embedding_model,
+        embedding_backend=args.embedding_backend,
+    )
+
+    results = run_benchmark(
+        rag,
+        questions,
+        k=args.k,
+        mode=args.mode,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+    )
+    report = {
+        "config": {
+            "ground_truth": args.ground_truth,
+            "k": args.k,
+            "mode": args.mode,
+            "batch_size": args.batch_size,
+            "concurrency": args.concurrency,
+            "embedding_model": args.embedding_model,
+            "embedding_backend": args.embedding_backend,
+            "chunk_size": rag.text_splitter._chunk_size,
+            "chunk_overlap": rag.text_splitter._chunk_overlap,
+            "git_commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+        },
+        **results,
+    }
+
+    output = args.output or os.path.join(
+        "data", "benchmarks", f"retrieval-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f_out:
+        json.dump(report, f_out, indent=2)
+
+    overall = results["overall"]
+    print(
+        f"hit_rate@{args.k}={overall['hit_rate']:.3f} mrr@{args.k}={overall['mrr']:.3f} "
+        f"p50={overall['latency_p50_ms']:.1f}ms p95={overall['latency_p95_ms']:.1f}ms "
+        f"p99={overall['latency_p99_ms']:.1f}ms qps={overall['queries_per_second']:.1f}"
+    )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
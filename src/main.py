@@ -1,22 +1,30 @@
 import os
-import json
 import time
 import uuid
 import logging
 import warnings
-from typing import Any, Dict, Union
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Union
 
 import streamlit as st
-from groq import Groq
 from dotenv import load_dotenv
-from openai import OpenAI
-from sqlalchemy.exc import SQLAlchemyError, OperationalError, ProgrammingError
 from streamlit_feedback import streamlit_feedback
 
-from db import DataBaseConnector, LangChainChromaRAG
-from utils import calculate_cost
-from models import FeedBack, ModelEnum, Conversation
-from processing import QuestionAnswering
+from utils import StageTimer, BackgroundLoader, calculate_cost
+from models import FeedBack, ModelEnum, AnswerCache, Conversation, RelevanceEnum
+
+# Imported on first use, from the warm-up thread: they take seconds to import
+if TYPE_CHECKING:
+    from db import DataBaseConnector, LangChainChromaRAG
+    from processing import (
+        MetricsRollup,
+        ContextBuilder,
+        RelevanceWorker,
+        LLMClientRegistry,
+        QuestionAnswering,
+        WriteBehindBuffer,
+        SemanticAnswerCache,
+    )
 
 warnings.filterwarnings('ignore')
 load_dotenv()
@@ -31,151 +39,397 @@ logger = logging.getLogger(__name__)
 COLLECTION_NAME = 'steam_reviews'
 PROMPT_ASSISTANT_PATH = "prompts/prompt_assistant.j2"
 RELEVANCE_EVAL_PATH = "prompts/relevance_eval.j2"
+RELEVANCE_EVAL_BATCH_PATH = "prompts/relevance_eval_batch.j2"
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "http")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+METRICS_ROLLUP_INTERVAL = float(os.getenv("METRICS_ROLLUP_INTERVAL", "60"))
+# Resources a question needs, in their loading order
+REQUIRED_RESOURCES = (
+    "db_connector",
+    "write_buffer",
+    "llm_clients",
+    "vector_store",
+    "context_builder",
+    "answer_cache",
+    "relevance_worker",
+)
 
 
 class ChatbotApp:
     def __init__(self):
-        self.db_connector = self._get_db_connection()
-        self.vector_store = self._load_vector_store()
+        # The page renders right away; each resource is awaited where it is first used
+        self.loader = self._start_loader()
 
     @staticmethod
     @st.cache_resource
-    def _load_vector_store() -> LangChainChromaRAG:
-        """Load and cache the vector store."""
+    def _start_loader() -> BackgroundLoader:
+        """Start loading the shared resources in a background thread, once per process."""
+        logger.info("Starting background warm-up...")
+        loader = BackgroundLoader()
+        loader.add("db_connector", ChatbotApp._get_db_connection)
+        loader.add(
+            "write_buffer",
+            lambda: ChatbotApp._load_write_buffer(loader.get("db_connector")),
+        )
+        loader.add("llm_clients", ChatbotApp._load_llm_clients)
+        loader.add("vector_store", ChatbotApp._load_vector_store)
+        loader.add(
+            "context_builder",
+            lambda: ChatbotApp._load_context_builder(loader.get("vector_store")),
+        )
+        loader.add(
+            "answer_cache",
+            lambda: ChatbotApp._load_answer_cache(
+                loader.get("db_connector"), loader.get("write_buffer")
+            ),
+        )
+        loader.add(
+            "relevance_worker",
+            lambda: ChatbotApp._load_relevance_worker(
+                loader.get("db_connector"), loader.get("write_buffer")
+            ),
+        )
+        loader.add(
+            "metrics_rollup",
+            lambda: ChatbotApp._load_metrics_rollup(loader.get("db_connector")),
+        )
+        # Last, so that a failure here leaves every resource usable
+        loader.add(
+            "vector_store_warm_up",
+            lambda: loader.get("vector_store").warm_up(
+                keyword_index=SEARCH_MODE == "hybrid"
+            ),
+        )
+        return loader.start()
+
+    @property
+    def db_connector(self) -> "DataBaseConnector":
+        return self.loader.get("db_connector")
+
+    @property
+    def vector_store(self) -> "LangChainChromaRAG":
+        return self.loader.get("vector_store")
+
+    @property
+    def context_builder(self) -> "ContextBuilder":
+        return self.loader.get("context_builder")
+
+    @property
+    def write_buffer(self) -> "WriteBehindBuffer":
+        return self.loader.get("write_buffer")
+
+    @property
+    def relevance_worker(self) -> "RelevanceWorker":
+        return self.loader.get("relevance_worker")
+
+    @property
+    def answer_cache(self) -> "SemanticAnswerCache":
+        return self.loader.get("answer_cache")
+
+    @property
+    def llm_clients(self) -> "LLMClientRegistry":
+        return self.loader.get("llm_clients")
+
+    @staticmethod
+    def _load_vector_store() -> "LangChainChromaRAG":
+        """Load the vector store and its embedding model."""
+        from db import LangChainChromaRAG
+
         logger.info("Loading vector store...")
         return LangChainChromaRAG(
-            collection_name=COLLECTION_NAME, chroma_host='chromadb'
+            collection_name=COLLECTION_NAME,
+            chroma_host='chromadb',
+            backend=VECTOR_BACKEND,
+            embedding_backend=EMBEDDING_BACKEND,
+        )
+
+    @staticmethod
+    def _load_context_builder(vector_store: "LangChainChromaRAG") -> "ContextBuilder":
+        """Create the context builder over the vector store."""
+        from processing import ContextBuilder
+
+        return ContextBuilder(vector_store)
+
+    @staticmethod
+    def _load_write_buffer(db_connector: "DataBaseConnector") -> "WriteBehindBuffer":
+        """Start the write-behind buffer of conversations, feedback and cached answers."""
+        from processing import WriteBehindBuffer
+
+        logger.info("Starting write buffer...")
+        return WriteBehindBuffer(
+            db_connector, models=(Conversation, FeedBack, AnswerCache)
         )
 
     @staticmethod
-    def _get_db_connection() -> DataBaseConnector:
-        """Create and return a database connection."""
+    def _load_relevance_worker(
+        db_connector: "DataBaseConnector", write_buffer: "WriteBehindBuffer"
+    ) -> "RelevanceWorker":
+        """Start the background relevance worker."""
+        from processing import RelevanceWorker
+
+        logger.info("Starting relevance worker...")
+        return RelevanceWorker(db_connector, write_buffer=write_buffer)
+
+    @staticmethod
+    def _load_answer_cache(
+        db_connector: "DataBaseConnector", write_buffer: "WriteBehindBuffer"
+    ) -> "SemanticAnswerCache":
+        """Create the semantic answer cache."""
+        from processing import SemanticAnswerCache
+
+        logger.info("Loading answer cache...")
+        return SemanticAnswerCache(db_connector, write_buffer=write_buffer)
+
+    @staticmethod
+    def _load_metrics_rollup(db_connector: "DataBaseConnector") -> "MetricsRollup":
+        """Refresh the dashboard rollups in the background, unless a scheduled job does."""
+        from processing import MetricsRollup
+
+        rollup = MetricsRollup(db_connector)
+        if METRICS_ROLLUP_INTERVAL > 0:
+            logger.info("Starting metrics rollup...")
+            rollup.start(interval=METRICS_ROLLUP_INTERVAL)
+        return rollup
+
+    @staticmethod
+    def _get_db_connection() -> "DataBaseConnector":
+        """Create the shared database connection pool."""
+        from db import DataBaseConnector
+
         logger.info("Establishing database connection...")
-        return DataBaseConnector(
+        statement_timeout = os.getenv("DB_STATEMENT_TIMEOUT_MS")
+        return DataBaseConnector.shared(
             db_type=os.getenv("DB_TYPE", "sqlite"),
             host=os.getenv("DB_HOST", "localhost"),
             port=os.getenv("DB_PORT"),
             database=os.getenv("DB_NAME"),
             user=os.getenv("DB_USER"),
             password=os.getenv("DB_PASSWORD"),
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            statement_timeout=int(statement_timeout) if statement_timeout else None,
         )
 
+    @staticmethod
+    def _load_llm_clients() -> "LLMClientRegistry":
+        """Create the shared LLM clients and warm up their connections."""
+        from processing import LLMClientRegistry
+
+        logger.info("Creating LLM clients...")
+        registry = LLMClientRegistry()
+        threading.Thread(target=registry.warm_up, daemon=True).start()
+        return registry
+
     def _get_model(self, model_name: str) -> Any:
-        """Get the appropriate model based on the selected name."""
-        models_dict = {
-            "ollama": OpenAI(base_url="http://localhost:11434/v1", api_key="ollama"),
-            "groq": Groq(),
-            "openai": OpenAI(),
-        }
-        return models_dict.get(model_name.split("/")[0])
+        """Get the shared client of the selected model's provider."""
+        return self.llm_clients.get(model_name)
 
-    def _submit_feedback(self, user_response: Dict[str, Any], conversation_id: str):
-        """Submit user feedback to the database."""
+    def _submit_feedback(
+        self, user_response: Dict[str, Any], conversation: Conversation
+    ):
+        """Queue user feedback for the database, once the conversation has its ID."""
         score = 0 if user_response["score"] == "👎" else 1
-        try:
-            with self.db_connector.create_session() as session:
-                feedback = FeedBack(
-                    conversation_id=conversation_id,
+
+        def add_feedback(conversation: Conversation):
+            self.write_buffer.add(
+                FeedBack(
+                    conversation_id=conversation.id,
                     feedback_score=score,
                     feedback_comment=user_response["text"],
                 )
-                session.add(feedback)
-                session.commit()
-            logger.info(f"Feedback submitted for conversation {conversation_id}")
-        except SQLAlchemyError as err:
-            logger.error(f"Database error while submitting feedback: {str(err)}")
+            )
+            logger.info(f"Feedback submitted for conversation {conversation.id}")
+
+        try:
+            self.write_buffer.when_assigned(conversation, add_feedback)
+        except Exception as err:
+            logger.error(f"Error while submitting feedback: {str(err)}")
             st.error(
                 "An error occurred while submitting your feedback. Please try again later."
             )
 
     def _process_llm_response(
-        self, qa: QuestionAnswering, prompt: str, game: str
+        self, qa: "QuestionAnswering", prompt: str, game: str, message_placeholder: Any
     ) -> Union[Conversation, None]:
-        """Process the LLM response and store the conversation."""
+        """Stream the LLM response into the placeholder and store the conversation."""
         start_time = time.time()
-        try:
-            context = self.vector_store.search(prompt, filter={'game': game})
-            logger.info(f"Vector store search results: {context}")
-            print(f'Context: {context}')
-        except Exception as err:
-            logger.error(f"Error during vector store search: {str(err)}")
-            st.error(
-                "An error occurred while searching for relevant information. Please try again."
-            )
-            return None
+        with StageTimer(
+            "chat_request", {"game": game, "model": qa.model_name}
+        ) as timer:
+            try:
+                # Embedded once: the search below reuses it from the embedding cache
+                with timer.stage("embedding"):
+                    question_embedding = self.vector_store.embeddings.embed_query(
+                        prompt
+                    )
+                with timer.stage("cache_lookup"):
+                    cached = self.answer_cache.lookup(
+                        game, qa.model_name, question_embedding
+                    )
+                if cached is not None:
+                    timer.set_attribute("cache_hit", True)
+                    return self._answer_from_cache(
+                        qa, prompt, game, cached, start_time, message_placeholder, timer
+                    )
 
-        try:
-            response = qa.generate_answer(prompt, context)
-            answer = response.choices[0].message.content
-            evaluating = qa.evaluate_relevance(prompt, answer)
+                with st.spinner("Searching reviews..."), timer.stage("search"):
+                    context = self.context_builder.build(
+                        prompt, game, qa.model_name, mode=SEARCH_MODE
+                    )
+                logger.info(f"Vector store search results: {context}")
+                print(f'Context: {context}')
+            except Exception as err:
+                logger.error(f"Error during vector store search: {str(err)}")
+                st.error(
+                    "An error occurred while searching for relevant information. Please try again."
+                )
+                return None
 
             try:
-                relevance = json.loads(evaluating.choices[0].message.content)
-            except json.JSONDecodeError:
-                relevance = json.loads(
-                    evaluating.choices[0]
-                    .message.content.replace('```json', '')
-                    .replace('```', '')
+                llm_start = time.perf_counter()
+                stream = qa.stream_answer(prompt, context)
+                for _ in stream:
+                    message_placeholder.markdown(stream.answer + "▌")
+                answer = stream.answer
+                message_placeholder.markdown(answer)
+                request_start = llm_start + stream.prompt_time
+                timer.record("prompt", stream.prompt_time, llm_start)
+                timer.record(
+                    "time_to_first_token",
+                    stream.time_to_first_token or 0.0,
+                    request_start,
+                )
+                timer.record("generation", stream.generation_time, request_start)
+                logger.info(
+                    f"Answer streamed: first token after {(stream.time_to_first_token or 0.0):.2f}s, "
+                    f"generation took {stream.generation_time:.2f}s"
                 )
 
-            model_cost = calculate_cost(
-                tokens={
-                    'completion_tokens': response.usage.completion_tokens,
-                    'prompt_tokens': response.usage.prompt_tokens,
-                },
-                model=qa.model_name,
-            )
+                model_cost = calculate_cost(tokens=stream.usage, model=qa.model_name)
+
+                response_time = time.time() - start_time
+
+                conversation = Conversation(
+                    conversation_id=st.session_state.conversation_id,
+                    question=prompt,
+                    answer=answer,
+                    game=game,
+                    model=qa.model_name,
+                    response_time=response_time,
+                    time_to_first_token=stream.time_to_first_token,
+                    generation_time=stream.generation_time,
+                    relevance=RelevanceEnum.PENDING.value,
+                    relevance_explanation='',
+                    prompt_tokens=stream.usage['prompt_tokens'],
+                    completion_tokens=stream.usage['completion_tokens'],
+                    total_tokens=stream.usage['total_tokens'],
+                    eval_prompt_tokens=0,
+                    eval_completion_tokens=0,
+                    eval_total_tokens=0,
+                    model_cost=model_cost,
+                    cache_hit=False,
+                    **self._stage_columns(timer),
+                )
 
-            response_time = time.time() - start_time
-
-            conversation = Conversation(
-                conversation_id=st.session_state.conversation_id,
-                question=prompt,
-                answer=answer,
-                game=game,
-                model=qa.model_name,
-                response_time=response_time,
-                relevance=relevance['Relevance'],
-                relevance_explanation=relevance['Explanation'],
-                prompt_tokens=response.usage.prompt_tokens,
-                completion_tokens=response.usage.completion_tokens,
-                total_tokens=response.usage.total_tokens,
-                eval_prompt_tokens=evaluating.usage.prompt_tokens,
-                eval_completion_tokens=evaluating.usage.completion_tokens,
-                eval_total_tokens=evaluating.usage.total_tokens,
-                model_cost=model_cost,
-            )
+                with timer.stage("db_write"):
+                    self._save_conversation(conversation)
+                    self.answer_cache.store(
+                        game,
+                        qa.model_name,
+                        prompt,
+                        question_embedding,
+                        answer,
+                        response_time,
+                    )
+                self._submit_evaluation(qa, conversation, timer)
+                return conversation
+            except Exception as err:
+                logger.error(f"Error during LLM processing: {str(err)}")
+                st.error(
+                    "An error occurred while processing your question. Please try again."
+                )
+                return None
+
+    def _answer_from_cache(
+        self,
+        qa: "QuestionAnswering",
+        prompt: str,
+        game: str,
+        cached: Dict[str, Any],
+        start_time: float,
+        message_placeholder: Any,
+        timer: StageTimer,
+    ) -> Union[Conversation, None]:
+        """Render a cached answer and store the conversation as a cache hit."""
+        logger.info(
+            f"Answer cache hit for '{cached['question']}' "
+            f"(similarity {cached['similarity']:.3f})"
+        )
+        message_placeholder.markdown(cached["answer"])
+        response_time = time.time() - start_time
+
+        conversation = Conversation(
+            conversation_id=st.session_state.conversation_id,
+            question=prompt,
+            answer=cached["answer"],
+            game=game,
+            model=qa.model_name,
+            response_time=response_time,
+            time_to_first_token=response_time,
+            generation_time=0.0,
+            cache_hit=True,
+            latency_saved=max((cached["response_time"] or 0.0) - response_time, 0.0),
+            relevance=RelevanceEnum.PENDING.value,
+            relevance_explanation='',
+            prompt_tokens=0,
+            completion_tokens=0,
+            total_tokens=0,
+            eval_prompt_tokens=0,
+            eval_completion_tokens=0,
+            eval_total_tokens=0,
+            model_cost=0.0,
+            **self._stage_columns(timer),
+        )
 
+        with timer.stage("db_write"):
             self._save_conversation(conversation)
-            return conversation
-        except Exception as err:
-            logger.error(f"Error during LLM processing: {str(err)}")
-            st.error(
-                "An error occurred while processing your question. Please try again."
+        self._submit_evaluation(qa, conversation, timer)
+        return conversation
+
+    @staticmethod
+    def _stage_columns(timer: StageTimer) -> Dict[str, Any]:
+        """Map the stages timed so far to their `conversation` columns."""
+        return {
+            f"{stage}_time": timer.durations.get(stage)
+            for stage in ("embedding", "cache_lookup", "search", "prompt")
+        }
+
+    def _submit_evaluation(
+        self, qa: "QuestionAnswering", conversation: Conversation, timer: StageTimer
+    ):
+        """Record the time spent saving the conversation, then queue its evaluation.
+
+        Both wait for the conversation's ID when it could not be allocated yet.
+        """
+        db_write_time = timer.durations.get("db_write")
+
+        def evaluate(conversation: Conversation):
+            self.write_buffer.update(
+                Conversation, conversation.id, {"db_write_time": db_write_time}
+            )
+            self.relevance_worker.submit(
+                conversation.id, conversation.question, conversation.answer, qa
             )
-            return None
+
+        self.write_buffer.when_assigned(conversation, evaluate)
 
     def _save_conversation(self, conversation: Conversation):
-        """Save the conversation to the database."""
+        """Queue the conversation for the database; its ID is assigned right away if possible."""
         try:
-            with self.db_connector.create_session() as session:
-                session.add(conversation)
-                session.commit()
-                session.refresh(conversation)
-            logger.info(f"Conversation saved with ID: {conversation.id}")
-        except ProgrammingError as err:
-            logger.error(f"Database schema error: {str(err)}")
-            st.error(
-                "There's an issue with the database schema. Please contact support."
-            )
-        except OperationalError as err:
-            logger.error(f"Database connection error: {str(err)}")
-            st.error("Unable to connect to the database. Please try again later.")
-        except SQLAlchemyError as err:
-            logger.error(f"Database error: {str(err)}")
-            st.error(
-                "An error occurred while saving your conversation. Please try again."
-            )
+            self.write_buffer.add(conversation)
+            logger.info(f"Conversation queued with ID: {conversation.id}")
         except Exception as err:
             logger.error(f"Unexpected error: {str(err)}")
             st.error(
@@ -188,8 +442,6 @@ class ChatbotApp:
 
         model_selected, game_selected = self._setup_sidebar()
 
-        qa = self._setup_qa(model_selected)
-
         if "conversation_id" not in st.session_state:
             st.session_state.conversation_id = str(uuid.uuid4())
         if "messages" not in st.session_state:
@@ -197,7 +449,18 @@ class ChatbotApp:
 
         self._display_chat_history()
 
+        if "first_render" not in self.loader.timer.durations:
+            # Measured from the start of the warm-up, once per process
+            self.loader.timer.record("first_render", self.loader.timer.elapsed)
+            logger.info(
+                f"Startup phase 'first_render' took {self.loader.timer.elapsed:.2f}s"
+            )
+
         if prompt := st.chat_input("What is up?"):
+            if not self.loader.is_loaded(REQUIRED_RESOURCES[-1]):
+                with st.spinner("Loading the assistant..."):
+                    self.loader.wait(*REQUIRED_RESOURCES)
+            qa = self._setup_qa(model_selected)
             self._process_user_input(prompt, qa, game_selected)
 
     def _setup_expander(self):
@@ -234,8 +497,10 @@ class ChatbotApp:
             )
         return model_selected, game_selected  # type: ignore
 
-    def _setup_qa(self, model_selected: str) -> QuestionAnswering:
+    def _setup_qa(self, model_selected: str) -> "QuestionAnswering":
         """Setup the QuestionAnswering object."""
+        from processing import QuestionAnswering
+
         model_name = model_selected.split("/")[1]
         model = self._get_model(model_selected)
         return QuestionAnswering(
@@ -243,6 +508,7 @@ class ChatbotApp:
             PROMPT_ASSISTANT_PATH,
             RELEVANCE_EVAL_PATH,
             model_name,
+            prompt_evaluate_batch_path=RELEVANCE_EVAL_BATCH_PATH,
         )
 
     def _display_chat_history(self):
@@ -258,37 +524,38 @@ class ChatbotApp:
                     optional_text_label="Please provide extra information",
                     on_submit=self._submit_feedback,
                     key=feedback_key,
-                    kwargs={"conversation_id": msg["conversation_id"]},
+                    kwargs={"conversation": msg["conversation"]},
                 )
 
     def _process_user_input(
-        self, prompt: str, qa: QuestionAnswering, game_selected: str
+        self, prompt: str, qa: "QuestionAnswering", game_selected: str
     ):
         """Process user input and generate a response."""
         st.session_state.messages.append({"role": "user", "content": prompt})
         st.chat_message("user").markdown(prompt)
 
         with st.chat_message("assistant"):
-            with st.spinner("Processing..."):
-                message_placeholder = st.empty()
-                q = self._process_llm_response(qa, prompt, game_selected)
-                if q:
-                    message_placeholder.markdown(q.answer)
-                    st.session_state.messages.append(
-                        {
-                            "role": "assistant",
-                            "content": q.answer,
-                            "conversation_id": q.id,
-                        }
-                    )
-                    streamlit_feedback(
-                        feedback_type="thumbs",
-                        key=f"feedback_{len(st.session_state.messages)//2}",
-                    )
-                else:
-                    message_placeholder.markdown(
-                        "I'm sorry, but I couldn't process your request at this time. Please try again."
-                    )
+            message_placeholder = st.empty()
+            q = self._process_llm_response(
+                qa, prompt, game_selected, message_placeholder
+            )
+            if q:
+                st.session_state.messages.append(
+                    {
+                        "role": "assistant",
+                        "content": q.answer,
+                        "conversation": q,
+                    }
+                )
+                streamlit_feedback(
+                    feedback_type="thumbs",
+                    key=f"feedback_{len(st.session_state.messages)//2}",
+                )
+            else:
+                message_placeholder.markdown(
+                    "I'm sorry, but I couldn't process your request at this time. Please try again."
+                )
+        logger.info(f"Database pool: {self.db_connector.pool_status()}")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,28 @@
-from .enums import ModelEnum
-from .model import Review, FeedBack, Conversation
+from .enums import ModelEnum, RelevanceEnum
+from .model import (
+    Review,
+    FeedBack,
+    SyncState,
+    AnswerCache,
+    Conversation,
+    LatencyHistogram,
+    StaleRollupBucket,
+    ConversationRollup,
+    ConversationMetrics,
+    partitioned_tables,
+)
 
-__all__ = ['Conversation', 'FeedBack', 'Review', 'ModelEnum']
+__all__ = [
+    'Conversation',
+    'FeedBack',
+    'Review',
+    'SyncState',
+    'AnswerCache',
+    'ConversationRollup',
+    'LatencyHistogram',
+    'StaleRollupBucket',
+    'ConversationMetrics',
+    'partitioned_tables',
+    'ModelEnum',
+    'RelevanceEnum',
+]
@@ -5,3 +5,13 @@ class ModelEnum(Enum):
     OPEN_AI = "openai/gpt-4o-mini"
     OLLAMA_GROQ_3_1 = "groq/llama-3.1-8b-instant"
     # OLLAMA_PHI3 = "ollama/phi3"
+
+
+class RelevanceEnum(Enum):
+    RELEVANT = "RELEVANT"
+    PARTLY_RELEVANT = "PARTLY_RELEVANT"
+    NON_RELEVANT = "NON_RELEVANT"
+    # Set while the background worker has not evaluated the answer yet
+    PENDING = "PENDING"
+    # Set when the evaluation still failed after every retry
+    FAILED = "FAILED"
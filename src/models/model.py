@@ -2,18 +2,26 @@ from datetime import datetime
 from zoneinfo import ZoneInfo
 
 from sqlalchemy import (
+    DDL,
     Text,
     Float,
+    Index,
+    Table,
     Column,
     String,
     Boolean,
     Integer,
     DateTime,
+    MetaData,
     BigInteger,
-    ForeignKey,
+    LargeBinary,
+    ForeignKeyConstraint,
+    event,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import TIMESTAMP
+from sqlalchemy.schema import PrimaryKeyConstraint
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 
 tz = ZoneInfo("Europe/Lisbon")
@@ -80,6 +88,16 @@ class Conversation(Base):
     game = Column(String, nullable=False)
     model = Column(String, nullable=False)
     response_time = Column(Float)
+    time_to_first_token = Column(Float)
+    generation_time = Column(Float)
+    embedding_time = Column(Float)
+    cache_lookup_time = Column(Float)
+    search_time = Column(Float)
+    prompt_time = Column(Float)
+    db_write_time = Column(Float)
+    evaluation_time = Column(Float)
+    cache_hit = Column(Boolean, nullable=False, default=False)
+    latency_saved = Column(Float)
     relevance = Column(Text, nullable=False)
     relevance_explanation = Column(Text, nullable=False)
     prompt_tokens = Column(Integer, nullable=False)
@@ -89,10 +107,21 @@ class Conversation(Base):
     eval_completion_tokens = Column(Integer, nullable=False)
     eval_total_tokens = Column(Integer, nullable=False)
     model_cost = Column(Float, nullable=False)
-    request_time = Column(DateTime, default=datetime.now(tz))
+    # Stamped when the row is created, not when the module is imported
+    request_time = Column(
+        DateTime, nullable=False, default=lambda: datetime.now(tz), index=True
+    )
 
     feedbacks = relationship("FeedBack", back_populates="conversation")
 
+    __table_args__ = (
+        Index('conversation_game_model_idx', 'game', 'model'),
+        {
+            'info': {'partition_by': 'request_time'},
+            'postgresql_partition_by': 'RANGE (request_time)',
+        },
+    )
+
 
 class FeedBack(Base):
     """_summary_
@@ -104,9 +133,205 @@ class FeedBack(Base):
     __tablename__ = 'feedback'
 
     id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(Integer, ForeignKey("conversation.id"))
+    conversation_id = Column(Integer, index=True)
     feedback_score = Column(Integer)
     feedback_comment = Column(Text)
-    feedback_date = Column(DateTime, default=datetime.now(tz))
+    feedback_date = Column(
+        DateTime, nullable=False, default=lambda: datetime.now(tz), index=True
+    )
 
     conversation = relationship("Conversation", back_populates="feedbacks")
+
+    __table_args__ = (
+        # A foreign key can only reference a partitioned table through a key that
+        # includes its partition column, so Postgres does not enforce this one
+        ForeignKeyConstraint(['conversation_id'], ['conversation.id']).ddl_if(
+            callable_=lambda ddl, target, bind, dialect=None, **kw: dialect is None
+            or dialect.name != 'postgresql'
+        ),
+        {
+            'info': {'partition_by': 'feedback_date'},
+            'postgresql_partition_by': 'RANGE (feedback_date)',
+        },
+    )
+
+
+# Columns of `conversation` that analytics read: everything but the question,
+# answer and explanation text
+METRIC_COLUMNS = [
+    column
+    for column in Conversation.__table__.columns
+    if column.name not in ('question', 'answer', 'relevance_explanation')
+]
+
+
+class ConversationMetrics(Base):
+    """Read-only `conversation_metrics` view: the conversations without their text columns.
+
+    Aggregations read this view rather than `conversation`, so they never fetch or
+    detoast the question and answer text. The view is created with the tables.
+
+    Args:
+        Base (_type_): _description_
+    """
+
+    __table__ = Table(
+        'conversation_metrics',
+        MetaData(),
+        *[
+            Column(column.name, column.type, primary_key=column.primary_key)
+            for column in METRIC_COLUMNS
+        ],
+    )
+
+
+class SyncState(Base):
+    """Per-game high-water mark of the incremental Steam review sync.
+
+    Args:
+        Base (_type_): _description_
+    """
+
+    __tablename__ = 'sync_state'
+
+    game = Column(String, primary_key=True)
+    app_id = Column(Integer, nullable=False)
+    last_timestamp_updated = Column(BigInteger, nullable=False)
+    reviews_synced = Column(Integer, nullable=False, default=0)
+    last_synced = Column(DateTime, default=datetime.now(tz))
+
+
+class AnswerCache(Base):
+    """An answer stored by the semantic answer cache, valid for one sync watermark.
+
+    Args:
+        Base (_type_): _description_
+    """
+
+    __tablename__ = 'answer_cache'
+
+    id = Column(Integer, primary_key=True)
+    game = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)
+    watermark = Column(BigInteger, nullable=False)
+    response_time = Column(Float)
+    created = Column(DateTime, default=datetime.now(tz))
+
+
+class ConversationRollup(Base):
+    """Conversation and feedback totals of one time bucket, game and model.
+
+    Maintained by `MetricsRollup` at 'minute' and 'hour' resolution, so the dashboard
+    never scans the `conversation` table.
+
+    Args:
+        Base (_type_): _description_
+    """
+
+    __tablename__ = 'conversation_rollup'
+
+    resolution = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    game = Column(String, primary_key=True)
+    model = Column(String, primary_key=True)
+    conversations = Column(Integer, nullable=False, default=0)
+    cache_hits = Column(Integer, nullable=False, default=0)
+    relevant = Column(Integer, nullable=False, default=0)
+    partly_relevant = Column(Integer, nullable=False, default=0)
+    non_relevant = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    total_tokens = Column(BigInteger, nullable=False, default=0)
+    eval_total_tokens = Column(BigInteger, nullable=False, default=0)
+    model_cost = Column(Float, nullable=False, default=0.0)
+    response_time_sum = Column(Float, nullable=False, default=0.0)
+    latency_saved_sum = Column(Float, nullable=False, default=0.0)
+    thumbs_up = Column(Integer, nullable=False, default=0)
+    thumbs_down = Column(Integer, nullable=False, default=0)
+
+
+class LatencyHistogram(Base):
+    """Number of answers of one time bucket, game and model whose `stage` took at most `le` seconds.
+
+    Counts are not cumulative: each row covers the latencies above the previous bound.
+
+    Args:
+        Base (_type_): _description_
+    """
+
+    __tablename__ = 'latency_histogram'
+
+    resolution = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    game = Column(String, primary_key=True)
+    model = Column(String, primary_key=True)
+    stage = Column(String, primary_key=True)
+    le = Column(Float, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class StaleRollupBucket(Base):
+    """An hourly bucket to recompute because rows were written to it late.
+
+    Recorded by the write buffer when it replays conversations or feedback after an
+    outage, and consumed by the next `MetricsRollup` refresh.
+
+    Args:
+        Base (_type_): _description_
+    """
+
+    __tablename__ = 'stale_rollup_bucket'
+
+    id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, nullable=False)
+
+
+def partitioned_tables(metadata: MetaData = Base.metadata):
+    """Returns the tables partitioned by time range on Postgres, with their partition column."""
+    return {
+        table.name: table.info['partition_by']
+        for table in metadata.sorted_tables
+        if 'partition_by' in table.info
+    }
+
+
+@compiles(PrimaryKeyConstraint, 'postgresql')
+def _compile_primary_key(constraint, compiler, **kw):
+    """Adds the partition column to the primary key of partitioned tables, as Postgres requires."""
+    partition_by = constraint.table.info.get('partition_by')
+    if partition_by is None or partition_by in constraint.columns:
+        return compiler.visit_primary_key_constraint(constraint, **kw)
+    columns = [column.name for column in constraint.columns] + [partition_by]
+    return 'PRIMARY KEY (%s)' % ', '.join(compiler.preparer.quote(c) for c in columns)
+
+
+for _name in partitioned_tables():
+    # Rows outside every monthly partition land here until PartitionManager moves them
+    event.listen(
+        Base.metadata.tables[_name],
+        'after_create',
+        DDL(
+            f"CREATE TABLE IF NOT EXISTS {_name}_default PARTITION OF {_name} DEFAULT"
+        ).execute_if(dialect='postgresql'),
+    )
+
+_metric_columns = ', '.join(column.name for column in METRIC_COLUMNS)
+event.listen(
+    Base.metadata,
+    'after_create',
+    DDL(
+        f"CREATE OR REPLACE VIEW conversation_metrics AS "
+        f"SELECT {_metric_columns} FROM conversation"
+    ).execute_if(dialect='postgresql'),
+)
+event.listen(
+    Base.metadata,
+    'after_create',
+    DDL(
+        f"CREATE VIEW IF NOT EXISTS conversation_metrics AS "
+        f"SELECT {_metric_columns} FROM conversation"
+    ).execute_if(dialect='sqlite'),
+)
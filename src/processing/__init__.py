@@ -1,4 +1,50 @@
-from .qa_answering import QuestionAnswering
-from .steam_reviews_downloader import SteamReviewsDownloader
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ['SteamReviewsDownloader', 'QuestionAnswering']
+# Exports are imported from their module on first access: the LLM SDKs, LangChain
+# and Prefect take seconds to import, and the app only needs them after it renders
+_EXPORTS = {
+    'SteamReviewsDownloader': 'steam_reviews_downloader',
+    'QuestionAnswering': 'qa_answering',
+    'AnswerStream': 'qa_answering',
+    'RelevanceWorker': 'relevance_worker',
+    'SemanticAnswerCache': 'answer_cache',
+    'LLMClientRegistry': 'llm_clients',
+    'ContextBuilder': 'context_builder',
+    'WriteBehindBuffer': 'write_buffer',
+    'MetricsRollup': 'metrics_rollup',
+    'PartitionManager': 'partition_retention',
+}
+
+if TYPE_CHECKING:
+    from .llm_clients import LLMClientRegistry
+    from .write_buffer import WriteBehindBuffer
+    from .answer_cache import SemanticAnswerCache
+    from .context_builder import ContextBuilder
+    from .metrics_rollup import MetricsRollup
+    from .qa_answering import AnswerStream, QuestionAnswering
+    from .relevance_worker import RelevanceWorker
+    from .partition_retention import PartitionManager
+    from .steam_reviews_downloader import SteamReviewsDownloader
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = [
+    'SteamReviewsDownloader',
+    'QuestionAnswering',
+    'AnswerStream',
+    'RelevanceWorker',
+    'SemanticAnswerCache',
+    'LLMClientRegistry',
+    'ContextBuilder',
+    'WriteBehindBuffer',
+    'MetricsRollup',
+    'PartitionManager',
+]
@@ -0,0 +1,213 @@
+import os
+import time
+import threading
+
+from typing import Any, Dict, List, Tuple, Optional
+
+import numpy as np
+
+from db import DataBaseConnector
+from models import SyncState, AnswerCache
+
+from .write_buffer import WriteBehindBuffer
+
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+
+
+class _Partition:
+    """The cached answers of one (game, model) pair, for a single sync watermark."""
+
+    def __init__(self, watermark: Optional[int]) -> None:
+        self.watermark = watermark
+        self.entries: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def add(self, entry: Dict[str, Any], max_entries: int):
+        self.entries.append(entry)
+        # Oldest answers are evicted first
+        del self.entries[:-max_entries]
+        self._matrix = None
+
+    def best_match(self, vector: np.ndarray) -> Tuple[Optional[Dict[str, Any]], float]:
+        if not self.entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._matrix = np.stack([entry["vector"] for entry in self.entries])
+        similarities = self._matrix @ vector
+        best = int(np.argmax(similarities))
+        return self.entries[best], float(similarities[best])
+
+
+class SemanticAnswerCache:
+    """
+    Returns a stored answer when a new question is close enough to one already answered.
+
+    Entries are keyed by game and model and matched on the cosine similarity of the
+    question embeddings. Each entry records the sync watermark of its game (the
+    `sync_state.last_timestamp_updated` of the incremental review sync) at the time
+    it was answered, so once the ingest job brings fresh reviews for a game, that
+    game's cached answers stop matching. Entries are held in a bounded in-memory
+    index per (game, model), loaded from the `answer_cache` table on first use, and
+    persisted to it through `write_buffer` when one is given, so storing an answer
+    never waits on the database. The cache is best effort: database errors are
+    reported and treated as misses.
+
+    Attributes:
+        db_connector (DataBaseConnector): Database holding the `answer_cache` and `sync_state` tables.
+        write_buffer (WriteBehindBuffer): Buffer the new entries are written through, or None to write them directly.
+        threshold (float): Minimum cosine similarity for a hit.
+        max_entries (int): Maximum number of answers kept in memory per (game, model).
+        watermark_ttl (float): Seconds a game's watermark is trusted before it is read again.
+        hits (int): Number of lookups that returned an answer.
+        misses (int): Number of lookups that did not.
+    """
+
+    def __init__(
+        self,
+        db_connector: DataBaseConnector,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = 1000,
+        watermark_ttl: float = 60.0,
+        write_buffer: Optional[WriteBehindBuffer] = None,
+    ) -> None:
+        self.db_connector = db_connector
+        self.write_buffer = write_buffer
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.watermark_ttl = watermark_ttl
+        self.hits = 0
+        self.misses = 0
+        self._partitions: Dict[Tuple[str, str], _Partition] = {}
+        self._watermarks: Dict[str, Tuple[Optional[int], float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _watermark(self, game: str) -> Optional[int]:
+        """Returns the game's sync watermark, re-reading it after `watermark_ttl` seconds."""
+        cached = self._watermarks.get(game)
+        if cached is not None and time.monotonic() - cached[1] < self.watermark_ttl:
+            return cached[0]
+        with self.db_connector.session_scope() as session:
+            state = session.get(SyncState, game)
+            watermark = state.last_timestamp_updated if state is not None else None
+        self._watermarks[game] = (watermark, time.monotonic())
+        return watermark
+
+    def _partition(self, game: str, model: str) -> _Partition:
+        """Returns the in-memory index of (game, model), reloading it when the watermark moved."""
+        watermark = self._watermark(game)
+        partition = self._partitions.get((game, model))
+        if partition is not None and partition.watermark == watermark:
+            return partition
+
+        partition = _Partition(watermark)
+        with self.db_connector.session_scope() as session:
+            rows = (
+                session.query(AnswerCache)
+                .filter(
+                    AnswerCache.game == game,
+                    AnswerCache.model == model,
+                    AnswerCache.watermark == (watermark or 0),
+                )
+                .order_by(AnswerCache.id.desc())
+                .limit(self.max_entries)
+                .all()
+            )
+            for row in reversed(rows):
+                partition.add(self._entry(row), self.max_entries)
+        self._partitions[(game, model)] = partition
+        return partition
+
+    @staticmethod
+    def _entry(row: AnswerCache) -> Dict[str, Any]:
+        return {
+            "question": row.question,
+            "answer": row.answer,
+            "response_time": row.response_time,
+            "vector": np.frombuffer(row.embedding, dtype=np.float32),
+        }
+
+    def lookup(
+        self, game: str, model: str, question_embedding: List[float]
+    ) -> Optional[Dict[str, Any]]:
+        """Finds the cached answer of the most similar question.
+
+        Args:
+            game (str): The selected game.
+            model (str): The model that would generate the answer.
+            question_embedding (list): Embedding of the new question.
+
+        Returns:
+            dict: The cached 'question', 'answer', the 'response_time' it originally took and the 'similarity', or None on a miss.
+        """
+        vector = self._normalize(question_embedding)
+        try:
+            with self._lock:
+                entry, similarity = self._partition(game, model).best_match(vector)
+        except Exception as err:
+            print(f"Error reading the answer cache: {str(err)}")
+            entry, similarity = None, 0.0
+
+        if entry is None or similarity < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {
+            "question": entry["question"],
+            "answer": entry["answer"],
+            "response_time": entry["response_time"],
+            "similarity": similarity,
+        }
+
+    def store(
+        self,
+        game: str,
+        model: str,
+        question: str,
+        question_embedding: List[float],
+        answer: str,
+        response_time: Optional[float] = None,
+    ):
+        """Caches the answer to a question under the game's current watermark.
+
+        Args:
+            game (str): The selected game.
+            model (str): The model that generated the answer.
+            question (str): The question.
+            question_embedding (list): Embedding of the question.
+            answer (str): The generated answer.
+            response_time (float, optional): Seconds it took to answer, reported as latency saved on later hits.
+        """
+        vector = self._normalize(question_embedding)
+        try:
+            partition = self._partitions.get((game, model))
+            if partition is None:
+                # Not looked up yet: loaded outside the lock, which lookups hold
+                partition = self._partition(game, model)
+            row = AnswerCache(
+                game=game,
+                model=model,
+                question=question,
+                answer=answer,
+                embedding=vector.tobytes(),
+                watermark=partition.watermark or 0,
+                response_time=response_time,
+            )
+            with self._lock:
+                partition.add(self._entry(row), self.max_entries)
+            if self.write_buffer is not None:
+                self.write_buffer.add(row)
+            else:
+                with self.db_connector.session_scope() as session:
+                    session.add(row)
+        except Exception as err:
+            print(f"Error writing the answer cache: {str(err)}")
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
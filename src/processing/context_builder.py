@@ -0,0 +1,203 @@
+import re
+
+from typing import TYPE_CHECKING, Dict, List, Tuple, Callable, Optional
+from functools import lru_cache
+
+from langchain_core.documents import Document
+
+if TYPE_CHECKING:
+    from db import LangChainChromaRAG
+
+# Prompt tokens available for the retrieved reviews, per model
+DEFAULT_TOKEN_BUDGETS = {
+    'gpt-4o-mini': 1500,
+    'llama-3.1-8b-instant': 1200,
+}
+DEFAULT_TOKEN_BUDGET = 1200
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model_name: str) -> Tuple[Callable[[str], int], Callable]:
+    """Returns functions counting and truncating tokens for a model.
+
+    tiktoken is used when it is installed and its encoding can be loaded; otherwise
+    tokens are estimated at four characters each, which is close enough for packing.
+
+    Args:
+        model_name (str): The model name, e.g. 'gpt-4o-mini'.
+
+    Returns:
+        tuple: `count(text) -> int` and `truncate(text, max_tokens) -> str`.
+    """
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding('cl100k_base')
+    except Exception as err:
+        print(f"Estimating tokens from characters for {model_name}: {str(err)}")
+        return (
+            lambda text: -(-len(text) // 4),
+            lambda text, max_tokens: text[: max_tokens * 4],
+        )
+    return (
+        lambda text: len(encoding.encode(text, disallowed_special=())),
+        lambda text, max_tokens: encoding.decode(
+            encoding.encode(text, disallowed_special=())[:max_tokens]
+        ),
+    )
+
+
+class ContextBuilder:
+    """
+    Turns retrieved chunks into the context of a prompt, within a token budget.
+
+    Chunks are small (256 characters, 50 of overlap), so the top results often come
+    from the same review, overlap or repeat each other. The builder over-fetches
+    candidates, merges adjacent chunks of the same review (by `chunk_index`, removing
+    the text they share), drops near-duplicate reviews and packs the rest, best
+    first, into the model's token budget.
+
+    Attributes:
+        rag (LangChainChromaRAG): The retriever.
+        fetch_k (int): Number of candidate chunks retrieved per question.
+        token_budgets (Dict[str, int]): Context token budget per model.
+        default_budget (int): Budget of models missing from `token_budgets`.
+        duplicate_threshold (float): Word-shingle Jaccard similarity above which a review is dropped as a near-duplicate.
+        min_tokens (int): Smallest truncated review worth adding when the budget runs out.
+    """
+
+    def __init__(
+        self,
+        rag: "LangChainChromaRAG",
+        fetch_k: int = 20,
+        token_budgets: Optional[Dict[str, int]] = None,
+        default_budget: int = DEFAULT_TOKEN_BUDGET,
+        duplicate_threshold: float = 0.8,
+        min_tokens: int = 32,
+    ) -> None:
+        self.rag = rag
+        self.fetch_k = fetch_k
+        self.token_budgets = token_budgets or DEFAULT_TOKEN_BUDGETS
+        self.default_budget = default_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.min_tokens = min_tokens
+
+    def build(
+        self, question: str, game: str, model_name: str, mode: str = "dense"
+    ) -> List[Document]:
+        """Retrieves and assembles the context of a question.
+
+        Args:
+            question (str): The user question.
+            game (str): The selected game.
+            model_name (str): The model the prompt is for, which sets the token budget.
+            mode (str, optional): Search mode of the retriever. Defaults to "dense".
+
+        Returns:
+            list: One document per selected review, best first.
+        """
+        candidates = self.rag.search(
+            question, n_results=self.fetch_k, filter={'game': game}, mode=mode
+        )
+        return self.assemble(candidates, model_name)
+
+    def assemble(self, candidates: List[Document], model_name: str) -> List[Document]:
+        """Merges, deduplicates and packs retrieved chunks, best first.
+
+        Args:
+            candidates (list): Retrieved chunks, best first.
+            model_name (str): The model the prompt is for.
+
+        Returns:
+            list: One document per selected review, within the model's token budget.
+        """
+        return self._pack(self._deduplicate(self._merge(candidates)), model_name)
+
+    def _merge(self, candidates: List[Document]) -> List[Document]:
+        """Merges runs of consecutive chunks of the same review, ranked by their best chunk."""
+        groups: Dict[str, List[Tuple[int, Document]]] = {}
+        for rank, document in enumerate(candidates):
+            key = document.metadata.get("recommendationid", f"#{rank}")
+            groups.setdefault(key, []).append((rank, document))
+
+        merged: List[Tuple[int, Document]] = []
+        for chunks in groups.values():
+            chunks.sort(key=lambda chunk: chunk[1].metadata.get("chunk_index", 0))
+            run_rank, run = chunks[0][0], [chunks[0][1]]
+            for rank, document in chunks[1:]:
+                previous_index = run[-1].metadata.get("chunk_index", 0)
+                if document.metadata.get("chunk_index", 0) == previous_index + 1:
+                    run.append(document)
+                    run_rank = min(run_rank, rank)
+                    continue
+                merged.append((run_rank, self._join(run)))
+                run_rank, run = rank, [document]
+            merged.append((run_rank, self._join(run)))
+
+        return [document for _, document in sorted(merged, key=lambda item: item[0])]
+
+    def _join(self, run: List[Document]) -> Document:
+        text = run[0].page_content
+        for document in run[1:]:
+            text = self._join_overlapping(text, document.page_content)
+        metadata = dict(run[0].metadata)
+        metadata["chunk_indexes"] = [d.metadata.get("chunk_index", 0) for d in run]
+        return Document(page_content=text, metadata=metadata)
+
+    def _join_overlapping(self, left: str, right: str) -> str:
+        """Concatenates two adjacent chunks, dropping the prefix of `right` that ends `left`."""
+        max_overlap = min(
+            len(left), len(right), 2 * self.rag.text_splitter._chunk_overlap
+        )
+        # Shorter matches are more likely a coincidence than the splitter's overlap
+        for size in range(max_overlap, 4, -1):
+            if left.endswith(right[:size]):
+                return left + right[size:]
+        return f"{left} {right}"
+
+    @staticmethod
+    def _shingles(text: str) -> set:
+        words = WORD_PATTERN.findall(text.lower())
+        if len(words) < 3:
+            return {" ".join(words)}
+        return {" ".join(words[i : i + 3]) for i in range(len(words) - 2)}
+
+    def _deduplicate(self, documents: List[Document]) -> List[Document]:
+        """Drops documents whose word shingles mostly repeat those of a better-ranked one."""
+        kept: List[Tuple[Document, set]] = []
+        for document in documents:
+            shingles = self._shingles(document.page_content)
+            if any(
+                len(shingles & other) / (len(shingles | other) or 1)
+                >= self.duplicate_threshold
+                for _, other in kept
+            ):
+                continue
+            kept.append((document, shingles))
+        return [document for document, _ in kept]
+
+    def _pack(self, documents: List[Document], model_name: str) -> List[Document]:
+        """Keeps the best documents that fit in the budget, truncating the last one if useful."""
+        count, truncate = get_token_counter(model_name)
+        remaining = self.token_budgets.get(model_name, self.default_budget)
+        packed = []
+        for document in documents:
+            tokens = count(document.page_content)
+            if tokens <= remaining:
+                packed.append(document)
+                remaining -= tokens
+                continue
+            if remaining >= self.min_tokens:
+                packed.append(
+                    Document(
+                        page_content=truncate(document.page_content, remaining),
+                        metadata={**document.metadata, "truncated": True},
+                    )
+                )
+            break
+        return packed
@@ -0,0 +1,147 @@
+import os
+import threading
+from typing import Dict, Union, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from groq import Groq
+from openai import OpenAI
+
+PROVIDERS = ('openai', 'groq', 'ollama')
+
+
+class LLMClientRegistry:
+    """
+    A process-wide registry of LLM clients, one per provider, created on first use.
+
+    Every client gets its own long-lived `httpx.Client`, so connections are kept alive
+    and reused across Streamlit reruns instead of paying a new connection pool and TLS
+    handshake per rerun. Timeouts and the retry count (the SDKs retry rate limits,
+    timeouts and 5xx responses with exponential backoff) are configurable.
+
+    Attributes:
+        timeout (float): Total timeout of a request, in seconds.
+        connect_timeout (float): Timeout of connection establishment, in seconds.
+        max_retries (int): Retries of a failed request, with exponential backoff.
+        max_connections (int): Maximum number of connections per provider.
+        max_keepalive_connections (int): Maximum number of idle connections kept open per provider.
+        keepalive_expiry (float): Seconds an idle connection is kept open.
+        ollama_base_url (str): URL of the OpenAI-compatible Ollama API.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 120.0,
+        ollama_base_url: Optional[str] = None,
+    ) -> None:
+        """Reads the settings left to None from the environment, when the registry is built.
+
+        Args:
+            timeout (float, optional): Defaults to `LLM_TIMEOUT` or 60.
+            connect_timeout (float, optional): Defaults to `LLM_CONNECT_TIMEOUT` or 5.
+            max_retries (int, optional): Defaults to `LLM_MAX_RETRIES` or 3.
+            ollama_base_url (str, optional): Defaults to `OLLAMA_BASE_URL` or 'http://localhost:11434/v1'.
+        """
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", "60"))
+        self.connect_timeout = connect_timeout or float(
+            os.getenv("LLM_CONNECT_TIMEOUT", "5")
+        )
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv("LLM_MAX_RETRIES", "3"))
+        )
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.ollama_base_url = ollama_base_url or os.getenv(
+            "OLLAMA_BASE_URL", "http://localhost:11434/v1"
+        )
+        self._clients: Dict[str, Union[OpenAI, Groq]] = {}
+        self._lock = threading.Lock()
+
+    def _http_client(self) -> httpx.Client:
+        return httpx.Client(
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+    def _create(self, provider: str) -> Union[OpenAI, Groq]:
+        kwargs = {"max_retries": self.max_retries, "http_client": self._http_client()}
+        if provider == 'openai':
+            return OpenAI(**kwargs)
+        if provider == 'groq':
+            return Groq(**kwargs)
+        return OpenAI(base_url=self.ollama_base_url, api_key='ollama', **kwargs)
+
+    def get(self, provider: str) -> Union[OpenAI, Groq]:
+        """Returns the client of a provider, creating it on first use.
+
+        Args:
+            provider (str): 'openai', 'groq' or 'ollama'. A model name such as 'openai/gpt-4o-mini' is accepted too.
+
+        Raises:
+            ValueError: If the provider is not supported.
+
+        Returns:
+            Union[OpenAI, Groq]: The shared client.
+        """
+        provider = provider.split("/")[0]
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+        with self._lock:
+            if provider not in self._clients:
+                self._clients[provider] = self._create(provider)
+            return self._clients[provider]
+
+    def warm_up(self, providers: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        """Opens a connection to each provider so the first question skips connection setup.
+
+        A cheap `models.list` request is sent to every provider in parallel; it goes
+        through the same pooled connection the chat completions will reuse.
+
+        Args:
+            providers (Iterable[str], optional): Providers to warm up. Defaults to the ones with an API key configured.
+
+        Returns:
+            Dict[str, bool]: Whether each provider answered.
+        """
+        if providers is None:
+            providers = [
+                provider
+                for provider, key in (
+                    ('openai', 'OPENAI_API_KEY'),
+                    ('groq', 'GROQ_API_KEY'),
+                )
+                if os.getenv(key)
+            ]
+        providers = list(providers)
+
+        def ping(provider: str) -> bool:
+            try:
+                self.get(provider).models.list()
+                return True
+            except Exception as err:
+                print(f"Could not warm up the {provider} client: {str(err)}")
+                return False
+
+        if not providers:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(providers)) as executor:
+            return dict(zip(providers, executor.map(ping, providers)))
+
+    def close(self):
+        """Closes every client and its connection pool."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
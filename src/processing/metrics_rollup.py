@@ -0,0 +1,379 @@
+import os
+import sys
+import bisect
+import argparse
+import threading
+
+if __name__ == "__main__":
+    # Run as a script rather than imported through the processing package
+    sys.path.append('src/')
+
+from typing import Any, Dict, List, Tuple, Optional
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, and_, func, insert
+
+from db import DataBaseConnector
+from models import (
+    FeedBack,
+    Conversation,
+    RelevanceEnum,
+    LatencyHistogram,
+    StaleRollupBucket,
+    ConversationRollup,
+    ConversationMetrics,
+)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+# Histogram stage name -> conversation column
+STAGES = {
+    'response': 'response_time',
+    'embedding': 'embedding_time',
+    'cache_lookup': 'cache_lookup_time',
+    'search': 'search_time',
+    'prompt': 'prompt_time',
+    'time_to_first_token': 'time_to_first_token',
+    'generation': 'generation_time',
+    'db_write': 'db_write_time',
+    'evaluation': 'evaluation_time',
+}
+
+RESOLUTIONS = {
+    'minute': lambda t: t.replace(second=0, microsecond=0),
+    'hour': lambda t: t.replace(minute=0, second=0, microsecond=0),
+}
+
+RELEVANCE_COLUMNS = {
+    RelevanceEnum.RELEVANT.value: 'relevant',
+    RelevanceEnum.PARTLY_RELEVANT.value: 'partly_relevant',
+    RelevanceEnum.NON_RELEVANT.value: 'non_relevant',
+}
+
+SUMMED_COLUMNS = (
+    'prompt_tokens',
+    'completion_tokens',
+    'total_tokens',
+    'eval_total_tokens',
+    'model_cost',
+)
+
+# Table -> timestamp that places its rows in a bucket
+TIMESTAMPS = {
+    'conversation': Conversation.request_time,
+    'feedback': FeedBack.feedback_date,
+}
+
+Key = Tuple[str, datetime, str, str]
+
+
+def mark_stale(session, operations: List[Tuple[str, str, Dict[str, Any]]]) -> int:
+    """Records the hourly buckets of conversations and feedback written late.
+
+    Refreshes only recompute the recent buckets, so the write buffer calls this in
+    the transaction that replays rows after an outage; the next refresh recomputes
+    the recorded buckets too. Inserted rows carry their timestamp, updated ones are
+    looked up by ID.
+
+    Args:
+        session: The session writing the rows.
+        operations (list): The ("insert" or "update", table name, column values) written.
+
+    Returns:
+        int: The number of buckets recorded.
+    """
+    timestamps = []
+    updated: Dict[str, List[int]] = {}
+    for _, table, values in operations:
+        if table not in TIMESTAMPS:
+            continue
+        if values.get(TIMESTAMPS[table].key) is not None:
+            timestamps.append(values[TIMESTAMPS[table].key])
+        elif values.get('id') is not None:
+            updated.setdefault(table, []).append(values['id'])
+    for table, ids in updated.items():
+        column = TIMESTAMPS[table]
+        timestamps.extend(
+            timestamp
+            for (timestamp,) in session.query(column).filter(
+                column.class_.id.in_(ids), column.isnot(None)
+            )
+        )
+
+    buckets = sorted({RESOLUTIONS['hour'](timestamp) for timestamp in timestamps})
+    if buckets:
+        session.execute(
+            insert(StaleRollupBucket), [{'bucket': bucket} for bucket in buckets]
+        )
+    return len(buckets)
+
+
+class MetricsRollup:
+    """
+    Maintains the `conversation_rollup` and `latency_histogram` tables the dashboard reads.
+
+    Each refresh recomputes the buckets from `lookback` before the newest hourly
+    bucket onwards, from the conversations and feedback of that window only (through
+    the `request_time` and `feedback_date` indexes, and the `conversation_metrics`
+    view so the text columns are never read). Recomputing the recent buckets
+    rather than adding new rows to them makes refreshes idempotent and picks up late
+    changes, such as relevance evaluations that complete after the conversation is
+    saved. Rows written long after their timestamp, which the write buffer replays
+    after an outage, fall before that window: their hours are recorded in
+    `stale_rollup_bucket` (see `mark_stale`) and recomputed by the next refresh as
+    well. Minute buckets older than `minute_retention` are deleted; hourly buckets
+    are kept.
+
+    Latency histograms only count answers that were generated, not served from the
+    answer cache, like the stage latency panels they feed.
+
+    Attributes:
+        db_connector (DataBaseConnector): Database holding the conversations and the rollups.
+        lookback (timedelta): How far before the newest hourly bucket a refresh starts.
+        minute_retention (timedelta): How long minute buckets are kept.
+    """
+
+    def __init__(
+        self,
+        db_connector: DataBaseConnector,
+        lookback: timedelta = timedelta(hours=2),
+        minute_retention: timedelta = timedelta(days=7),
+    ) -> None:
+        self.db_connector = db_connector
+        self.lookback = lookback
+        self.minute_retention = minute_retention
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self, full: bool = False) -> int:
+        """Recomputes the recent and stale buckets, or every bucket, in one transaction.
+
+        Args:
+            full (bool, optional): Rebuild the rollups from all the conversations still in the
+                database; the buckets of archived partitions are lost. Defaults to False.
+
+        Returns:
+            int: The number of rollup and histogram rows written.
+        """
+        with self._lock, self.db_connector.session_scope() as session:
+            since = None if full else self._since(session)
+            marked = session.query(StaleRollupBucket.id, StaleRollupBucket.bucket).all()
+            # The stale buckets from the window onwards are recomputed anyway
+            ranges = _hour_ranges(
+                bucket for _, bucket in marked if since is not None and bucket < since
+            )
+
+            conversations = session.query(
+                ConversationMetrics.request_time,
+                ConversationMetrics.game,
+                ConversationMetrics.model,
+                ConversationMetrics.cache_hit,
+                ConversationMetrics.relevance,
+                ConversationMetrics.latency_saved,
+                *[getattr(ConversationMetrics, column) for column in SUMMED_COLUMNS],
+                *[getattr(ConversationMetrics, column) for column in STAGES.values()],
+            ).filter(ConversationMetrics.request_time.isnot(None))
+            feedback = (
+                session.query(
+                    FeedBack.feedback_date,
+                    FeedBack.feedback_score,
+                    ConversationMetrics.game,
+                    ConversationMetrics.model,
+                )
+                .join(
+                    ConversationMetrics,
+                    FeedBack.conversation_id == ConversationMetrics.id,
+                )
+                .filter(FeedBack.feedback_date.isnot(None))
+            )
+            if since is not None:
+                conversations = conversations.filter(
+                    _window(ConversationMetrics.request_time, since, ranges)
+                )
+                feedback = feedback.filter(
+                    _window(FeedBack.feedback_date, since, ranges)
+                )
+
+            rollups, histograms = self._aggregate(conversations, feedback)
+
+            for model in (ConversationRollup, LatencyHistogram):
+                stale = session.query(model)
+                if since is not None:
+                    stale = stale.filter(_window(model.bucket, since, ranges))
+                stale.delete(synchronize_session=False)
+            if rollups:
+                session.execute(insert(ConversationRollup), list(rollups.values()))
+            if histograms:
+                session.execute(insert(LatencyHistogram), histograms)
+            if marked:
+                session.query(StaleRollupBucket).filter(
+                    StaleRollupBucket.id.in_([row_id for row_id, _ in marked])
+                ).delete(synchronize_session=False)
+
+            expired = datetime.now() - self.minute_retention
+            for model in (ConversationRollup, LatencyHistogram):
+                session.query(model).filter(
+                    model.resolution == 'minute', model.bucket < expired
+                ).delete(synchronize_session=False)
+
+        return len(rollups) + len(histograms)
+
+    def _since(self, session) -> Optional[datetime]:
+        """Start of the window to recompute: `lookback` before the newest hourly bucket."""
+        newest = (
+            session.query(func.max(ConversationRollup.bucket))
+            .filter(ConversationRollup.resolution == 'hour')
+            .scalar()
+        )
+        if newest is None:
+            return None
+        return RESOLUTIONS['hour'](newest - self.lookback)
+
+    def _aggregate(
+        self, conversations, feedback
+    ) -> Tuple[Dict[Key, Dict[str, Any]], List[Dict[str, Any]]]:
+        rollups: Dict[Key, Dict[str, Any]] = {}
+        histograms: Dict[Tuple, int] = {}
+
+        def rollup(resolution: str, timestamp: datetime, game: str, model: str):
+            key = (resolution, RESOLUTIONS[resolution](timestamp), game, model)
+            if key not in rollups:
+                rollups[key] = {
+                    'resolution': key[0],
+                    'bucket': key[1],
+                    'game': game,
+                    'model': model,
+                    'conversations': 0,
+                    'cache_hits': 0,
+                    'relevant': 0,
+                    'partly_relevant': 0,
+                    'non_relevant': 0,
+                    'response_time_sum': 0.0,
+                    'latency_saved_sum': 0.0,
+                    'thumbs_up': 0,
+                    'thumbs_down': 0,
+                    **{column: 0 for column in SUMMED_COLUMNS},
+                }
+            return rollups[key]
+
+        for row in conversations:
+            for resolution in RESOLUTIONS:
+                totals = rollup(resolution, row.request_time, row.game, row.model)
+                totals['conversations'] += 1
+                totals['cache_hits'] += 1 if row.cache_hit else 0
+                if row.relevance in RELEVANCE_COLUMNS:
+                    totals[RELEVANCE_COLUMNS[row.relevance]] += 1
+                totals['response_time_sum'] += row.response_time or 0.0
+                totals['latency_saved_sum'] += row.latency_saved or 0.0
+                for column in SUMMED_COLUMNS:
+                    totals[column] += getattr(row, column) or 0
+                if row.cache_hit:
+                    continue
+                for stage, column in STAGES.items():
+                    seconds = getattr(row, column)
+                    if seconds is None:
+                        continue
+                    le = LATENCY_BUCKETS[bisect.bisect_left(LATENCY_BUCKETS, seconds)]
+                    key = (
+                        resolution,
+                        totals['bucket'],
+                        row.game,
+                        row.model,
+                        stage,
+                        le,
+                    )
+                    histograms[key] = histograms.get(key, 0) + 1
+
+        for row in feedback:
+            for resolution in RESOLUTIONS:
+                totals = rollup(resolution, row.feedback_date, row.game, row.model)
+                if (row.feedback_score or 0) > 0:
+                    totals['thumbs_up'] += 1
+                else:
+                    totals['thumbs_down'] += 1
+
+        return rollups, [
+            {
+                'resolution': resolution,
+                'bucket': bucket,
+                'game': game,
+                'model': model,
+                'stage': stage,
+                'le': le,
+                'count': count,
+            }
+            for (
+                resolution,
+                bucket,
+                game,
+                model,
+                stage,
+                le,
+            ), count in histograms.items()
+        ]
+
+    def start(self, interval: float = 60.0):
+        """Refreshes the rollups every `interval` seconds from a daemon thread."""
+        if self._thread is not None:
+            return
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.refresh()
+                except Exception as err:
+                    print(f"Error refreshing the metrics rollups: {str(err)}")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="metrics-rollup", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def _hour_ranges(hours) -> List[Tuple[datetime, datetime]]:
+    """Merges hourly buckets into the [start, end) ranges they cover."""
+    ranges: List[Tuple[datetime, datetime]] = []
+    for hour in sorted(set(hours)):
+        if ranges and ranges[-1][1] == hour:
+            ranges[-1] = (ranges[-1][0], hour + timedelta(hours=1))
+        else:
+            ranges.append((hour, hour + timedelta(hours=1)))
+    return ranges
+
+
+def _window(column, since: datetime, ranges: List[Tuple[datetime, datetime]]):
+    """Filter on `column` for the timestamps from `since` onwards or within `ranges`."""
+    return or_(
+        column >= since,
+        *[and_(column >= start, column < end) for start, end in ranges],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Refresh the dashboard's pre-aggregated metrics tables."
+    )
+    parser.add_argument("--full", action="store_true", help="Rebuild every bucket")
+    args = parser.parse_args()
+
+    db_connector = DataBaseConnector(
+        db_type=os.getenv("DB_TYPE", "sqlite"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+    )
+    written = MetricsRollup(db_connector).refresh(full=args.full)
+    print(f"Wrote {written} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
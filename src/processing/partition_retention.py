@@ -0,0 +1,455 @@
+import os
+import re
+import sys
+import argparse
+
+if __name__ == "__main__":
+    # Run as a script rather than imported through the processing package
+    sys.path.append('src/')
+
+from typing import Dict, List, Tuple, Optional
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from db import DataBaseConnector
+from models import partitioned_tables
+from models.model import Base
+
+PARTITION_NAME = re.compile(r'^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$')
+
+
+def add_months(month: date, months: int) -> date:
+    """Returns the first day of the month `months` after `month`."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def parse_partition_name(name: str) -> Optional[Tuple[str, date]]:
+    """Returns the table and month of a monthly partition name, or None."""
+    match = PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return match['table'], date(int(match['year']), int(match['month']), 1)
+
+
+class PartitionManager:
+    """
+    Maintains the monthly partitions of the tables the ORM partitions on Postgres.
+
+    `conversation` and `feedback` are partitioned by month of their timestamp, so
+    dashboards and inserts only touch the recent partitions' indexes, and old months
+    are dropped as whole tables instead of deleted row by row. Each table also has a
+    DEFAULT partition that takes rows no monthly partition covers.
+
+    `ensure_partitions` creates the partitions of the coming months, and of any month
+    found in the default partition, moving those rows into it. `archive` exports the
+    partitions older than `retention_months` to a compressed Parquet file per
+    partition, under `archive_dir/<table>/`, then detaches and drops them.
+
+    Databases created before partitioning keep their plain tables, since the schema
+    only creates missing tables; both methods refuse to run on them until `migrate`
+    has converted them.
+
+    Attributes:
+        db_connector (DataBaseConnector): The Postgres database.
+        archive_dir (str): Directory of the Parquet archives.
+        retention_months (int): Number of past months kept in the database, besides the current one.
+        months_ahead (int): Number of future months to create partitions for.
+        compression (str): Parquet compression codec.
+        batch_size (int): Rows read and written at a time when archiving.
+    """
+
+    def __init__(
+        self,
+        db_connector: DataBaseConnector,
+        archive_dir: str = os.getenv("PARTITION_ARCHIVE_DIR", "data/archive"),
+        retention_months: int = int(os.getenv("PARTITION_RETENTION_MONTHS", "6")),
+        months_ahead: int = 2,
+        compression: str = 'zstd',
+        batch_size: int = 10000,
+    ) -> None:
+        self.db_connector = db_connector
+        self.archive_dir = archive_dir
+        self.retention_months = retention_months
+        self.months_ahead = months_ahead
+        self.compression = compression
+        self.batch_size = batch_size
+        self.tables: Dict[str, str] = partitioned_tables(Base.metadata)
+
+    @property
+    def enabled(self) -> bool:
+        return self.db_connector.engine.dialect.name == 'postgresql'
+
+    def ensure_partitions(self, today: Optional[date] = None) -> List[str]:
+        """Creates the missing partitions of this month and the next `months_ahead` ones.
+
+        Partitions are also created for the months of the rows in the default
+        partition, which are moved into them.
+
+        Args:
+            today (date, optional): The current date. Defaults to today.
+
+        Returns:
+            list: The names of the partitions created.
+
+        Raises:
+            RuntimeError: If a table was created before partitioning and not migrated.
+        """
+        if not self.enabled:
+            print("Partitioning is only available on PostgreSQL")
+            return []
+
+        this_month = (today or date.today()).replace(day=1)
+        created = []
+        with self.db_connector.engine.begin() as connection:
+            self._check_partitioned(connection)
+            for table, column in self.tables.items():
+                existing = self._partitions(connection, table)
+                months = {
+                    add_months(this_month, i) for i in range(self.months_ahead + 1)
+                }
+                months.update(
+                    row[0].date()
+                    for row in connection.execute(
+                        text(
+                            f"SELECT DISTINCT date_trunc('month', {column}) "
+                            f"FROM {table}_default"
+                        )
+                    )
+                )
+                for month in sorted(months):
+                    name = partition_name(table, month)
+                    if name not in existing:
+                        self._create_partition(connection, table, column, month)
+                        created.append(name)
+        return created
+
+    def migrate(self) -> Dict[str, int]:
+        """Converts the tables created before partitioning into partitioned tables.
+
+        Each plain table is renamed to `<table>_unpartitioned`, with its indexes and
+        serial sequence, the partitioned table is created from the ORM model and the
+        rows are copied into its default partition; rows without a timestamp get the
+        current time. The old tables are dropped once every table is copied, all in a
+        single transaction, then `ensure_partitions` moves the rows into monthly
+        partitions. Tables that are already partitioned are left alone.
+
+        Returns:
+            dict: The number of rows copied per table.
+        """
+        if not self.enabled:
+            print("Partitioning is only available on PostgreSQL")
+            return {}
+
+        migrated = {}
+        with self.db_connector.engine.begin() as connection:
+            plain = self._unpartitioned(connection)
+            if not plain:
+                print("The tables are already partitioned")
+                return migrated
+            # The view would follow the renamed table and keep it from being dropped
+            connection.execute(text("DROP VIEW IF EXISTS conversation_metrics"))
+            sequences = {table: self._set_aside(connection, table) for table in plain}
+            # Creates the renamed tables with their default partitions, and the view
+            Base.metadata.create_all(connection)
+            for table in plain:
+                migrated[table] = self._copy_rows(connection, table, sequences[table])
+                print(f"Copied {migrated[table]} rows into the partitioned {table}")
+            for table in reversed(plain):
+                connection.execute(text(f"DROP TABLE {table}_unpartitioned"))
+        self.ensure_partitions()
+        return migrated
+
+    def _unpartitioned(self, connection) -> List[str]:
+        """Returns the tables that exist as plain tables instead of partitioned ones."""
+        return [
+            table
+            for table in self.tables
+            if connection.execute(
+                text(
+                    "SELECT relkind FROM pg_class "
+                    "WHERE relname = :table AND pg_table_is_visible(oid)"
+                ),
+                {'table': table},
+            ).scalar()
+            == 'r'
+        ]
+
+    def _check_partitioned(self, connection):
+        plain = self._unpartitioned(connection)
+        if plain:
+            raise RuntimeError(
+                f"{', '.join(plain)} predate partitioning and are plain tables; "
+                f"run `make partition-migrate` once to convert them"
+            )
+
+    def _set_aside(self, connection, table: str) -> List[str]:
+        """Renames `table`, its indexes and its serial sequences out of the way.
+
+        Returns:
+            list: The columns filled from a serial sequence.
+        """
+        old = f"{table}_unpartitioned"
+        connection.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+        indexes = connection.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename = :table"),
+            {'table': old},
+        ).all()
+        for (index,) in indexes:
+            connection.execute(text(f"ALTER INDEX {index} RENAME TO {index}_old"))
+        sequences = connection.execute(
+            text(
+                "SELECT attname, pg_get_serial_sequence(:table, attname) "
+                "FROM pg_attribute WHERE attrelid = CAST(:table AS regclass) "
+                "AND attnum > 0 AND NOT attisdropped"
+            ),
+            {'table': old},
+        ).all()
+        serial = []
+        for column, sequence in sequences:
+            if sequence is not None:
+                connection.execute(
+                    text(
+                        f"ALTER SEQUENCE {sequence} RENAME TO {table}_{column}_seq_old"
+                    )
+                )
+                serial.append(column)
+        return serial
+
+    def _copy_rows(self, connection, table: str, serial: List[str]) -> int:
+        """Copies the rows of `<table>_unpartitioned` into `table` and moves its sequences past them."""
+        old = f"{table}_unpartitioned"
+        existing = {
+            row[0]
+            for row in connection.execute(
+                text(
+                    "SELECT column_name FROM information_schema.columns "
+                    "WHERE table_name = :table"
+                ),
+                {'table': old},
+            )
+        }
+        columns = [
+            column.name
+            for column in Base.metadata.tables[table].columns
+            if column.name in existing
+        ]
+        values = [
+            (
+                f"COALESCE({column}, CURRENT_TIMESTAMP)"
+                if column == self.tables[table]
+                else column
+            )
+            for column in columns
+        ]
+        copied = connection.execute(
+            text(
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"SELECT {', '.join(values)} FROM {old}"
+            )
+        ).rowcount
+        for column in serial:
+            connection.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                    f"COALESCE(MAX({column}), 0) + 1, false) FROM {table}"
+                )
+            )
+        return copied
+
+    def _partitions(self, connection, table: str) -> List[str]:
+        return [
+            row[0]
+            for row in connection.execute(
+                text(
+                    "SELECT child.relname FROM pg_inherits "
+                    "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                    "WHERE parent.relname = :table"
+                ),
+                {'table': table},
+            )
+        ]
+
+    def _create_partition(self, connection, table: str, column: str, month: date):
+        """Creates the partition of `month`, with the rows of the default partition in its range.
+
+        Creating it with PARTITION OF would fail if the default partition holds rows
+        of that month, so the table is filled first and attached afterwards.
+        """
+        name = partition_name(table, month)
+        start, end = month.isoformat(), add_months(month, 1).isoformat()
+        connection.execute(
+            text(
+                f"CREATE TABLE {name} "
+                f"(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+        )
+        connection.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {table}_default "
+                f"WHERE {column} >= '{start}' AND {column} < '{end}' RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            )
+        )
+        connection.execute(
+            text(
+                f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+        )
+        print(f"Created partition {name}")
+
+    def archive(self, today: Optional[date] = None) -> Dict[str, int]:
+        """Exports the partitions older than the retention to Parquet, then drops them.
+
+        A partition is only dropped once its file is written and holds every row.
+
+        Args:
+            today (date, optional): The current date. Defaults to today.
+
+        Returns:
+            dict: The number of rows archived per partition.
+
+        Raises:
+            RuntimeError: If a table was created before partitioning and not migrated.
+        """
+        if not self.enabled:
+            print("Partitioning is only available on PostgreSQL")
+            return {}
+
+        cutoff = add_months(
+            (today or date.today()).replace(day=1), -self.retention_months
+        )
+        with self.db_connector.engine.connect() as connection:
+            self._check_partitioned(connection)
+        archived = {}
+        for table in self.tables:
+            with self.db_connector.engine.connect() as connection:
+                expired = sorted(
+                    name
+                    for name in self._partitions(connection, table)
+                    if (parsed := parse_partition_name(name)) is not None
+                    and parsed[0] == table
+                    and add_months(parsed[1], 1) <= cutoff
+                )
+            for name in expired:
+                path = os.path.join(self.archive_dir, table, f"{name}.parquet")
+                archived[name] = self.export(table, name, path)
+                with self.db_connector.engine.begin() as connection:
+                    connection.execute(
+                        text(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                    )
+                    connection.execute(text(f"DROP TABLE {name}"))
+                print(f"Archived {archived[name]} rows of {name} to {path}")
+        return archived
+
+    def export(self, table: str, source: str, path: str) -> int:
+        """Writes the rows of `source`, a table with the columns of `table`, to a Parquet file.
+
+        Rows are streamed in batches of `batch_size`; the Arrow schema comes from the
+        ORM columns, so batches with only NULLs in a column keep its type. The file is
+        written next to `path` and renamed once complete.
+
+        Args:
+            table (str): The partitioned table, whose ORM columns are exported.
+            source (str): The table or partition to read.
+            path (str): The Parquet file to write.
+
+        Returns:
+            int: The number of rows written.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+            ValueError: If the file does not hold every row that was read.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as err:
+            print(f"Archiving partitions requires pyarrow: {str(err)}")
+            raise
+
+        columns = list(Base.metadata.tables[table].columns)
+        schema = pa.schema([(column.name, _arrow_type(column)) for column in columns])
+        names = ', '.join(column.name for column in columns)
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        partial_path = f"{path}.partial"
+        rows = 0
+        with self.db_connector.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(
+                text(f"SELECT {names} FROM {source}").columns(*columns)
+            )
+            with pq.ParquetWriter(
+                partial_path, schema, compression=self.compression
+            ) as writer:
+                for batch in result.partitions(self.batch_size):
+                    writer.write_table(
+                        pa.Table.from_pylist([row._asdict() for row in batch], schema)
+                    )
+                    rows += len(batch)
+
+        written = pq.ParquetFile(partial_path).metadata.num_rows
+        if written != rows:
+            os.remove(partial_path)
+            raise ValueError(f"{path} holds {written} of the {rows} rows of {source}")
+        os.replace(partial_path, path)
+        return rows
+
+
+def _arrow_type(column):
+    import pyarrow as pa
+
+    python_type = column.type.python_type
+    if python_type is bool:
+        return pa.bool_()
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    if python_type is datetime:
+        return pa.timestamp('us')
+    if python_type is bytes:
+        return pa.binary()
+    return pa.string()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create upcoming partitions and archive expired ones to Parquet."
+    )
+    parser.add_argument(
+        "--no-archive", action="store_true", help="Only create the partitions"
+    )
+    parser.add_argument(
+        "--migrate",
+        action="store_true",
+        help="Convert the tables created before partitioning, keeping their rows",
+    )
+    args = parser.parse_args()
+
+    db_connector = DataBaseConnector(
+        db_type=os.getenv("DB_TYPE", "sqlite"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+    )
+    manager = PartitionManager(db_connector)
+    if args.migrate:
+        manager.migrate()
+    else:
+        manager.ensure_partitions()
+    if not args.no_archive:
+        manager.archive()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
-from typing import Any, Union, TypeVar
+import os
+import json
+import time
+import threading
+from typing import Any, Dict, List, Tuple, Union, TypeVar, Iterable, Iterator, Optional
 
 from groq import Groq
-from jinja2 import Template
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 from openai import OpenAI
 from pydantic import BaseModel
 from groq.types.chat.chat_completion import ChatCompletion as GroqChatCompletion
@@ -9,6 +13,125 @@ from openai.types.chat.chat_completion import ChatCompletion as OpenAIChatComple
 
 M = TypeVar('M', bound=BaseModel)
 
+DEFAULT_TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", "data/cache/jinja")
+
+_environments: Dict[str, Environment] = {}
+_environments_lock = threading.Lock()
+
+
+def format_context(documents: Any) -> str:
+    """Formats retrieved reviews as a compact numbered list for the prompt.
+
+    Only the review text is kept, with its whitespace collapsed; the LangChain
+    `Document` repr and its metadata dict would only cost prompt tokens.
+
+    Args:
+        documents: The retrieved `Document` list. Strings are returned unchanged.
+
+    Returns:
+        str: One line per review, e.g. '1. Great maps but too many cheaters'.
+    """
+    if isinstance(documents, str):
+        return documents
+    return "\n".join(
+        f"{i}. {' '.join(getattr(document, 'page_content', str(document)).split())}"
+        for i, document in enumerate(documents, start=1)
+    )
+
+
+def get_template_environment(
+    directory: str, cache_dir: Optional[str] = DEFAULT_TEMPLATE_CACHE_DIR
+) -> Environment:
+    """Returns the shared Jinja environment of a template directory.
+
+    Templates are compiled once and kept in the environment's cache. `auto_reload`
+    recompiles a template only when its file's mtime changes, and the compiled
+    bytecode is cached on disk in `cache_dir` so new processes skip parsing too.
+
+    Args:
+        directory (str): Directory of the templates.
+        cache_dir (str, optional): Directory of the bytecode cache. Defaults to the `TEMPLATE_CACHE_DIR` environment variable or 'data/cache/jinja'. None disables it.
+
+    Returns:
+        Environment: The environment, created on first use.
+    """
+    key = os.path.abspath(directory)
+    with _environments_lock:
+        if key not in _environments:
+            bytecode_cache = None
+            if cache_dir is not None:
+                try:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    bytecode_cache = FileSystemBytecodeCache(cache_dir)
+                except OSError as err:
+                    print(f"Template bytecode cache disabled: {str(err)}")
+            environment = Environment(
+                loader=FileSystemLoader(directory),
+                auto_reload=True,
+                bytecode_cache=bytecode_cache,
+            )
+            environment.filters['format_context'] = format_context
+            _environments[key] = environment
+        return _environments[key]
+
+
+class AnswerStream:
+    """Iterates over the text deltas of a streamed chat completion.
+
+    While the stream is consumed it accumulates the answer and measures the time to
+    the first token and the total generation time, both from the moment the request
+    was sent. Token usage is read from the final chunk: `usage` for OpenAI (with
+    `stream_options={"include_usage": True}`) and `x_groq.usage` for Groq.
+
+    Attributes:
+        answer (str): The text received so far.
+        usage (Dict[str, int]): 'prompt_tokens', 'completion_tokens' and 'total_tokens', zero until the final chunk arrives.
+        time_to_first_token (float): Seconds until the first text delta, or None before it arrives.
+        generation_time (float): Seconds until the stream was exhausted, or None before that.
+        prompt_time (float): Seconds spent rendering the prompt, before the request was sent.
+    """
+
+    def __init__(
+        self, chunks: Iterable[Any], start_time: float, prompt_time: float = 0.0
+    ) -> None:
+        self._chunks = chunks
+        self._start_time = start_time
+        self.prompt_time = prompt_time
+        self._parts: list = []
+        self.usage: Dict[str, int] = {
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'total_tokens': 0,
+        }
+        self.time_to_first_token: Optional[float] = None
+        self.generation_time: Optional[float] = None
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self._chunks:
+            usage = getattr(chunk, 'usage', None)
+            if usage is None and getattr(chunk, 'x_groq', None) is not None:
+                usage = chunk.x_groq.usage
+            if usage is not None:
+                self.usage = {
+                    'prompt_tokens': usage.prompt_tokens,
+                    'completion_tokens': usage.completion_tokens,
+                    'total_tokens': usage.total_tokens,
+                }
+
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - self._start_time
+                self._parts.append(content)
+                yield content
+        self.generation_time = time.perf_counter() - self._start_time
+
+    @property
+    def answer(self) -> str:
+        return ''.join(self._parts)
+
 
 class QuestionAnswering:
     def __init__(
@@ -17,15 +140,17 @@ class QuestionAnswering:
         prompt_assistant_path: str,
         prompt_evaluate_path: str,
         model_name: str,
+        prompt_evaluate_batch_path: Optional[str] = None,
     ) -> None:
         self.prompt_assistant_path = prompt_assistant_path
         self.prompt_evaluate_path = prompt_evaluate_path
+        self.prompt_evaluate_batch_path = prompt_evaluate_batch_path
         self._model = model
         self._model_name = model_name
 
     def get_prompt(self, prompt_path: str, **kwargs: Any) -> str:
-        with open(prompt_path, 'r', encoding='utf-8') as f_in:
-            template = Template(f_in.read())
+        directory, name = os.path.split(prompt_path)
+        template = get_template_environment(directory or '.').get_template(name)
         return template.render(**kwargs)
 
     def evaluate_relevance(
@@ -44,6 +169,49 @@ class QuestionAnswering:
 
         return response
 
+    def evaluate_relevance_batch(
+        self, items: List[Tuple[str, str]]
+    ) -> Union[GroqChatCompletion, OpenAIChatCompletion]:
+        """Evaluates several question/answer pairs with a single LLM call.
+
+        The response is a JSON list with one {"Id", "Relevance", "Explanation"} object
+        per pair, where "Id" is the position of the pair in `items`.
+
+        Args:
+            items (list): `(question, answer)` pairs.
+
+        Raises:
+            ValueError: If no batch evaluation prompt was configured.
+        """
+        if self.prompt_evaluate_batch_path is None:
+            raise ValueError("No batch evaluation prompt configured")
+        prompt = self.get_prompt(
+            prompt_path=self.prompt_evaluate_batch_path,
+            items=[
+                {'id': i, 'question': question, 'answer': answer}
+                for i, (question, answer) in enumerate(items)
+            ],
+        )
+
+        response = self._model.chat.completions.create(
+            messages=[{'role': 'user', 'content': prompt}],
+            model=self._model_name,
+        )
+
+        print('Evaluate batch:', response)
+
+        return response
+
+    @staticmethod
+    def parse_evaluation(content: str) -> Any:
+        """Decodes the JSON of an evaluation response, tolerating Markdown code fences.
+
+        Raises:
+            json.JSONDecodeError: If the content is not valid JSON.
+        """
+        content = content.strip().removeprefix('```json').strip('`').strip()
+        return json.loads(content)
+
     def generate_answer(
         self, question: str, context
     ) -> Union[GroqChatCompletion, OpenAIChatCompletion]:
@@ -59,6 +227,35 @@ class QuestionAnswering:
 
         return response
 
+    def stream_answer(self, question: str, context) -> AnswerStream:
+        """Requests a streamed answer, so it can be rendered while it is generated.
+
+        Args:
+            question (str): The user question.
+            context: The retrieved reviews rendered into the prompt.
+
+        Returns:
+            AnswerStream: Iterator over the text deltas, exposing the answer, usage and timings once consumed.
+        """
+        render_start = time.perf_counter()
+        prompt = self.get_prompt(
+            prompt_path=self.prompt_assistant_path, question=question, context=context
+        )
+        prompt_time = time.perf_counter() - render_start
+        kwargs: Dict[str, Any] = {}
+        if isinstance(self._model, OpenAI):
+            # Groq always reports usage in `x_groq`; OpenAI only when asked
+            kwargs['stream_options'] = {'include_usage': True}
+
+        start_time = time.perf_counter()
+        chunks = self._model.chat.completions.create(
+            messages=[{'role': 'user', 'content': prompt}],
+            model=self._model_name,
+            stream=True,
+            **kwargs,
+        )
+        return AnswerStream(chunks, start_time, prompt_time)
+
     @property
     def model_name(self) -> str:
         return self._model_name
@@ -0,0 +1,253 @@
+import json
+import queue
+import threading
+
+from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from db import DataBaseConnector
+from utils import StageTimer
+from models import Conversation, RelevanceEnum
+
+from .qa_answering import QuestionAnswering
+from .write_buffer import WriteBehindBuffer
+
+# A queued evaluation: (conversation row ID, question, answer, QuestionAnswering)
+Job = Tuple[int, str, str, QuestionAnswering]
+
+
+class RelevanceWorker:
+    """
+    Evaluates answer relevance in the background and fills in the conversation rows.
+
+    The chat saves each `Conversation` with a PENDING relevance and submits it here,
+    so the evaluation LLM call is off the request path. A dispatcher thread drains the
+    local queue, groups jobs that use the same model into batches of up to
+    `batch_size`, and hands each batch to a thread pool. A batch is evaluated with a
+    single LLM call when the `QuestionAnswering` has a batch prompt; the token usage
+    of that call is split evenly between the conversations of the batch. Responses
+    that are not valid JSON are retried up to `max_retries` times before the rows are
+    marked FAILED. With a `write_buffer`, the evaluations are queued as updates of the
+    buffered conversation rows, which may not have been written yet.
+
+    Attributes:
+        db_connector (DataBaseConnector): Database the conversation rows are updated in.
+        write_buffer (WriteBehindBuffer): Buffer the conversations were added to, or None.
+        batch_size (int): Maximum number of evaluations per LLM call.
+        max_wait (float): Seconds the dispatcher waits for more jobs to fill a batch.
+        max_retries (int): Retries of an evaluation whose response cannot be parsed.
+    """
+
+    def __init__(
+        self,
+        db_connector: DataBaseConnector,
+        max_workers: int = 2,
+        batch_size: int = 4,
+        max_wait: float = 0.5,
+        max_retries: int = 2,
+        write_buffer: Optional[WriteBehindBuffer] = None,
+    ) -> None:
+        self.db_connector = db_connector
+        self.write_buffer = write_buffer
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="relevance"
+        )
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="relevance-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    def submit(
+        self, conversation_id: int, question: str, answer: str, qa: QuestionAnswering
+    ):
+        """Queues the relevance evaluation of a saved conversation.
+
+        Args:
+            conversation_id (int): Primary key of the `Conversation` row.
+            question (str): The user question.
+            answer (str): The generated answer.
+            qa (QuestionAnswering): Client and model used for the evaluation.
+        """
+        with self._idle:
+            self._pending += 1
+        self._queue.put((conversation_id, question, answer, qa))
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every submitted evaluation has been stored.
+
+        Returns:
+            bool: False if `timeout` expired first.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def shutdown(self, wait: bool = True):
+        """Stops the dispatcher once the queue is drained, then the worker pool."""
+        self._queue.put(None)
+        if wait:
+            self._dispatcher.join()
+        self._executor.shutdown(wait=wait)
+
+    def _dispatch(self):
+        """Collects jobs into per-model batches and submits them to the worker pool."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            batches: Dict[str, List[Job]] = {job[3].model_name: [job]}
+            stop = False
+            while len(batches[job[3].model_name]) < self.batch_size:
+                try:
+                    job = self._queue.get(timeout=self.max_wait)
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batches.setdefault(job[3].model_name, []).append(job)
+            for batch in batches.values():
+                self._executor.submit(self._process, batch)
+            if stop:
+                return
+
+    def _process(self, batch: List[Job]):
+        with StageTimer(
+            "relevance_evaluation",
+            {"model": batch[0][3].model_name, "batch_size": len(batch)},
+        ) as timer:
+            try:
+                with timer.stage("evaluation"):
+                    results = self._evaluate(batch)
+            except Exception as err:
+                print(f"Error evaluating relevance: {str(err)}")
+                results = [
+                    (RelevanceEnum.FAILED.value, str(err), {})
+                    for _ in range(len(batch))
+                ]
+        try:
+            self._store(batch, results, timer.durations["evaluation"])
+        except Exception as err:
+            print(f"Error saving relevance: {str(err)}")
+        finally:
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    def _evaluate(self, batch: List[Job]) -> List[Tuple[str, str, Dict[str, int]]]:
+        """Evaluates a batch, retrying when the response is not the expected JSON.
+
+        Returns:
+            list: One `(relevance, explanation, usage)` triple per job.
+        """
+        qa = batch[0][3]
+        use_batch_prompt = len(batch) > 1 and qa.prompt_evaluate_batch_path is not None
+        if len(batch) > 1 and not use_batch_prompt:
+            return [result for job in batch for result in self._evaluate([job])]
+
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        for attempt in range(self.max_retries + 1):
+            if use_batch_prompt:
+                response = qa.evaluate_relevance_batch(
+                    [(question, answer) for _, question, answer, _ in batch]
+                )
+            else:
+                response = qa.evaluate_relevance(batch[0][1], batch[0][2])
+            # Retried calls are billed too
+            for key in usage:
+                usage[key] += getattr(response.usage, key, 0) or 0
+            try:
+                evaluations = self._parse(
+                    response.choices[0].message.content, len(batch)
+                )
+                break
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError) as err:
+                print(f"Unparsable relevance evaluation (attempt {attempt + 1}): {err}")
+        else:
+            evaluations = [
+                {
+                    "Relevance": RelevanceEnum.FAILED.value,
+                    "Explanation": "The evaluation response could not be parsed",
+                }
+            ] * len(batch)
+
+        return [
+            (evaluation["Relevance"], evaluation["Explanation"], usage)
+            for evaluation, usage in zip(
+                evaluations, self._split_usage(usage, len(batch))
+            )
+        ]
+
+    @staticmethod
+    def _parse(content: str, size: int) -> List[Dict[str, str]]:
+        """Decodes the evaluations of a response, in the order of the batch."""
+        evaluation = QuestionAnswering.parse_evaluation(content)
+        if size == 1 and isinstance(evaluation, dict):
+            evaluations = [evaluation]
+        else:
+            by_id = {int(item["Id"]): item for item in evaluation}
+            evaluations = [by_id[i] for i in range(size)]
+        for item in evaluations:
+            if item["Relevance"] not in (
+                RelevanceEnum.RELEVANT.value,
+                RelevanceEnum.PARTLY_RELEVANT.value,
+                RelevanceEnum.NON_RELEVANT.value,
+            ):
+                raise ValueError(f"Unexpected relevance: {item['Relevance']}")
+            item.setdefault("Explanation", "")
+        return evaluations
+
+    @staticmethod
+    def _split_usage(usage: Dict[str, int], size: int) -> List[Dict[str, int]]:
+        """Splits the token usage of a batch evenly between its `size` conversations."""
+        shares = []
+        for i in range(size):
+            share = {}
+            for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                total = usage[key]
+                share[key] = total // size + (1 if i < total % size else 0)
+            shares.append(share)
+        return shares
+
+    def _store(
+        self,
+        batch: List[Job],
+        results: List[Tuple[str, str, Dict[str, int]]],
+        evaluation_time: Optional[float] = None,
+    ):
+        """Fills in the evaluations; `evaluation_time` is the duration of the whole batch."""
+        if self.write_buffer is not None:
+            for (conversation_id, _, _, _), (relevance, explanation, usage) in zip(
+                batch, results
+            ):
+                self.write_buffer.update(
+                    Conversation,
+                    conversation_id,
+                    {
+                        "relevance": relevance,
+                        "relevance_explanation": explanation,
+                        "eval_prompt_tokens": usage.get("prompt_tokens", 0),
+                        "eval_completion_tokens": usage.get("completion_tokens", 0),
+                        "eval_total_tokens": usage.get("total_tokens", 0),
+                        "evaluation_time": evaluation_time,
+                    },
+                )
+            return
+        with self.db_connector.session_scope() as session:
+            for (conversation_id, _, _, _), (relevance, explanation, usage) in zip(
+                batch, results
+            ):
+                conversation = session.get(Conversation, conversation_id)
+                if conversation is None:
+                    continue
+                conversation.relevance = relevance
+                conversation.relevance_explanation = explanation
+                conversation.eval_prompt_tokens = usage.get("prompt_tokens", 0)
+                conversation.eval_completion_tokens = usage.get("completion_tokens", 0)
+                conversation.eval_total_tokens = usage.get("total_tokens", 0)
+                conversation.evaluation_time = evaluation_time
@@ -0,0 +1,100 @@
+import os
+import sys
+import argparse
+
+sys.path.append('src/')
+
+from typing import Any, Dict, List, Iterator, Optional
+
+from db import ParallelEmbedder, DataBaseConnector, LangChainChromaRAG
+from models import Review
+
+
+def iter_review_pages(
+    db_connector: DataBaseConnector,
+    game: str,
+    language: Optional[str] = 'english',
+    page_size: int = 20000,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Reads a game's reviews from the `review` table, in pages keyed on `recommendationid`.
+
+    Args:
+        db_connector (DataBaseConnector): Database holding the downloaded reviews.
+        game (str): Name of the game.
+        language (str, optional): Only read reviews in this language; None reads them all. Defaults to 'english'.
+        page_size (int, optional): Number of reviews per page. Defaults to 20000.
+
+    Yields:
+        list: Review dictionaries in the format of `LangChainChromaRAG.add_game_reviews`.
+    """
+    last_id = None
+    while True:
+        with db_connector.session_scope() as session:
+            query = session.query(
+                Review.recommendationid,
+                Review.language,
+                Review.game,
+                Review.review,
+                Review.timestamp_updated,
+            ).filter(Review.game == game)
+            if language is not None:
+                query = query.filter(Review.language == language)
+            if last_id is not None:
+                query = query.filter(Review.recommendationid > last_id)
+            rows = query.order_by(Review.recommendationid).limit(page_size).all()
+        if not rows:
+            return
+        last_id = rows[-1].recommendationid
+        yield [row._asdict() for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Embed a game's stored reviews into Chroma on a pool of processes."
+    )
+    parser.add_argument("--game", required=True, help="Game name, as in APP_IDS")
+    parser.add_argument("--language", default="english")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Defaults to the number of cores"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=20000)
+    args = parser.parse_args()
+
+    db_connector = DataBaseConnector(
+        db_type=os.getenv("DB_TYPE", "sqlite"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+    )
+    rag = LangChainChromaRAG(collection_name="steam_reviews")
+
+    totals = {"reviews": 0, "chunks": 0, "seconds": 0.0}
+    # One pool for every page, so each worker loads the model once
+    with ParallelEmbedder(
+        rag.embedding_model_name, workers=args.workers, batch_size=args.batch_size
+    ) as embedder:
+        for reviews in iter_review_pages(
+            db_connector, args.game, args.language, args.page_size
+        ):
+            stats = rag.backfill_game_reviews(
+                reviews, batch_size=args.batch_size, embedder=embedder
+            )
+            for key in totals:
+                totals[key] += stats[key]
+    if os.getenv("VECTOR_BACKEND", "http") == "embedded" and totals["reviews"]:
+        rag.publish_snapshot()
+
+    chunks_per_second = (
+        totals["chunks"] / totals["seconds"] if totals["seconds"] else 0.0
+    )
+    print(
+        f"Backfilled {totals['reviews']} reviews of {args.game} "
+        f"({totals['chunks']} chunks) at {chunks_per_second:.1f} chunks/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
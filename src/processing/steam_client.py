@@ -0,0 +1,181 @@
+import asyncio
+from typing import Any, Dict, List, Optional, AsyncIterator
+
+import aiohttp
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Network failures worth another attempt: dropped connections, timeouts, cut payloads
+RETRY_ERRORS = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+)
+
+
+class AsyncSteamReviewsClient:
+    """
+    An asynchronous client for the Steam reviews API that follows `cursor` pagination.
+
+    All requests share one pooled `aiohttp` session whose connector caps the number of
+    simultaneous connections per host, so several games can be downloaded concurrently
+    without hammering Steam. Rate-limited (429) and transient 5xx responses, as well
+    as dropped connections and timeouts, are retried with exponential backoff,
+    honouring the `Retry-After` header when present.
+
+    Attributes:
+        base_url (str): URL template of the reviews endpoint, containing the placeholder '{appid}'. The page size is taken from its `num_per_page` query parameter.
+        language (str): Language of the reviews to download.
+        max_concurrency_per_host (int): Maximum number of simultaneous connections to the same host.
+        max_retries (int): Maximum number of retries of a rate-limited or failed request.
+        backoff_factor (float): Base delay, in seconds, of the exponential backoff.
+        timeout (float): Total timeout, in seconds, of a single request.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        language: str = 'english',
+        max_concurrency_per_host: int = 4,
+        max_retries: int = 5,
+        backoff_factor: float = 1.0,
+        timeout: float = 20,
+    ) -> None:
+        self.base_url = base_url
+        self.language = language
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "AsyncSteamReviewsClient":
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=self.max_concurrency_per_host
+            ),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"Content-Type": "application/json"},
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch_page(
+        self, app_id: int, cursor: str = '*', review_filter: str = 'recent'
+    ) -> Dict[str, Any]:
+        """Fetches a single page of reviews.
+
+        Args:
+            app_id (int): Application ID on Steam.
+            cursor (str): Pagination cursor returned by the previous page. Defaults to '*' (first page).
+            review_filter (str): Steam sort order, 'recent' (by creation) or 'updated'. Defaults to 'recent'.
+
+        Raises:
+            RuntimeError: If the client is used outside of its `async with` block.
+            ValueError: If the API response is not in the expected format or lacks the 'reviews' key.
+            aiohttp.ClientResponseError: If the request still fails after all retries.
+            aiohttp.ClientError: If the network still fails after all retries.
+            asyncio.TimeoutError: If the request still times out after all retries.
+
+        Returns:
+            Dict[str, Any]: The decoded API response, including 'reviews' and the next 'cursor'.
+        """
+        if self._session is None:
+            raise RuntimeError(
+                "AsyncSteamReviewsClient must be used inside 'async with'"
+            )
+
+        url = self.base_url.format(appid=app_id, language=self.language)
+        params = {
+            "cursor": cursor,
+            "filter": review_filter,
+            "language": self.language,
+        }
+        attempt = 0
+        while True:
+            try:
+                async with self._session.get(url, params=params) as response:
+                    retry = (
+                        response.status in RETRY_STATUSES and attempt < self.max_retries
+                    )
+                    if retry:
+                        delay = self._retry_delay(response, attempt)
+                    else:
+                        response.raise_for_status()
+                        data = await response.json(content_type=None)
+            except RETRY_ERRORS:
+                if attempt >= self.max_retries:
+                    raise
+                retry, delay = True, self.backoff_factor * (2**attempt)
+            if not retry:
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if not isinstance(data, dict) or "reviews" not in data:
+            raise ValueError("API response is in an unexpected format")
+        return data
+
+    def _retry_delay(self, response: aiohttp.ClientResponse, attempt: int) -> float:
+        """Returns how long to wait before retrying, preferring the server's `Retry-After`."""
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return self.backoff_factor * (2**attempt)
+
+    async def iter_pages(
+        self,
+        app_id: int,
+        max_reviews: Optional[int] = None,
+        since_timestamp: Optional[int] = None,
+        review_filter: str = 'recent',
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yields pages of reviews as they arrive, following Steam's cursor pagination.
+
+        Paging stops when Steam returns an empty page or repeats a cursor, when
+        `max_reviews` reviews have been yielded, or when a page reaches reviews older
+        than `since_timestamp` (reviews are sorted newest first).
+
+        Args:
+            app_id (int): Application ID on Steam.
+            max_reviews (int, optional): Maximum number of reviews to yield. Defaults to None (no cap).
+            since_timestamp (int, optional): Unix timestamp horizon; older reviews are dropped. Defaults to None.
+            review_filter (str): Steam sort order, 'recent' or 'updated'. Defaults to 'recent'.
+
+        Yields:
+            List[Dict[str, Any]]: The reviews of each page.
+        """
+        timestamp_key = (
+            "timestamp_updated" if review_filter == 'updated' else "timestamp_created"
+        )
+        cursor, seen_cursors, total = '*', set(), 0
+        while cursor not in seen_cursors:
+            seen_cursors.add(cursor)
+            data = await self.fetch_page(app_id, cursor, review_filter)
+            reviews = data.get("reviews", [])
+            if not reviews:
+                return
+
+            reached_horizon = False
+            if since_timestamp is not None:
+                fresh = [
+                    r for r in reviews if r.get(timestamp_key, 0) > since_timestamp
+                ]
+                reached_horizon = len(fresh) < len(reviews)
+                reviews = fresh
+            if max_reviews is not None:
+                reviews = reviews[: max_reviews - total]
+
+            if reviews:
+                total += len(reviews)
+                yield reviews
+            if reached_horizon or (max_reviews is not None and total >= max_reviews):
+                return
+            cursor = data.get("cursor") or cursor
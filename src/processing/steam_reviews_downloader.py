@@ -1,16 +1,18 @@
 import os
 import sys
+import asyncio
 
 sys.path.append('src/')
 
-from typing import Any, Dict, List, Optional
-from datetime import timedelta
+from typing import Any, Set, Dict, List, Tuple, Optional
+from datetime import datetime, timedelta
 
-import requests
 from prefect import flow, task
-from prefect.tasks import task_input_hash
 
-from db import LangChainChromaRAG
+from db import DataBaseConnector, LangChainChromaRAG
+from models import Review, SyncState
+from models.model import Base
+from processing.steam_client import AsyncSteamReviewsClient
 
 
 class SteamReviewsDownloader:
@@ -21,7 +23,11 @@ class SteamReviewsDownloader:
     Attributes:
         app_ids (Dict[str, int]): Mapping of game names to their Steam IDs.
         base_url (str): Base URL for the Steam API, defined by the environment variable `STEAM_API_URL`.
-        headers (Dict[str, str]): HTTP request headers.
+        max_reviews (Optional[int]): Maximum number of reviews downloaded per game by its first sync.
+        max_age_days (Optional[int]): Date horizon; reviews not updated (created, without a database) in this many days are not downloaded.
+        max_concurrency_per_host (int): Maximum number of simultaneous connections to the Steam API.
+        db_connector (Optional[DataBaseConnector]): Connection holding the per-game sync watermarks. Without it every run is a full download.
+        publish_snapshots (bool): Whether runs that saved reviews publish a vector snapshot for the embedded search backend.
         rag (LangChainChromaRAG): LangChainChromaRAG instance for managing game reviews.
     """
 
@@ -31,6 +37,12 @@ class SteamReviewsDownloader:
         collection_name: str,
         language: str = 'english',
         embedding_model_name: str = 'sentence-transformers/all-MiniLM-L6-v2',
+        ingest_batch_size: int = 1000,
+        max_reviews: Optional[int] = 1000,
+        max_age_days: Optional[int] = None,
+        max_concurrency_per_host: int = 4,
+        db_connector: Optional[DataBaseConnector] = None,
+        publish_snapshots: Optional[bool] = None,
     ) -> None:
         """Initializes an instance of the class.
 
@@ -39,6 +51,12 @@ class SteamReviewsDownloader:
             collection_name (str): Name of the collection for LangChainChromaRAG.
             language (str): Language for the reviews. Defaults to 'english'.
             embedding_model_name (str]): Name of the embedding model. Defaults to 'sentence-transformers/all-MiniLM-L6-v2'.
+            ingest_batch_size (int): Number of chunks embedded and written to Chroma per upsert. Defaults to 1000.
+            max_reviews (Optional[int]): Maximum number of reviews downloaded per game. Defaults to 1000; None downloads every page. Incremental syncs (once a game has a watermark) are not capped, so that no update is skipped.
+            max_age_days (Optional[int]): Only download reviews updated in the last `max_age_days` days, or created in them without a database (reviews are then sorted by creation). Defaults to None (no horizon).
+            max_concurrency_per_host (int): Maximum number of simultaneous connections to the Steam API. Defaults to 4.
+            db_connector (Optional[DataBaseConnector]): Database holding the `sync_state` watermarks. Defaults to None (no incremental sync).
+            publish_snapshots (Optional[bool]): Publish a vector snapshot after runs that saved reviews. Defaults to True when the `VECTOR_BACKEND` environment variable is "embedded".
 
         Raises:
             ValueError: If the environment variable 'STEAM_API_URL' is not set or does not contain '{appid}'.
@@ -50,34 +68,188 @@ class SteamReviewsDownloader:
             raise ValueError(
                 "The environment variable 'STEAM_API_URL' must be defined and contain the placeholder '{appid}'"
             )
-        self.headers = {"Content-Type": "application/json"}
+        self.ingest_batch_size = ingest_batch_size
+        self.max_reviews = max_reviews
+        self.max_age_days = max_age_days
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.db_connector = db_connector
+        self.publish_snapshots = (
+            publish_snapshots
+            if publish_snapshots is not None
+            else os.getenv("VECTOR_BACKEND", "http") == "embedded"
+        )
         self.rag = LangChainChromaRAG(
             collection_name=collection_name, embedding_model_name=embedding_model_name
         )
 
-    @task(cache_key_fn=task_input_hash, cache_expiration=timedelta(hours=1))
-    def download_reviews(self, app_id: int, language: str) -> List[Any]:
-        """Downloads reviews for a given app_id from Steam.
+    def get_watermark(self, game_name: str) -> Optional[int]:
+        """Reads the highest `timestamp_updated` already synced for a game.
+
+        Args:
+            game_name (str): Name of the game.
+
+        Returns:
+            Optional[int]: The watermark, or None on the first sync or without a database.
+        """
+        if self.db_connector is None:
+            return None
+        with self.db_connector.session_scope() as session:
+            state = session.get(SyncState, game_name)
+            return state.last_timestamp_updated if state else None
+
+    def save_watermark(
+        self, game_name: str, app_id: int, timestamp_updated: int, synced: int
+    ):
+        """Stores the new high-water mark of a game once all its pages are saved.
 
         Args:
+            game_name (str): Name of the game.
             app_id (int): Application ID on Steam.
-            language (str): Language for the reviews.
+            timestamp_updated (int): Highest `timestamp_updated` among the synced reviews.
+            synced (int): Number of reviews downloaded by this run.
+        """
+        if self.db_connector is None:
+            return
+        with self.db_connector.session_scope() as session:
+            session.merge(
+                SyncState(
+                    game=game_name,
+                    app_id=app_id,
+                    last_timestamp_updated=timestamp_updated,
+                    reviews_synced=synced,
+                    last_synced=datetime.now(),
+                )
+            )
 
-        Raises:
-            ValueError: If the API response is not in the expected format or lacks the 'reviews' key.
+    async def download_reviews(
+        self, client: AsyncSteamReviewsClient, app_id: int, game_name: str, queue
+    ) -> Tuple[int, Optional[int]]:
+        """Downloads the new pages of reviews of a game and puts them on the processing queue.
+
+        With a database, reviews are requested most recently updated first and paging
+        stops as soon as it reaches the game's watermark, so a run only costs as many
+        requests as there are new or edited reviews. Edited reviews (created before the
+        watermark) are re-embedded by the content-hash upsert of the RAG store.
+
+        `max_reviews` only caps the first sync of a game. Once it has a watermark, every
+        review updated since is downloaded: the watermark moves to the newest one, so
+        the older ones a cap would cut off could never be fetched again.
+
+        Args:
+            client (AsyncSteamReviewsClient): Open client shared by all games.
+            app_id (int): Application ID on Steam.
+            game_name (str): Name of the game.
+            queue (asyncio.Queue): Bounded queue of `(game_name, reviews)` pages to process.
 
         Returns:
-            List[Dict[str, Any]]: List of reviews.
+            Tuple[int, Optional[int]]: Number of reviews downloaded and their highest `timestamp_updated`.
         """
-        url = self.base_url.format(appid=app_id, language=language)
-        response = requests.get(url, headers=self.headers, timeout=20)
-        response.raise_for_status()
+        watermark = await asyncio.to_thread(self.get_watermark, game_name)
+        since_timestamp = watermark
+        if self.max_age_days is not None:
+            horizon = int(
+                (datetime.now() - timedelta(days=self.max_age_days)).timestamp()
+            )
+            since_timestamp = max(horizon, watermark or 0)
+
+        downloaded, edited, high_water_mark = 0, 0, watermark
+        async for reviews in client.iter_pages(
+            app_id,
+            max_reviews=self.max_reviews if watermark is None else None,
+            since_timestamp=since_timestamp,
+            review_filter='updated' if self.db_connector else 'recent',
+        ):
+            downloaded += len(reviews)
+            if watermark is not None:
+                edited += sum(r["timestamp_created"] <= watermark for r in reviews)
+            high_water_mark = max(
+                [high_water_mark or 0] + [r["timestamp_updated"] for r in reviews]
+            )
+            await queue.put((game_name, reviews))
+        print(
+            f"Downloaded {downloaded} reviews for {game_name} "
+            f"({edited} edited since the last sync)"
+        )
+        return downloaded, high_water_mark
+
+    def process_page(self, reviews: List[Dict[str, Any]], game_name: str) -> int:
+        """Runs one downloaded page through the naming, storage and filtering stages.
+
+        The raw reviews are written to the `review` table before the 'author' field,
+        which carries the playtime columns, is filtered out for the RAG store.
+
+        Args:
+            reviews (List[Dict[str, Any]]): Reviews of a single page.
+            game_name (str): Name of the game.
+
+        Returns:
+            int: Number of reviews saved.
+        """
+        reviews_with_game = self.add_game_name(reviews, game_name)
+        self.save_reviews_to_db(reviews_with_game)
+        filtered_reviews = self.filter_reviews(reviews_with_game)
+        return self.save_reviews_to_rag(filtered_reviews)
+
+    async def _download_and_save(self) -> int:
+        """Downloads all games concurrently while a single consumer saves pages as they arrive.
+
+        Pages go through a bounded queue, so downloads pause when processing falls
+        behind, and storage runs in a worker thread to keep the event loop responsive.
+        A game's watermark only advances when all of its pages were saved.
 
-        data = response.json()
-        if not isinstance(data, dict) or "reviews" not in data:
-            raise ValueError("API response is in an unexpected format")
+        Returns:
+            int: Total number of reviews saved.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2 * len(self.app_ids) or 1)
+        failed_games: Set[str] = set()
+        total_saved = 0
 
-        return data.get("reviews", [])
+        async def consume():
+            nonlocal total_saved
+            while True:
+                item = await queue.get()
+                try:
+                    if item is None:
+                        return
+                    game_name, reviews = item
+                    total_saved += await asyncio.to_thread(
+                        self.process_page, reviews, game_name
+                    )
+                except Exception as err:
+                    print(f"Error processing reviews for {game_name}: {str(err)}")
+                    failed_games.add(game_name)
+                finally:
+                    queue.task_done()
+
+        consumer = asyncio.create_task(consume())
+        try:
+            async with AsyncSteamReviewsClient(
+                self.base_url,  # type: ignore
+                language=self.language,
+                max_concurrency_per_host=self.max_concurrency_per_host,
+            ) as client:
+                results = await asyncio.gather(
+                    *(
+                        self.download_reviews(client, app_id, game_name, queue)
+                        for game_name, app_id in self.app_ids.items()
+                    ),
+                    return_exceptions=True,
+                )
+            await queue.join()
+        finally:
+            await queue.put(None)
+            await consumer
+
+        for (game_name, app_id), result in zip(self.app_ids.items(), results):
+            if isinstance(result, Exception):
+                print(f"Error downloading reviews for {game_name}: {result}")
+                continue
+            downloaded, high_water_mark = result
+            if game_name not in failed_games and high_water_mark is not None:
+                await asyncio.to_thread(
+                    self.save_watermark, game_name, app_id, high_water_mark, downloaded
+                )
+        return total_saved
 
     @task
     def filter_reviews(self, reviews: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -113,6 +285,62 @@ class SteamReviewsDownloader:
             review["game"] = game_name
         return reviews
 
+    @staticmethod
+    def to_review_row(review: Dict[str, Any]) -> Dict[str, Any]:
+        """Maps a raw Steam review to a row of the `review` table.
+
+        Args:
+            review (Dict[str, Any]): A raw review, still holding its 'author' field, with the game name added.
+
+        Returns:
+            Dict[str, Any]: The column values of the review.
+        """
+        author = review.get("author", {})
+        last_played = author.get("last_played")
+        return {
+            "recommendationid": review["recommendationid"],
+            "game": review["game"],
+            "playtime_forever": author.get("playtime_forever"),
+            "playtime_last_two_weeks": author.get("playtime_last_two_weeks"),
+            "playtime_at_review": author.get("playtime_at_review"),
+            "last_played": datetime.fromtimestamp(last_played) if last_played else None,
+            "language": review["language"],
+            "review": review["review"],
+            "timestamp_created": review["timestamp_created"],
+            "timestamp_updated": review["timestamp_updated"],
+            "voted_up": review.get("voted_up"),
+            "votes_up": review.get("votes_up"),
+            "votes_funny": review.get("votes_funny"),
+            "weighted_vote_score": float(review.get("weighted_vote_score") or 0),
+            "comment_count": review.get("comment_count"),
+            "steam_purchase": review.get("steam_purchase"),
+            "received_for_free": review.get("received_for_free"),
+            "written_during_early_access": review.get("written_during_early_access"),
+            "developer_response": review.get("developer_response"),
+            "timestamp_dev_responded": review.get("timestamp_dev_responded"),
+            "hidden_in_steam_china": review.get("hidden_in_steam_china"),
+            "steam_china_location": review.get("steam_china_location"),
+            "primarily_steam_deck": review.get("primarily_steam_deck"),
+            "updated": datetime.now(),
+        }
+
+    @task
+    def save_reviews_to_db(self, reviews: List[Dict[str, Any]]) -> int:
+        """Upserts a page of raw reviews into the `review` table in one transaction.
+
+        Args:
+            reviews (List[Dict[str, Any]]): Raw reviews of a single page.
+
+        Returns:
+            int: Number of rows written, 0 without a database.
+        """
+        if self.db_connector is None:
+            return 0
+        rows = [self.to_review_row(review) for review in reviews]
+        return self.db_connector.bulk_upsert(
+            Review, rows, conflict_columns=["recommendationid"]
+        )
+
     @task
     def save_reviews_to_rag(self, reviews: List[Dict[str, Any]]) -> int:
         """Saves reviews to the LangChainChromaRAG instance.
@@ -121,32 +349,33 @@ class SteamReviewsDownloader:
             reviews (List[Dict[str, Any]]): List of reviews to be saved.
 
         Returns:
-            int: Number of reviews successfully saved.
+            int: Number of new or edited reviews successfully saved.
+
+        Raises:
+            Exception: Re-raised when the RAG store fails, so the game's watermark is not advanced.
         """
         try:
-            print(reviews)
-
-            self.rag.add_game_reviews(reviews)
-            return len(reviews)
+            stats = self.rag.add_game_reviews(
+                reviews, batch_size=self.ingest_batch_size
+            )
+            return stats["reviews"]
         except Exception as err:
             print(f"Error during saving reviews to RAG: {str(err)}")
-            return 0
+            raise
 
     @flow
     def get_and_save_reviews(self) -> int:
-        """Downloads, filters, adds the game name to reviews, and saves them to the RAG instance.
+        """Downloads all games concurrently and filters, names and saves each page as it arrives.
+
+        When the embedded search backend is used and new or edited reviews were saved
+        (edits replace their stale chunks), a new vector snapshot is then published.
 
         Returns:
             int: Total number of reviews saved.
         """
-        total_saved = 0
-        for game_name, app_id in self.app_ids.items():
-            reviews = self.download_reviews(app_id, self.language)
-            filtered_reviews = self.filter_reviews(reviews)
-            reviews_with_game = self.add_game_name(filtered_reviews, game_name)
-            saved_count = self.save_reviews_to_rag(reviews_with_game)
-            total_saved += saved_count
-
+        total_saved = asyncio.run(self._download_and_save())
+        if self.publish_snapshots and total_saved > 0:
+            self.rag.publish_snapshot()
         return total_saved
 
 
@@ -161,9 +390,20 @@ def main_flow():
 
     collection_name = "steam_reviews"
 
+    db_connector = DataBaseConnector(
+        db_type=os.getenv("DB_TYPE", "sqlite"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+    )
+    db_connector.create_tables(Base)
+
     downloader = SteamReviewsDownloader(
         app_ids=app_ids,
         collection_name=collection_name,
+        db_connector=db_connector,
     )
     total_saved = downloader.get_and_save_reviews()
     print(f"Total reviews saved to the RAG: {total_saved}")
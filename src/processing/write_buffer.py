@@ -0,0 +1,513 @@
+import os
+import json
+import time
+import atexit
+import base64
+import threading
+
+from typing import Any, Dict, List, Tuple, Callable, Optional
+from datetime import datetime
+
+from sqlalchemy import DateTime, LargeBinary, text, bindparam
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError, OperationalError
+
+from db import DataBaseConnector
+from models import FeedBack, Conversation
+
+from .metrics_rollup import mark_stale
+
+DEFAULT_FALLBACK_PATH = os.getenv(
+    "WRITE_BUFFER_FALLBACK_PATH", "data/cache/pending_writes.jsonl"
+)
+
+# A buffered write: ("insert" or "update", table name, column values)
+Operation = Tuple[str, str, Dict[str, Any]]
+
+
+def _encode(value: Any) -> str:
+    """Encodes the values JSON cannot hold: binary columns as base64, the others as text."""
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return str(value)
+
+
+class _IdAllocator:
+    """Hands out primary keys of one table without a round trip per row.
+
+    `next_id` only takes IDs from a reserve held in memory and never waits on the
+    database; `refill` tops the reserve up, from the flusher thread. On PostgreSQL,
+    blocks of `block_size` values are prefetched from the table's SERIAL sequence,
+    and the next block is fetched once half of the reserve is used, so that IDs keep
+    being handed out through an outage shorter than half a block of rows; while it
+    is down, a refill is retried at most every `retry_interval` seconds. Other
+    databases have no sequence to share, so the allocator counts up from the
+    largest ID in the table (and in the fallback file), read once, which is safe
+    while this process is the only writer of the table, as the chat is.
+    """
+
+    def __init__(
+        self,
+        db_connector: DataBaseConnector,
+        table: str,
+        block_size: int,
+        floor: int = 0,
+        retry_interval: float = 30.0,
+    ) -> None:
+        self.db_connector = db_connector
+        self.table = table
+        self.block_size = block_size
+        self.floor = floor
+        self.retry_interval = retry_interval
+        self._ids: List[int] = []
+        self._last: Optional[int] = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> Optional[int]:
+        """Returns an unused ID, or None if the reserve is empty."""
+        with self._lock:
+            if self.db_connector.db_type == 'postgresql':
+                return self._ids.pop(0) if self._ids else None
+            if self._last is None:
+                return None
+            self._last += 1
+            return self._last
+
+    def refill(self) -> bool:
+        """Tops up the reserve once it runs low, unless the last attempt failed less than `retry_interval` ago.
+
+        Returns:
+            bool: False if the IDs could not be read from the database.
+        """
+        postgres = self.db_connector.db_type == 'postgresql'
+        if postgres and len(self._ids) > self.block_size // 2:
+            return True
+        if not postgres and self._last is not None:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        try:
+            if postgres:
+                block = self._fetch_block()
+            else:
+                with self.db_connector.session_scope() as session:
+                    last = session.execute(
+                        text(f"SELECT MAX(id) FROM {self.table}")
+                    ).scalar()
+        except SQLAlchemyError as err:
+            print(f"Could not reserve IDs for {self.table}: {str(err)}")
+            self._retry_at = time.monotonic() + self.retry_interval
+            return False
+        with self._lock:
+            if postgres:
+                self._ids.extend(block)
+            else:
+                self._last = max(last or 0, self.floor)
+        return True
+
+    def _fetch_block(self) -> List[int]:
+        with self.db_connector.session_scope() as session:
+            return list(
+                session.execute(
+                    text(
+                        "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                        "FROM generate_series(1, :n)"
+                    ),
+                    {"table": self.table, "n": self.block_size},
+                ).scalars()
+            )
+
+
+class WriteBehindBuffer:
+    """
+    Buffers `Conversation` and `FeedBack` writes and flushes them from a background thread.
+
+    `add` gives the row a client-side primary key right away (see `_IdAllocator`), so
+    the chat can reference the conversation before it is written, and queues it. The
+    flusher thread writes the queue in a single transaction once `batch_size`
+    operations are waiting or every `flush_interval` seconds, with one multi-row
+    statement per run of rows of the same table. `update` changes a queued row in
+    place, or queues an UPDATE when the row was already flushed, which is how the
+    relevance worker fills in evaluations.
+
+    If no ID can be allocated, because the database was down when the reserve ran
+    out, the row is held in memory and gets its ID on the first flush that can
+    allocate one. Callers that need the ID, to evaluate the conversation or to
+    attach feedback to it, register with `when_assigned`.
+
+    When the database cannot be reached, the operations are appended to a local
+    JSONL file instead and replayed, before anything newer, on the next flush that
+    succeeds (including after a restart). When the database rejects a batch for any
+    other reason, e.g. a constraint violation, its operations are retried one per
+    transaction and only those rejected again are appended to
+    `<fallback_path>.rejected` for inspection.
+
+    Attributes:
+        db_connector (DataBaseConnector): Database the rows are written to.
+        batch_size (int): Number of queued operations that triggers a flush.
+        flush_interval (float): Maximum seconds an operation waits in the queue.
+        fallback_path (str): Append-only file of the operations not written yet.
+        flushed (int): Number of operations written to the database.
+    """
+
+    def __init__(
+        self,
+        db_connector: DataBaseConnector,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        fallback_path: str = DEFAULT_FALLBACK_PATH,
+        id_block_size: int = 100,
+        models: Tuple[Any, ...] = (Conversation, FeedBack),
+    ) -> None:
+        self.db_connector = db_connector
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fallback_path = fallback_path
+        self.id_block_size = id_block_size
+        self.flushed = 0
+        self._operations: List[Operation] = []
+        # Rows waiting for an ID: [instance, table name, values, callbacks]
+        self._unassigned: List[List[Any]] = []
+        self._allocators: Dict[str, _IdAllocator] = {}
+        self._tables = {model.__table__.name: model.__table__ for model in models}
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._id_lock = threading.Lock()
+        self._stopped = False
+        # The first IDs, so that the first rows get one without waiting for a flush
+        self._refill()
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, instance: Any) -> Any:
+        """Queues the insertion of an ORM instance, giving it a primary key first.
+
+        IDs come from a reserve refilled by the flusher, so this never waits on the
+        database. When the reserve is empty (the database is down), `instance.id`
+        stays None until a later flush assigns it; see `when_assigned`.
+
+        Args:
+            instance: A `Conversation` or `FeedBack` (any model with an integer `id` primary key).
+
+        Returns:
+            The same instance.
+        """
+        table = instance.__table__
+        self._tables.setdefault(table.name, table)
+        if instance.id is None:
+            with self._id_lock:
+                instance.id = self._allocator(table.name).next_id()
+        values = {}
+        for column in table.columns:
+            value = getattr(instance, column.key)
+            if value is None and column.default is not None:
+                if column.default.is_scalar:
+                    value = column.default.arg
+                elif column.default.is_callable:
+                    # Evaluated now, so timestamps record when the row was added
+                    value = column.default.arg(None)
+            if value is None and column.key == 'id':
+                continue
+            values[column.key] = value
+        if instance.id is None:
+            with self._condition:
+                self._unassigned.append([instance, table.name, values, []])
+            return instance
+        self._enqueue(("insert", table.name, values))
+        return instance
+
+    def when_assigned(self, instance: Any, callback: Callable[[Any], None]):
+        """Calls `callback(instance)` once the instance added earlier has its ID.
+
+        The callback runs right away when the ID is already known, otherwise from the
+        flusher thread as soon as it is allocated. It never runs for an instance that
+        was not added.
+        """
+        with self._condition:
+            for entry in self._unassigned:
+                if entry[0] is instance:
+                    entry[3].append(callback)
+                    return
+        if instance.id is not None:
+            callback(instance)
+
+    def update(self, model: Any, row_id: int, values: Dict[str, Any]):
+        """Queues new values for some columns of a row added earlier.
+
+        Args:
+            model: The ORM model of the row.
+            row_id (int): Primary key of the row.
+            values (dict): Column name to new value.
+        """
+        table = model.__table__
+        self._tables.setdefault(table.name, table)
+        with self._condition:
+            for operation, name, queued in self._operations:
+                if operation == "insert" and name == table.name:
+                    if queued.get("id") == row_id:
+                        queued.update(values)
+                        return
+        self._enqueue(("update", table.name, {**values, "id": row_id}))
+
+    def flush(self) -> bool:
+        """Writes the queued operations, and the fallback file, in one transaction.
+
+        Returns:
+            bool: False if they were appended to the fallback file instead.
+        """
+        with self._flush_lock:
+            self._refill()
+            assigned = self._assign_ids()
+            with self._condition:
+                operations, self._operations = self._operations, []
+            operations = assigned + operations
+            replayed = self._read_fallback()
+            if not operations and not replayed:
+                return True
+            # Rows held back by an outage, whose rollup buckets must be recomputed
+            late = len(replayed) + len(assigned)
+            unwritten: List[Operation] = []
+            try:
+                self._write(replayed + operations, late)
+            except Exception as err:
+                if self._unavailable(err):
+                    print(f"Database unavailable, buffering writes to disk: {str(err)}")
+                    self._append(self.fallback_path, operations)
+                    return False
+                # The other rows of the batch are valid: only the failing ones are set aside
+                print(
+                    f"Database rejected a batch of {len(replayed) + len(operations)} "
+                    f"buffered writes, retrying them one by one: {str(err)}"
+                )
+                unwritten = self._write_each(replayed + operations, late)
+            else:
+                self.flushed += len(replayed) + len(operations)
+                if replayed:
+                    print(f"Replayed {len(replayed)} buffered writes")
+            if replayed:
+                os.remove(self.fallback_path)
+            if unwritten:
+                self._append(self.fallback_path, unwritten)
+                return False
+            return True
+
+    def close(self):
+        """Stops the flusher thread after a last flush."""
+        with self._condition:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+        self.flush()
+        with self._condition:
+            unassigned, self._unassigned = self._unassigned, []
+        if unassigned:
+            # Not lost: the database numbers them when the file is replayed
+            print(f"Buffering {len(unassigned)} rows without an ID to disk")
+            self._append(
+                self.fallback_path,
+                [("insert", name, values) for _, name, values, _ in unassigned],
+            )
+
+    @property
+    def pending(self) -> int:
+        """Number of operations waiting in memory."""
+        with self._condition:
+            return len(self._operations) + len(self._unassigned)
+
+    def _assign_ids(self) -> List[Operation]:
+        """Allocates the IDs of the rows added while none could be, in order.
+
+        Returns:
+            List[Operation]: The insertions of the rows that got an ID.
+        """
+        with self._condition:
+            unassigned = list(self._unassigned)
+        ids = []
+        for _, name, _, _ in unassigned:
+            with self._id_lock:
+                row_id = self._allocator(name).next_id()
+            if row_id is None:
+                break
+            ids.append(row_id)
+        if not ids:
+            return []
+
+        with self._condition:
+            for entry, row_id in zip(unassigned, ids):
+                entry[0].id = row_id
+                entry[2]["id"] = row_id
+                self._unassigned.remove(entry)
+        print(f"Assigned IDs to {len(ids)} rows added while the database was down")
+        for entry in unassigned[: len(ids)]:
+            for callback in entry[3]:
+                try:
+                    callback(entry[0])
+                except Exception as err:
+                    print(
+                        f"Error in a callback of {entry[1]} {entry[0].id}: {str(err)}"
+                    )
+        return [
+            ("insert", name, values) for _, name, values, _ in unassigned[: len(ids)]
+        ]
+
+    def _refill(self):
+        """Tops up the ID reserves, outside `_id_lock` so that `add` never waits on it."""
+        with self._id_lock:
+            allocators = [self._allocator(name) for name in self._tables]
+        for allocator in allocators:
+            allocator.refill()
+
+    def _allocator(self, table: str) -> _IdAllocator:
+        if table not in self._allocators:
+            self._allocators[table] = _IdAllocator(
+                self.db_connector,
+                table,
+                self.id_block_size,
+                floor=self._fallback_max_id(table),
+            )
+        return self._allocators[table]
+
+    def _enqueue(self, operation: Operation):
+        with self._condition:
+            self._operations.append(operation)
+            if len(self._operations) >= self.batch_size:
+                self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._stopped or len(self._operations) >= self.batch_size,
+                    timeout=self.flush_interval,
+                )
+                if self._stopped:
+                    return
+            try:
+                self.flush()
+            except Exception as err:
+                print(f"Error flushing buffered writes: {str(err)}")
+
+    @staticmethod
+    def _unavailable(err: Exception) -> bool:
+        """Whether the error means the database could not be reached."""
+        return isinstance(err, OperationalError) or (
+            isinstance(err, DBAPIError) and err.connection_invalidated
+        )
+
+    def _write_each(
+        self, operations: List[Operation], late: int = 0
+    ) -> List[Operation]:
+        """Writes the operations one per transaction, setting aside the ones the database rejects.
+
+        Returns:
+            List[Operation]: The operations not attempted because the database became unreachable.
+        """
+        rejected = []
+        for position, operation in enumerate(operations):
+            try:
+                self._write([operation], int(position < late))
+            except Exception as err:
+                if self._unavailable(err):
+                    print(f"Database unavailable, buffering writes to disk: {str(err)}")
+                    self._append(f"{self.fallback_path}.rejected", rejected)
+                    return operations[position:]
+                print(
+                    f"Database rejected a {operation[0]} of {operation[1]}: {str(err)}"
+                )
+                rejected.append(operation)
+            else:
+                self.flushed += 1
+        self._append(f"{self.fallback_path}.rejected", rejected)
+        return []
+
+    def _write(self, operations: List[Operation], late: int = 0):
+        """Executes the operations in order, one multi-row statement per run of similar rows.
+
+        The first `late` operations were held back by an outage: their rollup
+        buckets are marked stale in the same transaction.
+        """
+        runs: List[Tuple[str, str, List[Dict[str, Any]]]] = []
+        for operation, name, values in operations:
+            last = runs[-1] if runs else None
+            if (
+                last is not None
+                and (last[0], last[1]) == (operation, name)
+                and last[2][0].keys() == values.keys()
+            ):
+                last[2].append(values)
+            else:
+                runs.append((operation, name, [values]))
+
+        with self.db_connector.session_scope() as session:
+            for operation, name, rows in runs:
+                table = self._tables[name]
+                if operation == "insert":
+                    session.execute(table.insert(), rows)
+                else:
+                    session.execute(
+                        table.update().where(table.c.id == bindparam("row_id")),
+                        [
+                            {
+                                "row_id": row["id"],
+                                **{k: v for k, v in row.items() if k != "id"},
+                            }
+                            for row in rows
+                        ],
+                    )
+            if late:
+                mark_stale(session, operations[:late])
+
+    def _append(self, path: str, operations: List[Operation]):
+        if not operations:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f_out:
+            for operation, name, values in operations:
+                record = {"operation": operation, "table": name, "values": values}
+                f_out.write(json.dumps(record, default=_encode) + "\n")
+            f_out.flush()
+            os.fsync(f_out.fileno())
+
+    def _read_fallback(self) -> List[Operation]:
+        """Reads the operations of the fallback file, restoring their datetimes."""
+        if not os.path.exists(self.fallback_path):
+            return []
+        operations = []
+        with open(self.fallback_path, 'r', encoding='utf-8') as f_in:
+            for line in f_in:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash
+                    continue
+                table = self._tables.get(record["table"])
+                if table is None:
+                    continue
+                values = record["values"]
+                for column in table.columns:
+                    if isinstance(column.type, DateTime) and isinstance(
+                        values.get(column.key), str
+                    ):
+                        values[column.key] = datetime.fromisoformat(values[column.key])
+                    elif isinstance(column.type, LargeBinary) and isinstance(
+                        values.get(column.key), str
+                    ):
+                        values[column.key] = base64.b64decode(values[column.key])
+                operations.append((record["operation"], record["table"], values))
+        return operations
+
+    def _fallback_max_id(self, table: str) -> int:
+        """Largest ID of the table in the fallback file, which the database does not know yet."""
+        return max(
+            (
+                values.get("id") or 0
+                for operation, name, values in self._read_fallback()
+                if name == table and operation == "insert"
+            ),
+            default=0,
+        )
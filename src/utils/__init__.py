@@ -1,3 +1,5 @@
 from .utils import calculate_cost
+from .tracing import StageTimer, get_tracer
+from .warm_up import BackgroundLoader
 
-__all__ = ['calculate_cost']
+__all__ = ['calculate_cost', 'StageTimer', 'get_tracer', 'BackgroundLoader']
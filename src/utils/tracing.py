@@ -0,0 +1,124 @@
+import os
+import time
+from typing import Any, Dict, Iterator, Optional
+from functools import lru_cache
+from contextlib import contextmanager
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "game-assistant")
+
+
+@lru_cache(maxsize=None)
+def get_tracer() -> Optional[Any]:
+    """Returns an OpenTelemetry tracer exporting to the OTLP collector, or None.
+
+    Export is enabled by setting `OTEL_EXPORTER_OTLP_ENDPOINT` (e.g. http://localhost:4318)
+    and installing `opentelemetry-sdk` and `opentelemetry-exporter-otlp-proto-http`.
+    Spans are exported in batches from a background thread.
+    """
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return None
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+    except ImportError as err:
+        print(f"OpenTelemetry export disabled: {str(err)}")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    return provider.get_tracer(SERVICE_NAME)
+
+
+class StageTimer:
+    """
+    Times the stages of a request, to store their durations and export them as spans.
+
+    Each stage is timed with `stage` (a context manager) or reported with `record` when
+    it was measured elsewhere, e.g. the time to first token of a stream. When
+    OpenTelemetry export is enabled (see `get_tracer`), the request becomes a span
+    with one child span per stage when the timer ends.
+
+    Attributes:
+        name (str): Name of the request span.
+        attributes (Dict[str, Any]): Attributes of the request span.
+        durations (Dict[str, float]): Seconds spent in each stage; repeated stages add up.
+    """
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.durations: Dict[str, float] = {}
+        self._stages = []
+        self._start = time.perf_counter()
+        # perf_counter is monotonic but has no epoch; spans need wall-clock times
+        self._epoch_offset = time.time_ns() - time.perf_counter_ns()
+        self._ended = False
+
+    def __enter__(self) -> "StageTimer":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.end()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Times the enclosed block as stage `name`, even when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, start)
+
+    def record(self, name: str, seconds: float, start: Optional[float] = None):
+        """Adds a stage measured elsewhere.
+
+        Args:
+            name (str): The stage name.
+            seconds (float): Its duration.
+            start (float, optional): Its `time.perf_counter()` start. Defaults to `seconds` before now.
+        """
+        if start is None:
+            start = time.perf_counter() - seconds
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self._stages.append((name, start, start + seconds))
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the timer started."""
+        return time.perf_counter() - self._start
+
+    def end(self):
+        """Exports the spans, once, if OpenTelemetry export is enabled."""
+        if self._ended:
+            return
+        self._ended = True
+        tracer = get_tracer()
+        if tracer is None:
+            return
+        try:
+            from opentelemetry import trace
+
+            root = tracer.start_span(
+                self.name,
+                start_time=self._epoch_ns(self._start),
+                attributes=self.attributes,
+            )
+            context = trace.set_span_in_context(root)
+            for name, start, end in self._stages:
+                span = tracer.start_span(
+                    name, context=context, start_time=self._epoch_ns(start)
+                )
+                span.end(end_time=self._epoch_ns(end))
+            root.end()
+        except Exception as err:
+            print(f"Error exporting spans: {str(err)}")
+
+    def _epoch_ns(self, perf_counter: float) -> int:
+        return int(perf_counter * 1e9) + self._epoch_offset
@@ -0,0 +1,158 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Tuple, Callable, Optional
+
+from .tracing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoader:
+    """
+    Loads a sequence of named resources on a background thread, in the order they were added.
+
+    Lets the app render before its slow dependencies (imports, model weights,
+    connections) are ready: `get` blocks only the caller that needs a resource, and
+    only until that resource is loaded. A loader may `get` the resources added before
+    it. The time spent on each resource is logged and recorded as a stage of `timer`,
+    which is exported as a span like the request timers.
+
+    A loader that raises, e.g. because Chroma is still starting, does not block the
+    others: `get` raises its error right away, and the failed loaders are retried in
+    order, with exponential backoff, until they succeed.
+
+    Attributes:
+        timer (StageTimer): Durations of the startup phases, in seconds.
+        thread (threading.Thread): The loading thread, once started.
+        retry_interval (float): Seconds before the first retry of failed loaders; doubled after each failed retry.
+        max_retry_interval (float): Maximum number of seconds between two retries.
+    """
+
+    def __init__(
+        self,
+        name: str = "startup",
+        retry_interval: float = 1.0,
+        max_retry_interval: float = 30.0,
+    ) -> None:
+        """
+        Args:
+            name (str, optional): Name of the thread and of the timer span. Defaults to "startup".
+            retry_interval (float, optional): Seconds before the first retry of failed loaders. Defaults to 1.
+            max_retry_interval (float, optional): Maximum number of seconds between two retries. Defaults to 30.
+        """
+        self.name = name
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.timer = StageTimer(name)
+        self.thread: Optional[threading.Thread] = None
+        self._loaders: List[Tuple[str, Callable[[], Any]]] = []
+        self._values: Dict[str, Any] = {}
+        self._errors: Dict[str, BaseException] = {}
+        self._loaded: Dict[str, threading.Event] = {}
+        self._done = threading.Event()
+
+    def add(self, name: str, loader: Callable[[], Any]) -> "BackgroundLoader":
+        """Schedules `loader`, called without arguments, to load resource `name`."""
+        if self.thread is not None:
+            raise RuntimeError("Resources must be added before the loader starts")
+        self._loaders.append((name, loader))
+        self._loaded[name] = threading.Event()
+        return self
+
+    def start(self) -> "BackgroundLoader":
+        """Starts loading the resources; returns right away."""
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self._run, name=f"{self.name}-loader", daemon=True
+            )
+            self.thread.start()
+        return self
+
+    def _run(self):
+        failed = self._load(self._loaders)
+        logger.info(f"Startup warm-up finished after {self.timer.elapsed:.2f}s")
+        self.timer.end()
+        self._done.set()
+
+        delay = self.retry_interval
+        while failed:
+            time.sleep(delay)
+            logger.info(f"Retrying {', '.join(name for name, _ in failed)}...")
+            failed = self._load(failed)
+            delay = min(delay * 2, self.max_retry_interval)
+
+    def _load(
+        self, loaders: List[Tuple[str, Callable[[], Any]]]
+    ) -> List[Tuple[str, Callable[[], Any]]]:
+        """Runs the loaders in order and returns the ones that failed."""
+        failed = []
+        for name, loader in loaders:
+            start = time.perf_counter()
+            try:
+                with self.timer.stage(name):
+                    self._values[name] = loader()
+                self._errors.pop(name, None)
+                logger.info(
+                    f"Startup phase '{name}' took {time.perf_counter() - start:.2f}s"
+                )
+            except Exception as err:
+                logger.error(f"Error while loading {name}: {str(err)}")
+                self._errors[name] = err
+                failed.append((name, loader))
+            finally:
+                self._loaded[name].set()
+        return failed
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Any:
+        """Returns resource `name`, waiting for it to be loaded.
+
+        Args:
+            name (str): The resource name.
+            timeout (float, optional): Seconds to wait at most. Defaults to no limit.
+
+        Raises:
+            KeyError: If no resource `name` was added.
+            TimeoutError: If the resource is not loaded within `timeout`.
+            Exception: The error raised by the resource's last load attempt, until a retry succeeds.
+        """
+        if name not in self._loaded:
+            raise KeyError(name)
+        if self._loaded[name].is_set():
+            return self._result(name)
+        start = time.perf_counter()
+        if not self._loaded[name].wait(timeout):
+            raise TimeoutError(f"{name} was not loaded after {timeout}s")
+        logger.info(f"Waited {time.perf_counter() - start:.2f}s for {name}")
+        return self._result(name)
+
+    def _result(self, name: str) -> Any:
+        if name in self._errors:
+            raise self._errors[name]
+        return self._values[name]
+
+    def is_loaded(self, name: str) -> bool:
+        """Whether resource `name` is loaded (or its first attempt failed)."""
+        return self._loaded[name].is_set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether every resource was attempted once."""
+        return self._done.is_set()
+
+    def wait(self, *names: str, timeout: Optional[float] = None) -> bool:
+        """Waits for resources `names`, or every resource, to be loaded or to fail.
+
+        Returns:
+            bool: Whether they were all loaded within `timeout`.
+        """
+        if not names:
+            return self._done.wait(timeout)
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for name in names:
+            remaining = (
+                None if deadline is None else max(deadline - time.perf_counter(), 0)
+            )
+            if not self._loaded[name].wait(remaining):
+                return False
+        return True
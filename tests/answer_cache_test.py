@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.db import DataBaseConnector
+from src.processing import WriteBehindBuffer, SemanticAnswerCache
+from src.models.model import Base, SyncState, AnswerCache
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+        self.db_connector = DataBaseConnector(
+            db_type="sqlite", database=os.path.join(tmpdir.name, "cache.db")
+        )
+        self.db_connector.create_tables(Base)
+        self.set_watermark("cs2", 100)
+        self.cache = self.make_cache()
+
+    def make_cache(self, **kwargs):
+        return SemanticAnswerCache(
+            self.db_connector, **{"threshold": 0.9, "watermark_ttl": 0, **kwargs}
+        )
+
+    def set_watermark(self, game, watermark):
+        with self.db_connector.session_scope() as session:
+            session.merge(
+                SyncState(
+                    game=game,
+                    app_id=730,
+                    last_timestamp_updated=watermark,
+                    reviews_synced=0,
+                )
+            )
+
+    def test_similar_question_hits(self):
+        self.cache.store(
+            "cs2", "gpt-4o-mini", "is cs2 worth it?", [1.0, 0.0], "yes", 4.0
+        )
+
+        hit = self.cache.lookup("cs2", "gpt-4o-mini", [0.98, 0.1])
+        miss = self.cache.lookup("cs2", "gpt-4o-mini", [0.5, 0.5])
+
+        self.assertEqual(hit["answer"], "yes")
+        self.assertEqual(hit["response_time"], 4.0)
+        self.assertGreater(hit["similarity"], 0.9)
+        self.assertIsNone(miss)
+        self.assertEqual(self.cache.hit_ratio, 0.5)
+
+    def test_entries_are_keyed_by_game_and_model(self):
+        self.cache.store("cs2", "gpt-4o-mini", "is it fun?", [1.0, 0.0], "yes")
+
+        self.assertIsNone(self.cache.lookup("dota2", "gpt-4o-mini", [1.0, 0.0]))
+        self.assertIsNone(self.cache.lookup("cs2", "llama-3.1-8b-instant", [1.0, 0.0]))
+
+    def test_new_watermark_invalidates_the_game(self):
+        self.cache.store("cs2", "gpt-4o-mini", "is it fun?", [1.0, 0.0], "yes")
+
+        self.set_watermark("cs2", 200)
+
+        self.assertIsNone(self.cache.lookup("cs2", "gpt-4o-mini", [1.0, 0.0]))
+
+    def test_entries_are_reloaded_from_the_database(self):
+        self.cache.store("cs2", "gpt-4o-mini", "is it fun?", [1.0, 0.0], "yes")
+
+        reloaded = self.make_cache()
+
+        self.assertEqual(
+            reloaded.lookup("cs2", "gpt-4o-mini", [1.0, 0.0])["answer"], "yes"
+        )
+
+    def test_memory_index_is_bounded(self):
+        cache = self.make_cache(max_entries=2)
+        for i, vector in enumerate(([1.0, 0.0], [0.0, 1.0], [-1.0, 0.0])):
+            cache.store("cs2", "gpt-4o-mini", f"question {i}", vector, f"answer {i}")
+
+        self.assertIsNone(cache.lookup("cs2", "gpt-4o-mini", [1.0, 0.0]))
+        self.assertEqual(
+            cache.lookup("cs2", "gpt-4o-mini", [-1.0, 0.0])["answer"], "answer 2"
+        )
+
+    def test_stores_through_the_write_buffer_without_waiting_on_the_database(self):
+        buffer = WriteBehindBuffer(
+            self.db_connector,
+            fallback_path=os.path.join(self.tmpdir, "pending_writes.jsonl"),
+            flush_interval=60,
+            models=(AnswerCache,),
+        )
+        self.addCleanup(buffer.close)
+        cache = self.make_cache(watermark_ttl=60, write_buffer=buffer)
+        self.assertIsNone(cache.lookup("cs2", "gpt-4o-mini", [1.0, 0.0]))
+
+        with patch.object(
+            self.db_connector, "session_scope", side_effect=AssertionError
+        ):
+            cache.store("cs2", "gpt-4o-mini", "is it fun?", [1.0, 0.0], "yes")
+            hit = cache.lookup("cs2", "gpt-4o-mini", [1.0, 0.0])
+        self.assertEqual(hit["answer"], "yes")
+        self.assertIsNone(self.make_cache().lookup("cs2", "gpt-4o-mini", [1.0, 0.0]))
+
+        self.assertTrue(buffer.flush())
+        self.assertEqual(
+            self.make_cache().lookup("cs2", "gpt-4o-mini", [1.0, 0.0])["answer"],
+            "yes",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
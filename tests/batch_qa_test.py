@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+import threading
+from unittest.mock import MagicMock
+
+from langchain_core.documents import Document
+
+from src.evaluation import RateLimiter, run_batch_qa
+from tests.factories import completion
+
+
+class FakeContextBuilder:
+    fetch_k = 5
+
+    def __init__(self):
+        self.rag = MagicMock()
+        self.rag.batch_search.side_effect = lambda queries, **kwargs: [
+            [Document(page_content=f"review about {query}")] for query in queries
+        ]
+
+    def assemble(self, candidates, model_name):
+        return candidates
+
+
+class FakeQA:
+    """Answers with the question, failing on 'boom', and tracks concurrent calls."""
+
+    model_name = "gpt-4o-mini"
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def generate_answer(self, question, context):
+        with self._lock:
+            self.calls.append(question)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.02)
+            if question == "boom":
+                raise RuntimeError("provider unavailable")
+            return completion(f"answer to {question}", total_tokens=100)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def evaluate_relevance(self, question, answer):
+        return completion(
+            '```json\n{"Relevance": "RELEVANT", "Explanation": "ok"}\n```', 20
+        )
+
+
+class TestBatchQA(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.checkpoint = os.path.join(tmpdir.name, "batch-qa.jsonl")
+        self.context_builder = FakeContextBuilder()
+
+    def run_batch(self, pairs, qa, **kwargs):
+        return run_batch_qa(
+            pairs,
+            qa,
+            self.context_builder,
+            checkpoint_path=self.checkpoint,
+            provider="ollama",
+            **kwargs,
+        )
+
+    def test_returns_one_row_per_question_in_order(self):
+        qa = FakeQA()
+        pairs = [(f"question {i}", "cs2") for i in range(6)]
+
+        results = self.run_batch(pairs, qa, max_in_flight=2, retrieval_batch_size=4)
+
+        self.assertEqual(list(results["question"]), [q for q, _ in pairs])
+        self.assertEqual(list(results["relevance"]), ["RELEVANT"] * 6)
+        self.assertEqual(results["total_tokens"].sum(), 600)
+        self.assertEqual(results["eval_total_tokens"].sum(), 120)
+        self.assertTrue((results["model_cost"] > 0).all())
+        self.assertLessEqual(qa.max_in_flight, 2)
+        # Six questions, retrieved in two batches
+        self.assertEqual(self.context_builder.rag.batch_search.call_count, 2)
+        filters = self.context_builder.rag.batch_search.call_args.kwargs["filters"]
+        self.assertEqual(filters, [{"game": "cs2"}] * 2)
+
+    def test_resumes_from_the_checkpoint(self):
+        pairs = [("first", "cs2"), ("boom", "cs2"), ("second", None)]
+        results = self.run_batch(pairs, FakeQA())
+
+        self.assertEqual(results["error"].notna().tolist(), [False, True, False])
+        with open(self.checkpoint, encoding="utf-8") as f_in:
+            saved = [json.loads(line)["question"] for line in f_in]
+        self.assertCountEqual(saved, ["first", "second"])
+
+        qa = FakeQA()
+        results = self.run_batch(pairs + [("third", "cs2")], qa)
+
+        # Only the failed and the new question are answered again
+        self.assertCountEqual(qa.calls, ["boom", "third"])
+        self.assertEqual(
+            list(results["answer"]),
+            ["answer to first", None, "answer to second", "answer to third"],
+        )
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_spaces_calls_beyond_the_burst(self):
+        limiter = RateLimiter(requests_per_minute=1200, burst=2)
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        elapsed = time.monotonic() - start
+
+        # Two calls in the burst, then one every 50ms
+        self.assertGreaterEqual(elapsed, 0.09)
+
+    def test_unlimited_without_a_rate(self):
+        limiter = RateLimiter(requests_per_minute=None)
+        for _ in range(1000):
+            limiter.acquire()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from src.processing import ContextBuilder
+from src.processing.context_builder import get_token_counter
+
+REVIEW = (
+    "The gunplay is tight and every map rewards practice. Matchmaking takes a while "
+    "at night but the servers are stable and the tick rate feels great. Cheaters show "
+    "up in low ranks, although Premier is much cleaner than it used to be. The new "
+    "smokes and the lighting are beautiful, and the game runs well on older hardware. "
+    "Buy it if you like competitive shooters, skip it if you want a casual experience. "
+    "Case openings are a waste of money and the economy around skins is out of hand, "
+    "but none of it affects gameplay. The community servers and workshop maps keep "
+    "the game fresh after hundreds of hours, and playing with friends is the best part."
+)
+
+
+def chunk_documents(recommendationid, text, splitter):
+    return [
+        Document(
+            page_content=chunk,
+            metadata={
+                "recommendationid": recommendationid,
+                "game": "cs2",
+                "chunk_index": i,
+            },
+        )
+        for i, chunk in enumerate(splitter.split_text(text))
+    ]
+
+
+class TestContextBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=256, chunk_overlap=50, length_function=len
+        )
+        self.rag = MagicMock(text_splitter=self.splitter)
+        self.builder = ContextBuilder(self.rag, fetch_k=10)
+        get_token_counter.cache_clear()
+        # Keep the tests offline: tiktoken would download its encoding
+        patcher = patch.dict("sys.modules", {"tiktoken": None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(get_token_counter.cache_clear)
+
+    def test_adjacent_chunks_are_merged_without_overlap(self):
+        chunks = chunk_documents("1", REVIEW, self.splitter)
+        self.assertGreater(len(chunks), 1)
+
+        merged = self.builder.assemble(list(reversed(chunks)), "gpt-4o-mini")
+
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0].page_content, REVIEW)
+        self.assertEqual(merged[0].metadata["chunk_indexes"], list(range(len(chunks))))
+
+    def test_non_adjacent_chunks_stay_separate_and_keep_rank(self):
+        chunks = chunk_documents("1", REVIEW, self.splitter)
+        other = Document(
+            page_content="Dota 2 is a different beast",
+            metadata={"recommendationid": "2", "chunk_index": 0},
+        )
+
+        context = self.builder.assemble([chunks[2], other, chunks[0]], "gpt-4o-mini")
+
+        self.assertEqual(
+            [document.page_content for document in context],
+            [chunks[2].page_content, other.page_content, chunks[0].page_content],
+        )
+
+    def test_near_duplicates_are_dropped(self):
+        original = Document(
+            page_content="Too many cheaters in every ranked match, valve please fix",
+            metadata={"recommendationid": "1", "chunk_index": 0},
+        )
+        copy = Document(
+            page_content="too many cheaters in every ranked match valve please fix!!",
+            metadata={"recommendationid": "2", "chunk_index": 0},
+        )
+
+        context = self.builder.assemble([original, copy], "gpt-4o-mini")
+
+        self.assertEqual([d.metadata["recommendationid"] for d in context], ["1"])
+
+    def test_context_is_packed_to_the_model_budget(self):
+        documents = [
+            Document(
+                page_content=f"review {i} " + "word " * 60,
+                metadata={"recommendationid": str(i), "chunk_index": 0},
+            )
+            for i in range(10)
+        ]
+        builder = ContextBuilder(
+            self.rag, token_budgets={"gpt-4o-mini": 200}, min_tokens=20
+        )
+        count, _ = get_token_counter("gpt-4o-mini")
+
+        context = builder.assemble(documents, "gpt-4o-mini")
+
+        self.assertEqual(len(context), 3)
+        self.assertTrue(context[-1].metadata["truncated"])
+        self.assertLessEqual(sum(count(d.page_content) for d in context), 200)
+
+    def test_build_over_fetches_from_the_retriever(self):
+        self.rag.search.return_value = chunk_documents("1", REVIEW, self.splitter)
+
+        context = self.builder.build("is it good?", "cs2", "gpt-4o-mini", mode="hybrid")
+
+        self.rag.search.assert_called_once_with(
+            "is it good?", n_results=10, filter={"game": "cs2"}, mode="hybrid"
+        )
+        self.assertEqual(context[0].page_content, REVIEW)
+
+
+if __name__ == "__main__":
+    unittest.main()
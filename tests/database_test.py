@@ -1,10 +1,15 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 
 from src.db import DataBaseConnector
+from src.models import Review
+from src.models.model import Base as ModelsBase
 
 Base = declarative_base()
 
@@ -139,6 +144,107 @@ class TestDataBaseConnector(unittest.TestCase):
 
         connector = DataBaseConnector(db_type="sqlite", database=":memory:")
 
+    def test_bulk_upsert_inserts_and_updates(self):
+        # Testa o upsert em lote numa base SQLite real
+        with tempfile.TemporaryDirectory() as tmpdir:
+            connector = DataBaseConnector(
+                db_type="sqlite", database=os.path.join(tmpdir, "test.db")
+            )
+            connector.create_tables(ModelsBase)
+            rows = [
+                {
+                    "recommendationid": str(i),
+                    "game": "cs2",
+                    "language": "english",
+                    "review": f"review {i}",
+                    "timestamp_created": i,
+                    "timestamp_updated": i,
+                    "votes_up": 0,
+                }
+                for i in range(5)
+            ]
+            connector.bulk_upsert(Review, rows, conflict_columns=["recommendationid"])
+
+            rows[0].update(review="edited", timestamp_updated=10, votes_up=3)
+            written = connector.bulk_upsert(
+                Review, rows[:2], conflict_columns=["recommendationid"]
+            )
+
+            with connector.session_scope() as session:
+                edited = session.get(Review, "0")
+                self.assertEqual(written, 2)
+                self.assertEqual(session.query(Review).count(), 5)
+                self.assertEqual(
+                    (edited.review, edited.timestamp_updated, edited.votes_up),
+                    ("edited", 10, 3),
+                )
+            connector.engine.dispose()
+
+    def test_sqlite_connections_use_wal(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            connector = DataBaseConnector(
+                db_type="sqlite", database=os.path.join(tmpdir, "test.db")
+            )
+            with connector.engine.connect() as connection:
+                journal_mode = connection.exec_driver_sql(
+                    "PRAGMA journal_mode"
+                ).scalar()
+                synchronous = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+            connector.engine.dispose()
+
+        self.assertEqual(journal_mode, "wal")
+        # NORMAL
+        self.assertEqual(synchronous, 1)
+
+    def test_pool_status_records_checkout_waits(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            connector = DataBaseConnector(
+                db_type="sqlite",
+                database=os.path.join(tmpdir, "test.db"),
+                pool_size=1,
+                max_overflow=0,
+            )
+            with connector.session_scope() as session:
+                session.execute(text("SELECT 1"))
+                self.assertEqual(connector.pool_status()["checked_out"], 1)
+            status = connector.pool_status()
+            connector.engine.dispose()
+
+        self.assertEqual(status["checkouts"], 1)
+        self.assertEqual(status["checked_out"], 0)
+        self.assertGreaterEqual(status["wait_max_ms"], status["wait_avg_ms"])
+
+    def test_statement_timeout_is_passed_to_postgresql(self):
+        connector = DataBaseConnector(
+            db_type="postgresql",
+            host="localhost",
+            port=5432,
+            database="testdb",
+            user="user",
+            password="pass",
+            statement_timeout=3000,
+        )
+        self.assertEqual(
+            connector._connect_args(), {"options": "-c statement_timeout=3000"}
+        )
+        self.assertTrue(connector.engine.pool._pre_ping)
+
+    def test_shared_returns_one_connector_per_database(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            first = DataBaseConnector.shared(
+                db_type="sqlite", database=os.path.join(tmpdir, "a.db")
+            )
+            again = DataBaseConnector.shared(
+                db_type="sqlite", database=os.path.join(tmpdir, "a.db"), pool_size=1
+            )
+            other = DataBaseConnector.shared(
+                db_type="sqlite", database=os.path.join(tmpdir, "b.db")
+            )
+
+        self.assertIs(first, again)
+        self.assertIsNot(first, other)
+        self.assertEqual(again.pool_size, 5)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from langchain_core.embeddings import Embeddings
+
+from src.db import CachedEmbeddings
+
+
+class RecordingEmbeddings(Embeddings):
+    def __init__(self):
+        self.seen = []
+
+    def embed_documents(self, texts):
+        self.seen.extend(texts)
+        return [[float(len(text)), 1.0, 0.5] for text in texts]
+
+    def embed_query(self, text):
+        self.seen.append(text)
+        return [float(len(text)), 0.0, 0.5]
+
+
+class TestCachedEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache", "embeddings.sqlite")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_only_misses_reach_the_model(self):
+        model = RecordingEmbeddings()
+        cache = CachedEmbeddings(model, "test-model", cache_path=self.path)
+
+        cache.embed_documents(["a", "bb"])
+        vectors = cache.embed_documents(["bb", "ccc", "bb"])
+
+        self.assertEqual(model.seen, ["a", "bb", "ccc"])
+        self.assertEqual(vectors[0], vectors[2])
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 3)
+
+    def test_whitespace_is_normalized(self):
+        model = RecordingEmbeddings()
+        cache = CachedEmbeddings(model, "test-model", cache_path=None)
+
+        cache.embed_query("is cs2  worth it?")
+        cache.embed_query(" is cs2 worth it? ")
+
+        self.assertEqual(len(model.seen), 1)
+
+    def test_disk_store_is_shared_between_instances(self):
+        first = CachedEmbeddings(RecordingEmbeddings(), "test-model", self.path)
+        first.embed_documents(["shared text"])
+        model = RecordingEmbeddings()
+        cache = CachedEmbeddings(model, "test-model", self.path)
+
+        vector = cache.embed_documents(["shared text"])[0]
+
+        self.assertEqual(model.seen, [])
+        self.assertEqual(vector, [11.0, 1.0, 0.5])
+
+    def test_model_name_is_part_of_the_key(self):
+        CachedEmbeddings(RecordingEmbeddings(), "model-a", self.path).embed_query("q")
+        model = RecordingEmbeddings()
+
+        CachedEmbeddings(model, "model-b", self.path).embed_query("q")
+
+        self.assertEqual(model.seen, ["q"])
+
+    def test_size_caps_evict_least_recently_used(self):
+        model = RecordingEmbeddings()
+        cache = CachedEmbeddings(
+            model, "test-model", self.path, max_memory_entries=2, max_disk_entries=2
+        )
+
+        cache.embed_documents(["a", "b", "c"])
+
+        self.assertEqual(cache.stats["memory_entries"], 2)
+        (size,) = cache._connection.execute("SELECT COUNT(*) FROM embedding").fetchone()
+        self.assertEqual(size, 2)
+
+    def test_disk_store_is_only_counted_when_the_cap_looks_reached(self):
+        CachedEmbeddings(
+            RecordingEmbeddings(), "test-model", self.path
+        ).embed_documents(["a", "b"])
+        cache = CachedEmbeddings(
+            RecordingEmbeddings(), "test-model", self.path, max_disk_entries=3
+        )
+
+        with patch.object(cache, "_count", wraps=cache._count) as count:
+            cache.embed_documents(["a", "c"])
+            count.assert_not_called()
+            cache.embed_documents(["d"])
+            count.assert_called_once()
+
+        (size,) = cache._connection.execute("SELECT COUNT(*) FROM embedding").fetchone()
+        self.assertEqual(size, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+from src.models.model import Conversation
+
+
+def conversation(question="question", **kwargs):
+    """A pending conversation row; keyword arguments override its columns."""
+    columns = dict(
+        conversation_id="c",
+        question=question,
+        answer="answer",
+        game="cs2",
+        model="gpt-4o-mini",
+        relevance="PENDING",
+        relevance_explanation="",
+        prompt_tokens=10,
+        completion_tokens=5,
+        total_tokens=15,
+        eval_prompt_tokens=0,
+        eval_completion_tokens=0,
+        eval_total_tokens=0,
+        model_cost=0.0,
+    )
+    columns.update(kwargs)
+    return Conversation(**columns)
+
+
+def completion(content, total_tokens=10):
+    """A chat completion response as returned by the OpenAI-compatible clients."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(
+            prompt_tokens=total_tokens - 1,
+            completion_tokens=1,
+            total_tokens=total_tokens,
+        ),
+    )
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+
+from src.db.keyword_index import BM25Index, tokenize
+
+
+class TestBM25Index(unittest.TestCase):
+
+    def setUp(self):
+        self.index = BM25Index()
+        self.index.add(
+            [
+                ("1:0", "cs2", "false ban because of my AMD drivers"),
+                ("2:0", "cs2", "all we wanted was 128 tick servers"),
+                ("3:0", "cs2", "great game, great friends"),
+                ("4:0", "dota2", "AMD drivers crash the game"),
+            ]
+        )
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("128-Tick servers!"), ["128", "tick", "servers"])
+
+    def test_rare_terms_rank_first(self):
+        results = self.index.search("128 tick", game="cs2")
+
+        self.assertEqual(results[0][0], "2:0")
+        self.assertEqual(len(results), 1)
+
+    def test_partitions_by_game(self):
+        self.assertEqual(
+            [
+                chunk_id
+                for chunk_id, _ in self.index.search("amd drivers", game="dota2")
+            ],
+            ["4:0"],
+        )
+        self.assertEqual(
+            sorted(chunk_id for chunk_id, _ in self.index.search("amd drivers")),
+            ["1:0", "4:0"],
+        )
+
+    def test_readding_a_chunk_replaces_it(self):
+        self.index.add([("2:0", "cs2", "subtick feels fine now")])
+
+        self.assertEqual(self.index.search("128 tick", game="cs2"), [])
+        self.assertEqual(self.index.search("subtick")[0][0], "2:0")
+        self.assertEqual(len(self.index), 4)
+
+    def test_remove_review(self):
+        self.index.add([("1:1", "cs2", "still banned")])
+
+        self.index.remove_review("1")
+
+        self.assertEqual(self.index.search("ban banned amd", game="cs2"), [])
+
+    def test_tombstones_do_not_change_scores(self):
+        self.index.add([("5:0", "cs2", "great servers"), ("6:0", "cs2", "servers")])
+        self.index.remove(["5:0", "6:0"])
+        scores = self.index.search("servers tick", game="cs2")
+
+        for partition in self.index.partitions.values():
+            partition.compact()
+        self.assertEqual(self.index.search("servers tick", game="cs2"), scores)
+
+    def test_save_compacts_and_reloads(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "keyword_index.pkl")
+            self.index.path = path
+            self.index.remove(["3:0"])
+            self.index.save()
+
+            loaded = BM25Index(path)
+            self.assertTrue(loaded.load())
+            self.assertEqual(len(loaded.partitions["cs2"].doc_ids), 2)
+            self.assertEqual(loaded.search("128 tick")[0][0], "2:0")
+
+    def test_query_latency_on_review_corpus(self):
+        with open("data/processed/reviews.json", encoding="utf-8") as f_in:
+            reviews = json.load(f_in)
+        index = BM25Index()
+        index.add(
+            (f"{review['recommendationid']}:0", review["game"], review["review"])
+            for review in reviews * 10
+        )
+
+        start = time.perf_counter()
+        for _ in range(100):
+            index.search("false ban amd drivers", game="cs2")
+        elapsed_ms = (time.perf_counter() - start) * 10
+
+        self.assertLess(elapsed_ms, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
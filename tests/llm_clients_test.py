@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch
+
+from groq import Groq
+from openai import OpenAI
+
+from src.processing import LLMClientRegistry
+
+
+class TestLLMClientRegistry(unittest.TestCase):
+
+    def setUp(self):
+        env = patch.dict(
+            "os.environ", {"OPENAI_API_KEY": "sk-test", "GROQ_API_KEY": "gsk-test"}
+        )
+        env.start()
+        self.addCleanup(env.stop)
+        self.registry = LLMClientRegistry(timeout=30, connect_timeout=2, max_retries=4)
+        self.addCleanup(self.registry.close)
+
+    def test_clients_are_created_once_per_provider(self):
+        client = self.registry.get("openai/gpt-4o-mini")
+
+        self.assertIs(self.registry.get("openai"), client)
+        self.assertIsInstance(client, OpenAI)
+        self.assertIsInstance(self.registry.get("groq/llama-3.1-8b-instant"), Groq)
+        self.assertEqual(sorted(self.registry._clients), ["groq", "openai"])
+
+    def test_clients_share_a_configured_connection_pool(self):
+        client = self.registry.get("openai")
+
+        self.assertEqual(client.max_retries, 4)
+        self.assertEqual(client.timeout.read, 30)
+        self.assertEqual(client.timeout.connect, 2)
+
+    def test_ollama_uses_the_openai_compatible_api(self):
+        client = self.registry.get("ollama/phi3")
+
+        self.assertEqual(str(client.base_url), "http://localhost:11434/v1/")
+
+    def test_unknown_provider(self):
+        with self.assertRaises(ValueError):
+            self.registry.get("anthropic/claude")
+
+    def test_warm_up_reports_unreachable_providers(self):
+        with (
+            patch.object(self.registry.get("openai"), "models") as openai_models,
+            patch.object(self.registry.get("groq"), "models") as groq_models,
+        ):
+            groq_models.list.side_effect = ConnectionError("unreachable")
+
+            results = self.registry.warm_up()
+
+        openai_models.list.assert_called_once()
+        self.assertEqual(results, {"openai": True, "groq": False})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src.db.local_index import CURRENT_FILE, NumpyVectorIndex, publish_snapshot
+
+
+def publish(snapshot_dir, rows, **kwargs):
+    return publish_snapshot(
+        snapshot_dir,
+        ids=[chunk_id for chunk_id, _, _ in rows],
+        embeddings=[vector for _, _, vector in rows],
+        documents=[f"text {chunk_id}" for chunk_id, _, _ in rows],
+        metadatas=[{"game": game, "chunk_index": 0} for _, game, _ in rows],
+        **kwargs,
+    )
+
+
+ROWS = [
+    ("1:0", "dota2", [1.0, 0.0, 0.0]),
+    ("2:0", "cs2", [0.0, 2.0, 0.0]),
+    ("3:0", "dota2", [0.0, 0.0, 3.0]),
+    ("4:0", "cs2", [1.0, 1.0, 0.0]),
+]
+
+
+class TestNumpyVectorIndex(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.snapshot_dir = tmpdir.name
+
+    def test_games_are_contiguous_normalized_rows(self):
+        version = publish(self.snapshot_dir, ROWS)
+
+        vectors = np.load(os.path.join(self.snapshot_dir, version, "vectors.npy"))
+        index = NumpyVectorIndex(self.snapshot_dir)
+        self.assertEqual(index.version, version)
+        self.assertEqual(index._games, {"cs2": [0, 2], "dota2": [2, 4]})
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+
+    def test_search_ranks_by_cosine_within_game(self):
+        publish(self.snapshot_dir, ROWS)
+        index = NumpyVectorIndex(self.snapshot_dir)
+
+        cs2 = index.search([1.0, 0.1, 0.0], k=2, game="cs2")
+        everything = index.search([1.0, 0.1, 0.0], k=4)
+
+        self.assertEqual([chunk_id for chunk_id, _ in cs2], ["4:0", "2:0"])
+        self.assertEqual(everything[0][0], "1:0")
+        self.assertEqual(index.search([1.0, 0.0, 0.0], k=2, game="unknown"), [])
+
+    def test_empty_collection_publishes_an_empty_snapshot(self):
+        version = publish(self.snapshot_dir, [])
+
+        index = NumpyVectorIndex(self.snapshot_dir)
+        self.assertEqual(index.version, version)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.search([1.0, 0.0, 0.0], k=3, game="cs2"), [])
+
+    def test_hnsw_requires_hnswlib(self):
+        with patch.dict("sys.modules", {"hnswlib": None}):
+            with self.assertRaises(ValueError):
+                NumpyVectorIndex(self.snapshot_dir, index_type="hnsw")
+
+    def test_hnsw_matches_flat_search(self):
+        rng = np.random.default_rng(0)
+        rows = [
+            (f"{i}:0", "cs2" if i % 2 else "dota2", rng.normal(size=16).tolist())
+            for i in range(200)
+        ]
+        publish(self.snapshot_dir, rows)
+        flat = NumpyVectorIndex(self.snapshot_dir)
+        hnsw = NumpyVectorIndex(self.snapshot_dir, index_type="hnsw")
+
+        query = rng.normal(size=16).tolist()
+        self.assertEqual(
+            [chunk_id for chunk_id, _ in hnsw.search(query, k=5, game="cs2")],
+            [chunk_id for chunk_id, _ in flat.search(query, k=5, game="cs2")],
+        )
+
+    def test_refreshes_when_a_new_snapshot_is_published(self):
+        publish(self.snapshot_dir, ROWS[:2])
+        index = NumpyVectorIndex(self.snapshot_dir, refresh_interval=0)
+        self.assertEqual(len(index), 2)
+
+        version = publish(self.snapshot_dir, ROWS)
+        index.search([1.0, 0.0, 0.0], k=1)
+
+        self.assertEqual(index.version, version)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.get(["3:0"])[0][1], "text 3:0")
+
+    def test_old_snapshots_are_pruned(self):
+        versions = [publish(self.snapshot_dir, ROWS, keep=2) for _ in range(3)]
+
+        entries = sorted(os.listdir(self.snapshot_dir))
+        self.assertEqual(entries, sorted([CURRENT_FILE, *versions[1:]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
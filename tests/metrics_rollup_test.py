@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from tests import factories
+from src.db import DataBaseConnector
+from src.models import LatencyHistogram, StaleRollupBucket, ConversationRollup
+from src.processing import MetricsRollup
+from src.models.model import Base, FeedBack, Conversation
+from src.processing.metrics_rollup import mark_stale
+
+NOW = datetime.now().replace(second=30, microsecond=0)
+
+
+def conversation(minutes_ago, **kwargs):
+    return factories.conversation(
+        relevance=kwargs.pop("relevance", "RELEVANT"),
+        prompt_tokens=90,
+        completion_tokens=10,
+        total_tokens=100,
+        eval_total_tokens=20,
+        model_cost=0.5,
+        response_time=1.5,
+        search_time=0.08,
+        request_time=NOW - timedelta(minutes=minutes_ago),
+        **kwargs,
+    )
+
+
+class TestMetricsRollup(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.db_connector = DataBaseConnector(
+            db_type="sqlite", database=os.path.join(tmpdir.name, "chat.db")
+        )
+        self.db_connector.create_tables(Base)
+        self.rollup = MetricsRollup(self.db_connector)
+
+    def add(self, *rows):
+        with self.db_connector.session_scope() as session:
+            session.add_all(rows)
+            session.flush()
+            return [row.id for row in rows]
+
+    def totals(self, resolution):
+        with self.db_connector.session_scope() as session:
+            return [
+                (r.conversations, r.relevant, r.cache_hits, r.total_tokens, r.thumbs_up)
+                for r in session.query(ConversationRollup)
+                .filter(ConversationRollup.resolution == resolution)
+                .order_by(ConversationRollup.bucket)
+            ]
+
+    def test_rolls_conversations_and_feedback_up_per_bucket(self):
+        first, _, _ = self.add(
+            conversation(0),
+            conversation(0, relevance="PENDING"),
+            conversation(1, cache_hit=True),
+        )
+        self.add(FeedBack(conversation_id=first, feedback_score=1, feedback_date=NOW))
+
+        self.rollup.refresh()
+
+        self.assertEqual(self.totals("minute"), [(1, 1, 1, 100, 0), (2, 1, 0, 200, 1)])
+        self.assertEqual(sum(row[0] for row in self.totals("hour")), 3)
+        with self.db_connector.session_scope() as session:
+            search = (
+                session.query(LatencyHistogram)
+                .filter_by(resolution="minute", stage="search")
+                .one()
+            )
+            # Cache hits are left out of the latency histograms
+            self.assertEqual((search.le, search.count), (0.1, 2))
+
+    def test_refresh_recomputes_recent_buckets(self):
+        (pending,) = self.add(conversation(0, relevance="PENDING"))
+        self.rollup.refresh()
+
+        with self.db_connector.session_scope() as session:
+            session.get(Conversation, pending).relevance = "RELEVANT"
+        self.add(conversation(0))
+        self.rollup.refresh()
+        self.rollup.refresh()
+
+        self.assertEqual(self.totals("minute"), [(2, 2, 0, 200, 0)])
+
+    def test_incremental_refresh_leaves_old_buckets_alone(self):
+        (old,) = self.add(conversation(60 * 24))
+        self.add(conversation(0))
+        self.rollup.refresh()
+        with self.db_connector.session_scope() as session:
+            session.query(Conversation).filter(Conversation.id == old).delete()
+
+        self.rollup.refresh()
+        self.assertEqual(len(self.totals("hour")), 2)
+
+        self.rollup.refresh(full=True)
+        self.assertEqual(len(self.totals("hour")), 1)
+
+    def test_refresh_recomputes_the_buckets_of_rows_written_late(self):
+        self.add(conversation(0))
+        self.rollup.refresh()
+
+        # Replayed after an outage, long after its request
+        (late,) = self.add(conversation(60 * 5))
+        self.rollup.refresh()
+        self.assertEqual(sum(row[0] for row in self.totals("hour")), 1)
+
+        with self.db_connector.session_scope() as session:
+            marked = mark_stale(session, [("update", "conversation", {"id": late})])
+        self.assertEqual(marked, 1)
+        self.rollup.refresh()
+
+        self.assertEqual(sum(row[0] for row in self.totals("hour")), 2)
+        self.assertEqual(sum(row[0] for row in self.totals("minute")), 2)
+        with self.db_connector.session_scope() as session:
+            self.assertEqual(session.query(StaleRollupBucket).count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
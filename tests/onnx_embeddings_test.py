@@ -0,0 +1,120 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from langchain_core.embeddings import Embeddings
+from tokenizers.pre_tokenizers import Whitespace
+
+from src.db import OnnxEmbeddings, LangChainChromaRAG
+from src.db.onnx_embeddings import CONFIG_FILE, QUANTIZED_MODEL_FILE
+from src.evaluation.embedding_benchmark import cosine_parity
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "good": 2, "bad": 3, "game": 4, "very": 5}
+
+
+class FakeSession:
+    """Returns the one-hot encoding of each token id as its hidden state."""
+
+    def __init__(self, *args, **kwargs):
+        self.calls = []
+
+    def get_inputs(self):
+        return [
+            type("Input", (), {"name": name})
+            for name in ("input_ids", "attention_mask")
+        ]
+
+    def run(self, output_names, feeds):
+        self.calls.append(feeds)
+        hidden = np.eye(len(VOCAB), dtype=np.float32)[feeds["input_ids"]]
+        # Padding gets a large state, which the attention mask must leave out
+        hidden[feeds["input_ids"] == 0] = 100.0
+        return [hidden]
+
+
+class FixedEmbeddings(Embeddings):
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+class TestOnnxEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.model_dir = tmpdir.name
+
+        tokenizer = Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+        tokenizer.pre_tokenizer = Whitespace()
+        tokenizer.save(os.path.join(self.model_dir, "tokenizer.json"))
+        with open(os.path.join(self.model_dir, CONFIG_FILE), "w") as f_out:
+            json.dump(
+                {
+                    "model_name": "sentence-transformers/all-MiniLM-L6-v2",
+                    "max_seq_length": 3,
+                    "pad_token": "[PAD]",
+                    "pad_token_id": 0,
+                    "normalize": True,
+                },
+                f_out,
+            )
+        open(os.path.join(self.model_dir, QUANTIZED_MODEL_FILE), "wb").close()
+
+    def embeddings(self, **kwargs):
+        with patch("onnxruntime.InferenceSession", FakeSession):
+            return OnnxEmbeddings(self.model_dir, **kwargs)
+
+    def test_mean_pools_and_normalizes(self):
+        vector = np.array(self.embeddings().embed_query("good good game"))
+        expected = np.array([0, 0, 2, 0, 1, 0]) / np.sqrt(5)
+        np.testing.assert_allclose(vector, expected, rtol=1e-6)
+
+    def test_padding_and_order_do_not_change_vectors(self):
+        embeddings = self.embeddings(batch_size=2)
+        texts = ["very good game", "bad", "good\ngame", "game"]
+        vectors = embeddings.embed_documents(texts)
+        for text, vector in zip(texts, vectors):
+            np.testing.assert_allclose(vector, embeddings.embed_query(text), rtol=1e-6)
+        # Only the inputs the model declares are fed
+        self.assertNotIn("token_type_ids", embeddings.session.calls[0])
+
+    def test_truncates_to_max_seq_length(self):
+        embeddings = self.embeddings()
+        np.testing.assert_allclose(
+            embeddings.embed_query("good bad game very very"),
+            embeddings.embed_query("good bad game"),
+        )
+
+    def test_missing_export(self):
+        with self.assertRaises(FileNotFoundError):
+            self.embeddings(quantized=False)
+
+    def test_unknown_embedding_backend(self):
+        with self.assertRaises(ValueError):
+            LangChainChromaRAG(collection_name="test_reviews", embedding_backend="tf")
+
+
+class TestCosineParity(unittest.TestCase):
+
+    def test_reports_the_worst_text(self):
+        reference = FixedEmbeddings({"a": [1.0, 0.0], "b": [0.0, 2.0]})
+        candidate = FixedEmbeddings({"a": [2.0, 0.0], "b": [1.0, 1.0]})
+        parity = cosine_parity(reference, candidate, ["a", "b"])
+        self.assertAlmostEqual(parity["min"], np.sqrt(0.5), places=6)
+        self.assertAlmostEqual(parity["mean"], (1 + np.sqrt(0.5)) / 2, places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
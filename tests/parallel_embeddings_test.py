@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from src.db import ParallelEmbedder
+
+
+class LengthModel:
+    """Embeds a text as its length and number of words."""
+
+    def encode(self, texts, **kwargs):
+        return np.array([[len(text), len(text.split())] for text in texts])
+
+
+def load_length_model(model_name):
+    return LengthModel()
+
+
+class TestParallelEmbedder(unittest.TestCase):
+
+    def test_embeds_length_sorted_batches_on_every_worker(self):
+        texts = [f"word {'x' * i}" for i in range(10)]
+        vectors = np.zeros((len(texts), 2), dtype=np.float32)
+        batches = []
+
+        with ParallelEmbedder(
+            "length", workers=2, batch_size=4, load_model=load_length_model
+        ) as embedder:
+            for positions, batch_vectors in embedder.embed(texts):
+                batches.append(sorted(positions))
+                vectors[positions] = batch_vectors
+            # The pool is kept for the next call
+            self.assertEqual(len(list(embedder.embed(texts[:3]))), 1)
+
+        self.assertEqual(
+            vectors.tolist(), [[len(text), len(text.split())] for text in texts]
+        )
+        # Longest texts first, so each batch pads texts of similar lengths
+        self.assertEqual(sorted(batches), [[0, 1], [2, 3, 4, 5], [6, 7, 8, 9]])
+        self.assertLessEqual(len(embedder.stats), 2)
+        self.assertEqual(
+            sum(stats["chunks"] for stats in embedder.worker_stats.values()), 13
+        )
+        self.assertIsNone(embedder._executor)
+
+    def test_no_texts(self):
+        embedder = ParallelEmbedder("length", load_model=load_length_model)
+        self.assertEqual(list(embedder.embed([])), [])
+        self.assertIsNone(embedder._executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.dialects import sqlite, postgresql
+
+from src.db import DataBaseConnector
+from src.processing import PartitionManager, partition_retention
+from tests.factories import conversation
+from src.models.model import Base, FeedBack, Conversation, ConversationMetrics
+from src.processing.partition_retention import add_months, parse_partition_name
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+class TestPartitionedTables(unittest.TestCase):
+
+    def test_partitions_conversation_and_feedback_on_postgres(self):
+        ddl = str(
+            CreateTable(Conversation.__table__).compile(dialect=postgresql.dialect())
+        )
+        self.assertIn("PRIMARY KEY (id, request_time)", ddl)
+        self.assertIn("PARTITION BY RANGE (request_time)", ddl)
+
+        ddl = str(CreateTable(FeedBack.__table__).compile(dialect=postgresql.dialect()))
+        self.assertIn("PRIMARY KEY (id, feedback_date)", ddl)
+        self.assertNotIn("FOREIGN KEY", ddl)
+
+    def test_keeps_plain_tables_elsewhere(self):
+        ddl = str(CreateTable(FeedBack.__table__).compile(dialect=sqlite.dialect()))
+        self.assertIn("PRIMARY KEY (id)", ddl)
+        self.assertIn("FOREIGN KEY", ddl)
+        self.assertNotIn("PARTITION", ddl)
+
+    def test_month_helpers(self):
+        self.assertEqual(add_months(date(2026, 11, 1), 2), date(2027, 1, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -6), date(2025, 7, 1))
+        self.assertEqual(
+            parse_partition_name("conversation_p2026_03"),
+            ("conversation", date(2026, 3, 1)),
+        )
+        self.assertIsNone(parse_partition_name("conversation_default"))
+
+
+class TestPartitionManager(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+        self.db_connector = DataBaseConnector(
+            db_type="sqlite", database=os.path.join(tmpdir.name, "chat.db")
+        )
+        self.db_connector.create_tables(Base)
+
+    def test_metrics_view_leaves_out_the_text_columns(self):
+        with self.db_connector.session_scope() as session:
+            session.add(conversation(search_time=0.1))
+        with self.db_connector.session_scope() as session:
+            row = session.query(ConversationMetrics).one()
+            self.assertEqual((row.game, row.search_time), ("cs2", 0.1))
+        self.assertNotIn("question", ConversationMetrics.__table__.columns)
+
+    @unittest.skipIf(pq is None, "pyarrow is not available")
+    def test_exports_rows_to_parquet_with_the_orm_types(self):
+        with self.db_connector.session_scope() as session:
+            session.add_all([conversation("first"), conversation("second")])
+        path = os.path.join(
+            self.tmpdir, "conversation", "conversation_p2026_01.parquet"
+        )
+
+        manager = PartitionManager(self.db_connector, batch_size=1)
+        self.assertEqual(manager.export("conversation", "conversation", path), 2)
+
+        table = pq.read_table(path)
+        self.assertEqual(table.column("question").to_pylist(), ["first", "second"])
+        # search_time is NULL in every row but keeps its column type
+        self.assertEqual(str(table.schema.field("search_time").type), "double")
+        self.assertEqual(
+            pq.ParquetFile(path).metadata.row_group(0).column(0).compression, "ZSTD"
+        )
+
+    def test_does_nothing_outside_postgres(self):
+        manager = PartitionManager(self.db_connector)
+        self.assertEqual(manager.ensure_partitions(), [])
+        self.assertEqual(manager.archive(), {})
+
+    def test_archives_partitions_past_the_retention(self):
+        db_connector = MagicMock()
+        db_connector.engine.dialect.name = "postgresql"
+        connection = db_connector.engine.begin.return_value.__enter__.return_value
+        manager = PartitionManager(
+            db_connector, archive_dir=self.tmpdir, retention_months=6
+        )
+        partitions = {
+            "conversation": [
+                "conversation_default",
+                "conversation_p2026_03",
+                "conversation_p2026_04",
+                "conversation_p2026_05",
+            ],
+            "feedback": ["feedback_default", "feedback_p2026_03", "feedback_p2026_04"],
+        }
+
+        with (
+            patch.object(
+                manager, "_partitions", side_effect=lambda _, table: partitions[table]
+            ),
+            patch.object(manager, "export", return_value=3) as mock_export,
+        ):
+            archived = manager.archive(today=date(2026, 10, 18))
+
+        self.assertEqual(
+            archived,
+            {"conversation_p2026_03": 3, "feedback_p2026_03": 3},
+        )
+        mock_export.assert_any_call(
+            "conversation",
+            "conversation_p2026_03",
+            os.path.join(self.tmpdir, "conversation", "conversation_p2026_03.parquet"),
+        )
+        statements = [str(call.args[0]) for call in connection.execute.call_args_list]
+        self.assertIn(
+            "ALTER TABLE conversation DETACH PARTITION conversation_p2026_03",
+            statements,
+        )
+        self.assertIn("DROP TABLE feedback_p2026_03", statements)
+        # April to September are kept besides the current month
+        self.assertFalse(any("p2026_04" in statement for statement in statements))
+
+    def test_refuses_tables_created_before_partitioning(self):
+        db_connector = MagicMock()
+        db_connector.engine.dialect.name = "postgresql"
+        manager = PartitionManager(db_connector)
+
+        with patch.object(manager, "_unpartitioned", return_value=["conversation"]):
+            with self.assertRaisesRegex(RuntimeError, "partition-migrate"):
+                manager.ensure_partitions(today=date(2026, 10, 18))
+            with self.assertRaisesRegex(RuntimeError, "partition-migrate"):
+                manager.archive(today=date(2026, 10, 18))
+
+    def test_migrates_plain_tables_keeping_their_rows(self):
+        db_connector = MagicMock()
+        db_connector.engine.dialect.name = "postgresql"
+        connection = db_connector.engine.begin.return_value.__enter__.return_value
+        manager = PartitionManager(db_connector)
+
+        def execute(statement, params=None):
+            sql, result = str(statement), MagicMock()
+            table = (params or {}).get('table', '').removesuffix('_unpartitioned')
+            if "pg_indexes" in sql:
+                result.all.return_value = [(f"{params['table']}_pkey",)]
+            elif "pg_attribute" in sql:
+                result.all.return_value = [
+                    ("id", f"public.{table}_id_seq"),
+                    ("game", None),
+                ]
+            elif "information_schema" in sql:
+                columns = Base.metadata.tables[table].columns
+                result.__iter__.return_value = [(column.name,) for column in columns]
+            elif sql.startswith("INSERT"):
+                result.rowcount = 3
+            return result
+
+        connection.execute.side_effect = execute
+        with (
+            patch.object(
+                manager,
+                "_unpartitioned",
+                return_value=["conversation", "feedback"],
+            ),
+            patch.object(
+                partition_retention.Base.metadata, "create_all"
+            ) as mock_create_all,
+            patch.object(manager, "ensure_partitions") as mock_ensure,
+        ):
+            migrated = manager.migrate()
+
+        self.assertEqual(migrated, {"conversation": 3, "feedback": 3})
+        mock_create_all.assert_called_once_with(connection)
+        mock_ensure.assert_called_once_with()
+        statements = [str(call.args[0]) for call in connection.execute.call_args_list]
+        self.assertEqual(statements[0], "DROP VIEW IF EXISTS conversation_metrics")
+        self.assertIn(
+            "ALTER TABLE conversation RENAME TO conversation_unpartitioned", statements
+        )
+        self.assertIn(
+            "ALTER INDEX conversation_unpartitioned_pkey "
+            "RENAME TO conversation_unpartitioned_pkey_old",
+            statements,
+        )
+        self.assertIn(
+            "ALTER SEQUENCE public.conversation_id_seq "
+            "RENAME TO conversation_id_seq_old",
+            statements,
+        )
+        insert = next(s for s in statements if s.startswith("INSERT INTO feedback"))
+        self.assertIn("COALESCE(feedback_date, CURRENT_TIMESTAMP)", insert)
+        self.assertIn("FROM feedback_unpartitioned", insert)
+        # Feedback references the old conversations, so it is dropped first
+        self.assertEqual(
+            statements[-2:],
+            [
+                "DROP TABLE feedback_unpartitioned",
+                "DROP TABLE conversation_unpartitioned",
+            ],
+        )
+
+    def test_migration_leaves_partitioned_tables_alone(self):
+        db_connector = MagicMock()
+        db_connector.engine.dialect.name = "postgresql"
+        connection = db_connector.engine.begin.return_value.__enter__.return_value
+        manager = PartitionManager(db_connector)
+
+        with patch.object(manager, "_unpartitioned", return_value=[]):
+            self.assertEqual(manager.migrate(), {})
+        connection.execute.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
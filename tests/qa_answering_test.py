@@ -0,0 +1,157 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from groq import Groq
+from openai import OpenAI
+from openai.types.chat import ChatCompletionChunk
+from langchain_core.documents import Document
+from openai.types.completion_usage import CompletionUsage
+from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta
+
+from src.processing import AnswerStream, QuestionAnswering, qa_answering
+
+USAGE = CompletionUsage(prompt_tokens=120, completion_tokens=3, total_tokens=123)
+
+
+def chunk(content=None, usage=None, x_groq=None):
+    return ChatCompletionChunk(
+        id="chatcmpl",
+        created=0,
+        model="gpt-4o-mini",
+        object="chat.completion.chunk",
+        choices=(
+            []
+            if content is None
+            else [Choice(index=0, delta=ChoiceDelta(content=content))]
+        ),
+        usage=usage,
+    )
+
+
+class TestAnswerStream(unittest.TestCase):
+
+    def test_openai_stream_yields_deltas_and_final_usage(self):
+        stream = AnswerStream(
+            [chunk(""), chunk("Great "), chunk("maps"), chunk(usage=USAGE)],
+            start_time=0.0,
+        )
+
+        self.assertEqual(list(stream), ["Great ", "maps"])
+        self.assertEqual(stream.answer, "Great maps")
+        self.assertEqual(stream.usage["total_tokens"], 123)
+        self.assertGreater(stream.generation_time, 0)
+        self.assertLessEqual(stream.time_to_first_token, stream.generation_time)
+
+    def test_groq_usage_is_read_from_x_groq(self):
+        last = MagicMock(usage=None, choices=[])
+        last.x_groq.usage = USAGE
+
+        stream = AnswerStream([chunk("ok"), last], start_time=0.0)
+
+        self.assertEqual(list(stream), ["ok"])
+        self.assertEqual(stream.usage["prompt_tokens"], 120)
+
+    def test_usage_stays_zero_without_a_usage_chunk(self):
+        stream = AnswerStream([chunk("ok")], start_time=0.0)
+
+        list(stream)
+
+        self.assertEqual(stream.usage["completion_tokens"], 0)
+
+
+class TestQuestionAnsweringStream(unittest.TestCase):
+
+    def make_qa(self, client):
+        client.chat.completions.create.return_value = iter([chunk("hi")])
+        return QuestionAnswering(
+            client,
+            "prompts/prompt_assistant.j2",
+            "prompts/relevance_eval.j2",
+            "gpt-4o-mini",
+        )
+
+    def test_openai_requests_usage_in_the_stream(self):
+        client = MagicMock(spec=OpenAI)
+        client.chat = MagicMock()
+
+        stream = self.make_qa(client).stream_answer("is it fun?", "context")
+
+        self.assertEqual(list(stream), ["hi"])
+        kwargs = client.chat.completions.create.call_args.kwargs
+        self.assertTrue(kwargs["stream"])
+        self.assertEqual(kwargs["stream_options"], {"include_usage": True})
+
+    def test_groq_stream_has_no_stream_options(self):
+        client = MagicMock(spec=Groq)
+        client.chat = MagicMock()
+
+        self.make_qa(client).stream_answer("is it fun?", "context")
+
+        kwargs = client.chat.completions.create.call_args.kwargs
+        self.assertNotIn("stream_options", kwargs)
+
+
+class TestPromptTemplates(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.directory = os.path.join(tmpdir.name, "prompts")
+        self.cache_dir = os.path.join(tmpdir.name, "cache")
+        os.makedirs(self.directory)
+        self.path = os.path.join(self.directory, "answer.j2")
+        self.write_template("Q: {{ question }}\n{{ context | format_context }}")
+        self.qa = QuestionAnswering(MagicMock(), self.path, self.path, "gpt-4o-mini")
+        environment = qa_answering.get_template_environment(
+            self.directory, cache_dir=self.cache_dir
+        )
+        self.addCleanup(environment.cache.clear)
+
+    def write_template(self, text, mtime=None):
+        with open(self.path, "w", encoding="utf-8") as f_out:
+            f_out.write(text)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_template_is_compiled_once(self):
+        with patch(
+            "jinja2.environment.Environment._parse",
+            side_effect=qa_answering.get_template_environment(self.directory)._parse,
+        ) as parse:
+            self.qa.get_prompt(self.path, question="a", context="")
+            self.qa.get_prompt(self.path, question="b", context="")
+
+        self.assertEqual(parse.call_count, 1)
+        self.assertTrue(os.listdir(self.cache_dir))
+
+    def test_template_is_reloaded_when_its_file_changes(self):
+        self.assertEqual(
+            self.qa.get_prompt(self.path, question="a", context=""), "Q: a\n"
+        )
+
+        self.write_template("Question: {{ question }}", mtime=time.time() + 10)
+
+        self.assertEqual(self.qa.get_prompt(self.path, question="a"), "Question: a")
+
+    def test_documents_are_rendered_compactly(self):
+        documents = [
+            Document(
+                page_content="great  maps\n but cheaters",
+                metadata={"recommendationid": "1", "game": "cs2", "chunk_index": 0},
+            ),
+            Document(page_content="fun with friends", metadata={"game": "cs2"}),
+        ]
+
+        prompt = self.qa.get_prompt(self.path, question="fun?", context=documents)
+
+        self.assertEqual(
+            prompt, "Q: fun?\n1. great maps but cheaters\n2. fun with friends"
+        )
+        self.assertEqual(qa_answering.format_context("already text"), "already text")
+
+
+if __name__ == "__main__":
+    unittest.main()
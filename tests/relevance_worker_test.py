@@ -0,0 +1,161 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from src.db import DataBaseConnector
+from src.processing import RelevanceWorker, WriteBehindBuffer
+from tests.factories import completion
+from src.models.model import Base, Conversation
+from src.processing.qa_answering import QuestionAnswering
+
+
+def make_qa(batch_path="prompts/relevance_eval_batch.j2"):
+    qa = MagicMock(spec=QuestionAnswering)
+    qa.model_name = "gpt-4o-mini"
+    qa.prompt_evaluate_batch_path = batch_path
+    return qa
+
+
+class TestRelevanceWorker(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.db_connector = DataBaseConnector(
+            db_type="sqlite", database=os.path.join(tmpdir.name, "chat.db")
+        )
+        self.db_connector.create_tables(Base)
+        self.worker = RelevanceWorker(self.db_connector, batch_size=3, max_wait=0.2)
+        self.addCleanup(self.worker.shutdown)
+
+    def save_conversations(self, count):
+        with self.db_connector.session_scope() as session:
+            conversations = [
+                Conversation(
+                    conversation_id="c",
+                    question=f"question {i}",
+                    answer=f"answer {i}",
+                    game="cs2",
+                    model="gpt-4o-mini",
+                    relevance="PENDING",
+                    relevance_explanation="",
+                    prompt_tokens=0,
+                    completion_tokens=0,
+                    total_tokens=0,
+                    eval_prompt_tokens=0,
+                    eval_completion_tokens=0,
+                    eval_total_tokens=0,
+                    model_cost=0.0,
+                )
+                for i in range(count)
+            ]
+            session.add_all(conversations)
+            session.flush()
+            return [conversation.id for conversation in conversations]
+
+    def stored(self):
+        with self.db_connector.session_scope() as session:
+            return [
+                (c.relevance, c.eval_total_tokens)
+                for c in session.query(Conversation).order_by(Conversation.id)
+            ]
+
+    def test_batches_evaluations_into_one_call(self):
+        ids = self.save_conversations(3)
+        qa = make_qa()
+        qa.evaluate_relevance_batch.return_value = completion(
+            json.dumps(
+                [
+                    {"Id": 2, "Relevance": "NON_RELEVANT", "Explanation": "off"},
+                    {"Id": 0, "Relevance": "RELEVANT", "Explanation": "ok"},
+                    {"Id": 1, "Relevance": "PARTLY_RELEVANT", "Explanation": "meh"},
+                ]
+            ),
+            total_tokens=31,
+        )
+
+        for conversation_id in ids:
+            self.worker.submit(conversation_id, "question", "answer", qa)
+        self.assertTrue(self.worker.join(timeout=5))
+
+        qa.evaluate_relevance_batch.assert_called_once()
+        self.assertEqual(
+            self.stored(),
+            [("RELEVANT", 11), ("PARTLY_RELEVANT", 10), ("NON_RELEVANT", 10)],
+        )
+
+    def test_retries_unparsable_responses(self):
+        (conversation_id,) = self.save_conversations(1)
+        qa = make_qa()
+        qa.evaluate_relevance.side_effect = [
+            completion("Sure! Here is the evaluation"),
+            completion('```json\n{"Relevance": "RELEVANT", "Explanation": "ok"}\n```'),
+        ]
+
+        self.worker.submit(conversation_id, "question", "answer", qa)
+        self.assertTrue(self.worker.join(timeout=5))
+
+        self.assertEqual(qa.evaluate_relevance.call_count, 2)
+        self.assertEqual(self.stored(), [("RELEVANT", 20)])
+
+    def test_marks_failed_after_the_last_retry(self):
+        (conversation_id,) = self.save_conversations(1)
+        qa = make_qa()
+        qa.evaluate_relevance.return_value = completion("not json")
+
+        self.worker.submit(conversation_id, "question", "answer", qa)
+        self.assertTrue(self.worker.join(timeout=5))
+
+        self.assertEqual(qa.evaluate_relevance.call_count, 3)
+        self.assertEqual(self.stored(), [("FAILED", 30)])
+
+    def test_updates_conversations_still_in_the_write_buffer(self):
+        write_buffer = WriteBehindBuffer(
+            self.db_connector,
+            flush_interval=60,
+            fallback_path=os.path.join(
+                os.path.dirname(self.db_connector.database), "pending.jsonl"
+            ),
+        )
+        self.addCleanup(write_buffer.close)
+        worker = RelevanceWorker(self.db_connector, write_buffer=write_buffer)
+        self.addCleanup(worker.shutdown)
+        conversation = write_buffer.add(
+            Conversation(
+                conversation_id="c",
+                question="question",
+                answer="answer",
+                game="cs2",
+                model="gpt-4o-mini",
+                relevance="PENDING",
+                relevance_explanation="",
+                prompt_tokens=0,
+                completion_tokens=0,
+                total_tokens=0,
+                eval_prompt_tokens=0,
+                eval_completion_tokens=0,
+                eval_total_tokens=0,
+                model_cost=0.0,
+            )
+        )
+        qa = make_qa()
+        qa.evaluate_relevance.return_value = completion(
+            '{"Relevance": "RELEVANT", "Explanation": "ok"}'
+        )
+
+        worker.submit(conversation.id, "question", "answer", qa)
+        self.assertTrue(worker.join(timeout=5))
+        self.assertEqual(self.stored(), [])
+
+        write_buffer.flush()
+        self.assertEqual(self.stored(), [("RELEVANT", 10)])
+        with self.db_connector.session_scope() as session:
+            self.assertIsNotNone(
+                session.get(Conversation, conversation.id).evaluation_time
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from types import SimpleNamespace
+
+from src.evaluation import run_benchmark, load_ground_truth
+
+
+def document(recommendationid):
+    return SimpleNamespace(metadata={"recommendationid": recommendationid})
+
+
+class FakeRAG:
+    """Returns the expected review at a fixed rank, or never for 'miss' questions."""
+
+    def __init__(self):
+        self.batches = []
+
+    def _results(self, question):
+        if question == "miss":
+            return [document("x")]
+        return [document("x"), document(question)]
+
+    def search(self, query, n_results, filter, mode):
+        self.batches.append(1)
+        return self._results(query)
+
+    def batch_search(self, queries, n_results, filters, mode):
+        self.batches.append(len(queries))
+        return [self._results(query) for query in queries]
+
+
+class TestRetrievalBenchmark(unittest.TestCase):
+
+    def test_load_ground_truth_supports_both_layouts(self):
+        v1 = load_ground_truth("data/processed/ground-truth-retrieval.csv", limit=2)
+        v2 = load_ground_truth("data/processed/ground-truth-retrieval_v2.csv", limit=2)
+
+        self.assertEqual(v1[0]["game"], "cs2")
+        self.assertEqual(v1[0]["recommendationid"], "172440169")
+        self.assertIsNone(v2[0]["game"])
+        self.assertEqual(v2[0]["recommendationid"], "172440169")
+
+    def test_hit_rate_mrr_and_breakdown(self):
+        questions = [
+            {"question": "1", "recommendationid": "1", "game": "cs2"},
+            {"question": "2", "recommendationid": "2", "game": "cs2"},
+            {"question": "miss", "recommendationid": "3", "game": "dota2"},
+        ]
+        rag = FakeRAG()
+
+        results = run_benchmark(rag, questions, batch_size=2, concurrency=2)
+
+        self.assertAlmostEqual(results["overall"]["hit_rate"], 2 / 3)
+        self.assertAlmostEqual(results["overall"]["mrr"], (0.5 + 0.5) / 3)
+        self.assertEqual(results["by_game"]["cs2"]["hit_rate"], 1.0)
+        self.assertEqual(results["by_game"]["dota2"]["hit_rate"], 0.0)
+        self.assertEqual(sorted(rag.batches), [1, 2])
+        self.assertIn("queries_per_second", results["overall"])
+        self.assertIn("latency_p99_ms", results["by_game"]["cs2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
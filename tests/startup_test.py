@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import unittest
+import threading
+import subprocess
+
+from src.utils import BackgroundLoader
+
+# Seconds `import main` may take; it was about 4s before the heavy imports moved
+IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", "2.0"))
+HEAVY_MODULES = (
+    "torch",
+    "sentence_transformers",
+    "chromadb",
+    "langchain_chroma",
+    "langchain_community",
+    "openai",
+    "groq",
+    "prefect",
+)
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+
+class TestBackgroundLoader(unittest.TestCase):
+
+    def test_loads_in_order_and_shares_resources(self):
+        loader = BackgroundLoader()
+        loader.add("first", lambda: 1)
+        loader.add("second", lambda: loader.get("first") + 1)
+        loader.start()
+
+        self.assertEqual(loader.get("second", timeout=5), 2)
+        self.assertTrue(loader.wait(timeout=5))
+        self.assertEqual(set(loader.timer.durations), {"first", "second"})
+
+    def test_get_waits_only_for_its_resource(self):
+        release = threading.Event()
+        loader = BackgroundLoader()
+        loader.add("fast", lambda: "ready")
+        loader.add("slow", lambda: release.wait(5))
+        loader.start()
+
+        self.assertEqual(loader.get("fast", timeout=5), "ready")
+        self.assertFalse(loader.wait("slow", timeout=0.05))
+        with self.assertRaises(TimeoutError):
+            loader.get("slow", timeout=0.05)
+        release.set()
+        self.assertTrue(loader.get("slow", timeout=5))
+
+    def test_reraises_loader_errors_and_keeps_loading(self):
+        def fail():
+            raise ConnectionError("database is down")
+
+        loader = BackgroundLoader()
+        loader.add("db_connector", fail)
+        loader.add("llm_clients", lambda: "clients")
+        loader.start()
+
+        self.assertTrue(loader.wait(timeout=5))
+        with self.assertRaises(ConnectionError):
+            loader.get("db_connector")
+        self.assertEqual(loader.get("llm_clients"), "clients")
+        with self.assertRaises(KeyError):
+            loader.get("vector_store")
+
+    def test_retries_failed_loaders_until_they_succeed(self):
+        attempts = []
+
+        def connect():
+            attempts.append(time.perf_counter())
+            if len(attempts) == 1:
+                raise ValueError("Could not connect to a Chroma server")
+            return "vector store"
+
+        loader = BackgroundLoader(retry_interval=0.01)
+        loader.add("vector_store", connect)
+        loader.add(
+            "context_builder", lambda: f"builder of {loader.get('vector_store')}"
+        )
+        loader.start()
+
+        self.assertTrue(loader.wait(timeout=5))
+        deadline = time.perf_counter() + 5
+        while time.perf_counter() < deadline:
+            try:
+                self.assertEqual(
+                    loader.get("context_builder"), "builder of vector store"
+                )
+                break
+            except ValueError:
+                time.sleep(0.01)
+        else:
+            self.fail("the failed loaders were not retried")
+        self.assertEqual(loader.get("vector_store"), "vector store")
+        self.assertEqual(len(attempts), 2)
+
+    def test_resources_are_added_before_start(self):
+        loader = BackgroundLoader().start()
+        with self.assertRaises(RuntimeError):
+            loader.add("late", lambda: None)
+
+
+class TestImportBudget(unittest.TestCase):
+
+    def test_app_imports_within_budget(self):
+        code = (
+            "import sys, json, time\n"
+            "start = time.perf_counter()\n"
+            "import main\n"
+            "print(json.dumps({'seconds': time.perf_counter() - start,"
+            " 'modules': sorted(sys.modules)}))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=SRC_DIR,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+
+        loaded = [
+            module
+            for module in report["modules"]
+            if module.split(".")[0] in HEAVY_MODULES
+        ]
+        self.assertEqual(loaded, [], "heavy modules imported before the first render")
+        self.assertLess(report["seconds"], IMPORT_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
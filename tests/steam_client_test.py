@@ -0,0 +1,269 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.db import DataBaseConnector
+from src.models.model import Base
+from src.processing.steam_client import AsyncSteamReviewsClient
+from src.processing.steam_reviews_downloader import SteamReviewsDownloader
+
+APP_IDS = {"cs2": 730, "dota2": 570, "black_myth": 2358720}
+
+with open("data/raw/reviews.json", encoding="utf-8") as f_in:
+    RAW_REVIEWS = {
+        game: [review for page in pages for review in page]
+        for game, pages in json.load(f_in).items()
+    }
+
+
+def stub_url(server, page_size):
+    return (
+        f"http://{server.host}:{server.port}/appreviews/{{appid}}"
+        f"?json=1&num_per_page={page_size}"
+    )
+
+
+class SteamStub:
+    """Replays data/raw/reviews.json with Steam's cursor pagination."""
+
+    def __init__(self, rate_limited_requests=0, dropped_requests=0, slow_requests=0):
+        self.rate_limited_requests = rate_limited_requests
+        self.dropped_requests = dropped_requests
+        self.slow_requests = slow_requests
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.app = web.Application()
+        self.app.router.add_get("/appreviews/{appid}", self.handle)
+
+    async def handle(self, request):
+        self.requests.append(dict(request.query))
+        if self.rate_limited_requests:
+            self.rate_limited_requests -= 1
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if self.dropped_requests:
+            self.dropped_requests -= 1
+            request.transport.close()
+            return web.Response()
+        if self.slow_requests:
+            self.slow_requests -= 1
+            await asyncio.sleep(1)
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+
+        game = {str(app_id): game for game, app_id in APP_IDS.items()}[
+            request.match_info["appid"]
+        ]
+        reviews = RAW_REVIEWS[game]
+        if request.query.get("filter") == "updated":
+            reviews = sorted(reviews, key=lambda r: -r["timestamp_updated"])
+        page_size = int(request.query["num_per_page"])
+        cursor = request.query["cursor"]
+        offset = 0 if cursor == "*" else int(cursor.strip("AoJ+/="))
+        page = reviews[offset : offset + page_size]
+        # Like Steam, the last page returns the cursor it was given
+        next_cursor = f"AoJ+{offset + page_size}=" if page else cursor
+        return web.json_response({"success": 1, "reviews": page, "cursor": next_cursor})
+
+
+class TestAsyncSteamReviewsClient(unittest.IsolatedAsyncioTestCase):
+
+    async def start_stub(self, **kwargs):
+        stub = SteamStub(**kwargs)
+        server = TestServer(stub.app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        url = stub_url(server, page_size=30)
+        return stub, url
+
+    async def collect(self, client, app_id, **kwargs):
+        return [page async for page in client.iter_pages(app_id, **kwargs)]
+
+    async def test_follows_cursor_until_exhausted(self):
+        stub, url = await self.start_stub()
+
+        async with AsyncSteamReviewsClient(url) as client:
+            pages = await self.collect(client, 730)
+
+        reviews = [review for page in pages for review in page]
+        self.assertEqual(
+            [r["recommendationid"] for r in reviews],
+            [r["recommendationid"] for r in RAW_REVIEWS["cs2"]],
+        )
+        self.assertEqual([len(page) for page in pages], [30, 30, 30, 10])
+        self.assertEqual(stub.requests[1]["cursor"], "AoJ+30=")
+
+    async def test_stops_at_review_cap(self):
+        stub, url = await self.start_stub()
+
+        async with AsyncSteamReviewsClient(url) as client:
+            pages = await self.collect(client, 570, max_reviews=45)
+
+        self.assertEqual([len(page) for page in pages], [30, 15])
+        self.assertEqual(len(stub.requests), 2)
+
+    async def test_stops_at_date_horizon(self):
+        _, url = await self.start_stub()
+        created = sorted(r["timestamp_created"] for r in RAW_REVIEWS["cs2"])
+        horizon = created[len(created) // 2]
+
+        async with AsyncSteamReviewsClient(url) as client:
+            pages = await self.collect(client, 730, since_timestamp=horizon)
+
+        reviews = [review for page in pages for review in page]
+        self.assertTrue(reviews)
+        self.assertTrue(all(r["timestamp_created"] > horizon for r in reviews))
+
+    async def test_retries_rate_limited_requests(self):
+        stub, url = await self.start_stub(rate_limited_requests=2)
+
+        async with AsyncSteamReviewsClient(url, backoff_factor=0) as client:
+            data = await client.fetch_page(730)
+
+        self.assertEqual(len(data["reviews"]), 30)
+        self.assertEqual(len(stub.requests), 3)
+
+    async def test_retries_dropped_connections_and_timeouts(self):
+        stub, url = await self.start_stub(dropped_requests=1, slow_requests=1)
+
+        async with AsyncSteamReviewsClient(
+            url, backoff_factor=0, timeout=0.5
+        ) as client:
+            data = await client.fetch_page(730)
+
+        self.assertEqual(len(data["reviews"]), 30)
+        self.assertEqual(len(stub.requests), 3)
+
+    async def test_gives_up_after_the_last_retry(self):
+        _, url = await self.start_stub(dropped_requests=100)
+
+        async with AsyncSteamReviewsClient(
+            url, max_retries=2, backoff_factor=0
+        ) as client:
+            with self.assertRaises(aiohttp.ClientConnectionError):
+                await client.fetch_page(730)
+
+    async def test_concurrency_is_capped_per_host(self):
+        stub, url = await self.start_stub()
+
+        async with AsyncSteamReviewsClient(url, max_concurrency_per_host=2) as client:
+            await asyncio.gather(
+                *(self.collect(client, app_id) for app_id in APP_IDS.values())
+            )
+
+        self.assertLessEqual(stub.max_in_flight, 2)
+
+
+class TestSteamReviewsDownloader(unittest.IsolatedAsyncioTestCase):
+
+    async def test_pages_stream_into_processing(self):
+        stub = SteamStub()
+        server = TestServer(stub.app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        url = stub_url(server, page_size=50)
+
+        processed = []
+        with (
+            patch.dict("os.environ", {"STEAM_API_URL": url}),
+            patch("src.processing.steam_reviews_downloader.LangChainChromaRAG"),
+        ):
+            downloader = SteamReviewsDownloader(
+                app_ids=APP_IDS, collection_name="steam_reviews", max_reviews=None
+            )
+        with patch.object(
+            downloader,
+            "process_page",
+            side_effect=lambda reviews, game: processed.append(game) or len(reviews),
+        ):
+            total = await downloader._download_and_save()
+
+        self.assertEqual(total, sum(len(reviews) for reviews in RAW_REVIEWS.values()))
+        self.assertEqual(sorted(set(processed)), sorted(APP_IDS))
+        self.assertEqual(len(processed), 6)
+
+    async def test_incremental_sync_stops_at_watermark(self):
+        stub = SteamStub()
+        server = TestServer(stub.app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        db_connector = DataBaseConnector(
+            db_type="sqlite", database=os.path.join(tmpdir.name, "sync.db")
+        )
+        db_connector.create_tables(Base)
+
+        with (
+            patch.dict("os.environ", {"STEAM_API_URL": stub_url(server, 50)}),
+            patch("src.processing.steam_reviews_downloader.LangChainChromaRAG"),
+        ):
+            downloader = SteamReviewsDownloader(
+                app_ids={"cs2": 730},
+                collection_name="steam_reviews",
+                max_reviews=None,
+                db_connector=db_connector,
+            )
+        updated = sorted(r["timestamp_updated"] for r in RAW_REVIEWS["cs2"])
+        watermark = updated[-10]
+        downloader.save_watermark("cs2", 730, watermark, 0)
+
+        with patch.object(
+            downloader, "process_page", side_effect=lambda reviews, game: len(reviews)
+        ):
+            total = await downloader._download_and_save()
+
+        self.assertEqual(total, sum(ts > watermark for ts in updated))
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(stub.requests[0]["filter"], "updated")
+        self.assertEqual(downloader.get_watermark("cs2"), updated[-1])
+
+    async def test_incremental_sync_is_not_capped(self):
+        stub = SteamStub()
+        server = TestServer(stub.app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        db_connector = DataBaseConnector(
+            db_type="sqlite", database=os.path.join(tmpdir.name, "sync.db")
+        )
+        db_connector.create_tables(Base)
+
+        with (
+            patch.dict("os.environ", {"STEAM_API_URL": stub_url(server, 20)}),
+            patch("src.processing.steam_reviews_downloader.LangChainChromaRAG"),
+        ):
+            downloader = SteamReviewsDownloader(
+                app_ids={"cs2": 730},
+                collection_name="steam_reviews",
+                max_reviews=25,
+                db_connector=db_connector,
+            )
+        updated = sorted(r["timestamp_updated"] for r in RAW_REVIEWS["cs2"])
+        # More reviews were updated since the last sync than the cap allows
+        watermark = updated[-60]
+        downloader.save_watermark("cs2", 730, watermark, 0)
+
+        with patch.object(
+            downloader, "process_page", side_effect=lambda reviews, game: len(reviews)
+        ):
+            total = await downloader._download_and_save()
+
+        self.assertEqual(total, sum(ts > watermark for ts in updated))
+        self.assertGreater(total, 25)
+        self.assertEqual(downloader.get_watermark("cs2"), updated[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.utils import StageTimer, get_tracer
+
+
+class TestStageTimer(unittest.TestCase):
+
+    def test_records_stage_durations(self):
+        timer = StageTimer("chat_request")
+        with timer.stage("search"):
+            time.sleep(0.01)
+        with self.assertRaises(RuntimeError):
+            with timer.stage("search"):
+                raise RuntimeError("chroma is down")
+        timer.record("generation", 1.5)
+
+        self.assertGreaterEqual(timer.durations["search"], 0.01)
+        self.assertEqual(timer.durations["generation"], 1.5)
+
+    def test_exports_nothing_without_an_endpoint(self):
+        with patch.dict("os.environ", {"OTEL_EXPORTER_OTLP_ENDPOINT": ""}):
+            get_tracer.cache_clear()
+            self.addCleanup(get_tracer.cache_clear)
+            self.assertIsNone(get_tracer())
+
+    @patch("src.utils.tracing.get_tracer")
+    def test_exports_one_child_span_per_stage(self, mock_get_tracer):
+        tracer = MagicMock()
+        mock_get_tracer.return_value = tracer
+        trace = MagicMock()
+
+        with patch.dict("sys.modules", {"opentelemetry": MagicMock(trace=trace)}):
+            with StageTimer("chat_request", {"game": "cs2"}) as timer:
+                with timer.stage("embedding"):
+                    pass
+                timer.record("generation", 0.2)
+            timer.end()
+
+        names = [call.args[0] for call in tracer.start_span.call_args_list]
+        self.assertEqual(names, ["chat_request", "embedding", "generation"])
+        root = tracer.start_span.return_value
+        self.assertEqual(root.end.call_count, 3)
+        generation = tracer.start_span.call_args_list[2].kwargs
+        self.assertEqual(generation["context"], trace.set_span_in_context.return_value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,316 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+from langchain_core.embeddings import Embeddings
+
+from src.db import ParallelEmbedder, LangChainChromaRAG
+from src.db.keyword_index import BM25Index
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic embeddings that record how many texts were embedded."""
+
+    def __init__(self, **kwargs):
+        self.embedded = 0
+        self.calls = 0
+
+    def _embed(self, text):
+        return [float(ord(char) % 7) for char in text[:8].ljust(8)]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.embedded += len(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class CountingModel:
+    """The CountingEmbeddings vectors, as a sentence-transformers model for workers."""
+
+    def encode(self, texts, **kwargs):
+        return np.array([CountingEmbeddings()._embed(text) for text in texts])
+
+
+def load_counting_model(model_name):
+    return CountingModel()
+
+
+def make_review(recommendationid, text, game="cs2"):
+    return {
+        "recommendationid": recommendationid,
+        "language": "english",
+        "game": game,
+        "review": text,
+    }
+
+
+class TestLangChainChromaRAG(unittest.TestCase):
+
+    def setUp(self):
+        self.client = chromadb.EphemeralClient(
+            settings=Settings(allow_reset=True, anonymized_telemetry=False)
+        )
+        self.client.reset()
+        with (
+            patch("src.db.vector_store.chromadb.HttpClient", return_value=self.client),
+            patch("src.db.vector_store.HuggingFaceEmbeddings", CountingEmbeddings),
+        ):
+            self.rag = LangChainChromaRAG(
+                collection_name="test_reviews",
+                embedding_cache_path=None,
+                keyword_index_path=None,
+            )
+        self.model = self.rag.embeddings.base_embeddings
+
+    def test_add_game_reviews_batches_upserts(self):
+        reviews = [make_review(str(i), f"great game {i} " * 50) for i in range(10)]
+
+        stats = self.rag.add_game_reviews(reviews, batch_size=8)
+
+        collection = self.rag.vectorstore._collection
+        self.assertEqual(stats["reviews"], 10)
+        self.assertEqual(collection.count(), stats["chunks"])
+        self.assertEqual(self.model.embedded, stats["chunks"])
+        self.assertEqual(self.model.calls, -(-stats["chunks"] // 8))
+        self.assertIn("chunks_per_second", stats)
+
+    def test_add_game_reviews_skips_existing(self):
+        self.rag.add_game_reviews([make_review("1", "first review")])
+
+        stats = self.rag.add_game_reviews(
+            [make_review("1", "first review"), make_review("2", "second review")]
+        )
+
+        self.assertEqual(stats["reviews"], 1)
+        self.assertEqual(stats["skipped"], 1)
+        self.assertEqual(self.rag.vectorstore._collection.count(), 2)
+
+    def test_backfill_embeds_on_worker_processes(self):
+        reviews = [make_review(str(i), f"review {i} " * (i * 20 + 1)) for i in range(6)]
+
+        with ParallelEmbedder(
+            "counting", workers=2, batch_size=5, load_model=load_counting_model
+        ) as embedder:
+            stats = self.rag.backfill_game_reviews(
+                reviews, batch_size=3, embedder=embedder
+            )
+            again = self.rag.backfill_game_reviews(reviews, embedder=embedder)
+
+        stored = self.rag.vectorstore._collection.get(
+            include=["documents", "embeddings"]
+        )
+        self.assertEqual(len(stored["ids"]), stats["chunks"])
+        self.assertEqual(
+            [list(vector) for vector in stored["embeddings"]],
+            [self.model._embed(document) for document in stored["documents"]],
+        )
+        self.assertEqual(self.model.embedded, 0)
+        self.assertEqual(
+            sum(s["chunks"] for s in embedder.worker_stats.values()), stats["chunks"]
+        )
+        self.assertEqual((again["reviews"], again["skipped"]), (0, 6))
+
+    def test_chunk_ids_are_deterministic(self):
+        self.rag.add_game_reviews([make_review("42", "word " * 120)])
+
+        ids = self.rag.vectorstore._collection.get()["ids"]
+        self.assertEqual(sorted(ids), [f"42:{i}" for i in range(len(ids))])
+
+    def test_reingest_unchanged_review_does_not_embed(self):
+        review = make_review("1", "first review " * 40)
+        self.rag.add_game_reviews([review])
+        embedded = self.model.embedded
+
+        self.rag.add_game_reviews([review])
+
+        self.assertEqual(self.model.embedded, embedded)
+
+    def test_edited_review_replaces_only_its_chunks(self):
+        self.rag.add_game_reviews(
+            [make_review("1", "long review " * 80), make_review("2", "other review")]
+        )
+
+        self.rag.update_review(make_review("1", "short now"))
+
+        collection = self.rag.vectorstore._collection
+        chunks = collection.get(where={"recommendationid": "1"})
+        self.assertEqual(chunks["ids"], ["1:0"])
+        self.assertEqual(chunks["documents"], ["short now"])
+        self.assertEqual(len(collection.get(where={"recommendationid": "2"})["ids"]), 1)
+
+    def test_delete_review(self):
+        self.rag.add_game_reviews(
+            [make_review("1", "first"), make_review("2", "second")]
+        )
+
+        self.rag.delete_review("1")
+
+        self.assertEqual(self.rag.vectorstore._collection.get()["ids"], ["2:0"])
+
+    def test_get_review_returns_every_chunk_in_order(self):
+        text = " ".join(f"w{i}" for i in range(5000))
+        self.rag.add_game_reviews([make_review("1", text)])
+        calls = self.model.calls
+
+        review = self.rag.get_review("1")
+
+        words = review.split()
+        self.assertEqual(words[0], "w0")
+        self.assertEqual(words[-1], "w4999")
+        self.assertGreater(self.rag.vectorstore._collection.count(), 100)
+        self.assertEqual(self.model.calls, calls)
+
+    def test_get_reviews_rebuilds_many_reviews(self):
+        self.rag.add_game_reviews(
+            [make_review("1", "first"), make_review("2", "second")]
+        )
+
+        reviews = self.rag.get_reviews(["1", "2", "missing"])
+
+        self.assertEqual(reviews, {"1": "first", "2": "second"})
+        self.assertEqual(self.rag.get_review("missing"), "")
+
+    def test_hybrid_search_surfaces_keyword_matches(self):
+        self.rag.add_game_reviews(
+            [
+                make_review("1", "we only wanted 128 tick servers"),
+                make_review("2", "we only wanted new maps"),
+                make_review("3", "128 tick please", game="dota2"),
+            ]
+        )
+
+        results = self.rag.search(
+            "128 tick", n_results=2, filter={"game": "cs2"}, mode="hybrid"
+        )
+
+        self.assertEqual(results[0].metadata["recommendationid"], "1")
+        self.assertTrue(all(doc.metadata["game"] == "cs2" for doc in results))
+
+    def test_keyword_index_is_rebuilt_from_the_collection(self):
+        self.rag.add_game_reviews([make_review("1", "amd drivers crash")])
+        self.rag.keyword_index = BM25Index()
+        self.rag._keyword_index_loaded = False
+
+        results = self.rag.search("amd", n_results=1, mode="hybrid")
+
+        self.assertEqual(results[0].page_content, "amd drivers crash")
+
+    def test_batch_search_matches_single_search(self):
+        self.rag.add_game_reviews(
+            [
+                make_review("1", "aaaa great maps"),
+                make_review("2", "bbbb bad servers"),
+                make_review("3", "aaaa other game", game="dota2"),
+            ]
+        )
+        queries = ["aaaa", "bbbb", "aaaa"]
+        filters = [{"game": "cs2"}, {"game": "cs2"}, {"game": "dota2"}]
+
+        batched = self.rag.batch_search(queries, n_results=1, filters=filters)
+
+        single = [
+            self.rag.search(query, n_results=1, filter=query_filter)
+            for query, query_filter in zip(queries, filters)
+        ]
+        self.assertEqual(
+            [[doc.page_content for doc in docs] for docs in batched],
+            [[doc.page_content for doc in docs] for docs in single],
+        )
+
+    def test_warm_up_loads_the_keyword_index_without_caching(self):
+        self.rag.add_game_reviews([make_review("1", "aaaa bbbb")])
+        self.rag._keyword_index_loaded = False
+
+        timings = self.rag.warm_up()
+
+        self.assertEqual(set(timings), {"embedding_model", "chroma", "keyword_index"})
+        self.assertTrue(self.rag._keyword_index_loaded)
+        self.assertNotIn(
+            self.rag.embeddings._key("warm-up", "query"), self.rag.embeddings._memory
+        )
+
+    def test_unknown_search_mode(self):
+        with self.assertRaises(ValueError):
+            self.rag.search("query", mode="sparse")
+
+
+class TestEmbeddedBackend(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.client = chromadb.EphemeralClient(
+            settings=Settings(allow_reset=True, anonymized_telemetry=False)
+        )
+        self.client.reset()
+        with (
+            patch("src.db.vector_store.chromadb.HttpClient", return_value=self.client),
+            patch("src.db.vector_store.HuggingFaceEmbeddings", CountingEmbeddings),
+        ):
+            self.http = LangChainChromaRAG(
+                collection_name="test_reviews",
+                embedding_cache_path=None,
+                keyword_index_path=None,
+            )
+            self.embedded = LangChainChromaRAG(
+                collection_name="test_reviews",
+                embedding_cache_path=None,
+                keyword_index_path=None,
+                backend="embedded",
+                snapshot_dir=tmpdir.name,
+            )
+        self.embedded.local_index.refresh_interval = 0
+        self.http.add_game_reviews(
+            [
+                make_review("1", "aaaa great maps"),
+                make_review("2", "bbbb bad servers"),
+                make_review("3", "aaab other game", game="dota2"),
+            ]
+        )
+
+    def test_falls_back_to_chroma_before_the_first_snapshot(self):
+        results = self.embedded.search("aaaa", n_results=1)
+
+        self.assertIsNone(self.embedded.local_index.version)
+        self.assertEqual(results[0].page_content, "aaaa great maps")
+
+    def test_search_matches_the_http_backend(self):
+        self.embedded.publish_snapshot()
+        self.assertTrue(self.embedded._uses_local_index())
+
+        for query_filter in (None, {"game": "cs2"}, {"game": "dota2"}):
+            for mode in ("dense", "hybrid"):
+                self.assertEqual(
+                    [
+                        doc.page_content
+                        for doc in self.embedded.search(
+                            "aaaa", n_results=2, filter=query_filter, mode=mode
+                        )
+                    ],
+                    [
+                        doc.page_content
+                        for doc in self.http.search(
+                            "aaaa", n_results=2, filter=query_filter, mode=mode
+                        )
+                    ],
+                )
+        self.assertEqual(
+            self.embedded.batch_search(["bbbb"], n_results=1)[0][0].metadata[
+                "recommendationid"
+            ],
+            "2",
+        )
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            LangChainChromaRAG(collection_name="test_reviews", backend="grpc")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.exc import OperationalError
+
+from src.db import DataBaseConnector
+from src.models import AnswerCache, StaleRollupBucket
+from src.processing import WriteBehindBuffer
+from tests.factories import conversation
+from src.models.model import Base, FeedBack, Conversation
+from src.processing.write_buffer import _IdAllocator
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.fallback_path = os.path.join(tmpdir.name, "pending_writes.jsonl")
+        self.db_connector = DataBaseConnector(
+            db_type="sqlite", database=os.path.join(tmpdir.name, "chat.db")
+        )
+        self.db_connector.create_tables(Base)
+        self.buffer = self.make_buffer()
+
+    def make_buffer(self, **kwargs):
+        buffer = WriteBehindBuffer(
+            self.db_connector,
+            fallback_path=self.fallback_path,
+            flush_interval=60,
+            **kwargs,
+        )
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def stored(self):
+        with self.db_connector.session_scope() as session:
+            return [
+                (c.id, c.question, c.relevance, c.cache_hit)
+                for c in session.query(Conversation).order_by(Conversation.id)
+            ]
+
+    def test_assigns_ids_before_writing(self):
+        first = self.buffer.add(conversation("first"))
+        second = self.buffer.add(conversation("second"))
+        self.buffer.add(
+            FeedBack(conversation_id=first.id, feedback_score=1, feedback_comment="")
+        )
+
+        self.assertEqual((first.id, second.id), (1, 2))
+        self.assertEqual(self.stored(), [])
+
+        self.assertTrue(self.buffer.flush())
+        self.assertEqual(
+            self.stored(),
+            [(1, "first", "PENDING", False), (2, "second", "PENDING", False)],
+        )
+        with self.db_connector.session_scope() as session:
+            self.assertEqual(session.query(FeedBack).one().conversation_id, 1)
+
+    def test_flushes_in_the_background_once_the_batch_is_full(self):
+        buffer = self.make_buffer(batch_size=2)
+        buffer.add(conversation("first"))
+        buffer.add(conversation("second"))
+
+        for _ in range(50):
+            if buffer.flushed == 2:
+                break
+            buffer._thread.join(0.05)
+        self.assertEqual(buffer.flushed, 2)
+        self.assertEqual(len(self.stored()), 2)
+
+    def test_updates_queued_and_flushed_rows(self):
+        queued = self.buffer.add(conversation("queued"))
+        self.buffer.update(Conversation, queued.id, {"relevance": "RELEVANT"})
+        self.buffer.flush()
+        self.buffer.update(Conversation, queued.id, {"relevance": "NON_RELEVANT"})
+
+        self.assertEqual(self.stored()[0][2], "RELEVANT")
+        self.buffer.flush()
+        self.assertEqual(self.stored()[0][2], "NON_RELEVANT")
+
+    def test_replays_the_fallback_file_once_the_database_is_back(self):
+        self.buffer.add(conversation("first"))
+        with patch.object(
+            self.db_connector,
+            "session_scope",
+            side_effect=OperationalError("INSERT", {}, Exception("down")),
+        ):
+            self.assertFalse(self.buffer.flush())
+        self.assertTrue(os.path.exists(self.fallback_path))
+        self.assertEqual(self.stored(), [])
+
+        # A restarted process continues after the IDs waiting in the fallback file
+        buffer = self.make_buffer()
+        self.assertEqual(buffer.add(conversation("second")).id, 2)
+        self.assertTrue(buffer.flush())
+
+        self.assertFalse(os.path.exists(self.fallback_path))
+        self.assertEqual(
+            [row[:2] for row in self.stored()], [(1, "first"), (2, "second")]
+        )
+        # Only the replayed row marks its hour for the metrics rollup
+        with self.db_connector.session_scope() as session:
+            first = session.get(Conversation, 1).request_time
+            self.assertEqual(
+                [row.bucket for row in session.query(StaleRollupBucket)],
+                [first.replace(minute=0, second=0, microsecond=0)],
+            )
+
+    def test_replays_binary_columns(self):
+        buffer = self.make_buffer(models=(AnswerCache,))
+        buffer.add(
+            AnswerCache(
+                game="cs2",
+                model="gpt-4o-mini",
+                question="is it fun?",
+                answer="yes",
+                embedding=b"\x00\xff",
+                watermark=0,
+            )
+        )
+        down = OperationalError("INSERT", {}, Exception("down"))
+        with patch.object(self.db_connector, "session_scope", side_effect=down):
+            self.assertFalse(buffer.flush())
+
+        self.assertTrue(self.make_buffer(models=(AnswerCache,)).flush())
+        with self.db_connector.session_scope() as session:
+            self.assertEqual(session.query(AnswerCache).one().embedding, b"\x00\xff")
+
+    def rejected(self):
+        path = f"{self.fallback_path}.rejected"
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f_in:
+            return [json.loads(line)["values"].get("question") for line in f_in]
+
+    def test_sets_aside_only_the_rows_the_database_rejects(self):
+        self.buffer.add(conversation("first"))
+        invalid = conversation("invalid")
+        invalid.answer = None  # NOT NULL
+        self.buffer.add(invalid)
+        self.buffer.add(conversation("third"))
+
+        self.assertTrue(self.buffer.flush())
+
+        self.assertEqual([row[1] for row in self.stored()], ["first", "third"])
+        self.assertEqual(self.rejected(), ["invalid"])
+        self.assertEqual(self.buffer.flushed, 2)
+        self.assertFalse(os.path.exists(self.fallback_path))
+
+    def test_add_never_waits_on_a_database_that_is_down(self):
+        down = OperationalError("SELECT", {}, Exception("down"))
+        with patch.object(
+            self.db_connector, "session_scope", side_effect=down
+        ) as session_scope:
+            buffer = self.make_buffer()
+            self.assertEqual(session_scope.call_count, 2)  # One refill per table
+
+            added = buffer.add(conversation("during the outage"))
+            self.assertIsNone(added.id)
+            buffer.add(conversation("still down"))
+            self.assertEqual(session_scope.call_count, 2)
+            # Neither do flushes within the retry interval
+            self.assertTrue(buffer.flush())
+            self.assertEqual(session_scope.call_count, 2)
+        self.assertEqual(buffer.pending, 2)
+
+    def test_rows_added_without_an_id_get_one_at_the_next_flush(self):
+        down = OperationalError("SELECT", {}, Exception("down"))
+        with patch.object(self.db_connector, "session_scope", side_effect=down):
+            buffer = self.make_buffer()
+            added = buffer.add(conversation("during the outage"))
+        self.assertIsNone(added.id)
+        # The retry interval has passed
+        buffer._allocators["conversation"]._retry_at = 0.0
+
+        assigned = []
+        buffer.when_assigned(added, lambda c: assigned.append(c.id))
+        buffer.when_assigned(
+            added,
+            lambda c: buffer.update(Conversation, c.id, {"relevance": "RELEVANT"}),
+        )
+        self.assertEqual(assigned, [])
+        self.assertEqual(buffer.pending, 1)
+
+        self.assertTrue(buffer.flush())
+        self.assertEqual(assigned, [1])
+        self.assertTrue(buffer.flush())
+        self.assertEqual(self.stored(), [(1, "during the outage", "RELEVANT", False)])
+
+        # Once known, the ID is passed on right away
+        buffer.when_assigned(added, lambda c: assigned.append(c.id))
+        self.assertEqual(assigned, [1, 1])
+
+
+class TestIdAllocator(unittest.TestCase):
+
+    def test_postgres_reserve_outlasts_a_failed_refill(self):
+        allocator = _IdAllocator(
+            MagicMock(db_type="postgresql"), "conversation", block_size=4
+        )
+        down = OperationalError("SELECT", {}, Exception("down"))
+        blocks = [[1, 2, 3, 4], down, down, [5, 6, 7, 8]]
+
+        def fetch_block():
+            block = blocks.pop(0)
+            if isinstance(block, Exception):
+                raise block
+            return block
+
+        with patch.object(allocator, "_fetch_block", side_effect=fetch_block):
+            self.assertIsNone(allocator.next_id())
+            self.assertTrue(allocator.refill())
+            self.assertEqual([allocator.next_id() for _ in range(2)], [1, 2])
+            # The refill once half the block is used fails; 3 and 4 are still handed out
+            self.assertFalse(allocator.refill())
+            self.assertEqual([allocator.next_id() for _ in range(2)], [3, 4])
+            self.assertIsNone(allocator.next_id())
+            # Within the retry interval the database is not asked again
+            self.assertFalse(allocator.refill())
+            self.assertEqual(blocks, [down, [5, 6, 7, 8]])
+
+            allocator._retry_at = 0.0
+            self.assertFalse(allocator.refill())
+            allocator._retry_at = 0.0
+            self.assertTrue(allocator.refill())
+            self.assertEqual(allocator.next_id(), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()